@@ -0,0 +1,115 @@
+"""
+Admin dashboard data for School Platform
+Loads platform counts and the recent-activity feed with a fixed number of
+queries, whatever the number of users, lessons or activities shown
+"""
+
+import heapq
+from itertools import islice
+
+def platform_counts():
+    """
+    Count users by role, lessons, quizzes and sections in one aggregate query
+    
+    Returns:
+        dict: total_users, total_teachers, total_students, total_lessons,
+        total_quizzes and total_sections
+    """
+    from app import db, User, Lesson, Quiz, Section
+    
+    def count(model, *criteria):
+        return db.select(db.func.count()).select_from(model).where(*criteria).scalar_subquery()
+    
+    row = db.session.execute(db.select(
+        count(User).label('total_users'),
+        count(User, User.role == 'teacher').label('total_teachers'),
+        count(User, User.role == 'student').label('total_students'),
+        count(Lesson).label('total_lessons'),
+        count(Quiz).label('total_quizzes'),
+        count(Section).label('total_sections')
+    )).one()
+    
+    return dict(row._mapping)
+
+def section_user_counts():
+    """
+    Number of users in each section, from one grouped query
+    
+    Returns:
+        dict: section_id -> user count (sections without users are absent)
+    """
+    from app import db, User
+    
+    rows = db.session.query(User.section_id, db.func.count(User.id))\
+        .filter(User.section_id.isnot(None)).group_by(User.section_id)
+    return dict(rows.all())
+
+def recent_activities(limit=10, per_stream=5, score_label='Score', include_views=True):
+    """
+    Most recent quiz completions, lesson creations and lesson views, newest first
+    
+    Each stream is loaded in one query with its users and content joined in,
+    already ordered by time, and the streams are combined with a k-way merge.
+    
+    Args:
+        limit: Maximum number of activities returned
+        per_stream: Number of most recent items taken from each stream
+        score_label: Label for the score in quiz completion details
+        include_views: Whether to include lesson views
+    
+    Returns:
+        list: Activity dicts with time, user, action and details
+    """
+    from sqlalchemy.orm import joinedload
+    from app import db, Lesson, QuizAttempt, StudentInteraction
+    from analytics_state import score_percentage
+    
+    # Recent quiz attempts with their student and quiz
+    attempts = QuizAttempt.query\
+        .options(joinedload(QuizAttempt.student), joinedload(QuizAttempt.quiz))\
+        .order_by(QuizAttempt.completed_at.desc()).limit(per_stream).all()
+    quiz_activities = [
+        {
+            'time': attempt.completed_at,
+            'user': attempt.student.username,
+            'action': 'quiz_completed',
+            'details': f"{attempt.quiz.title} - {score_label}: {int(score_percentage(attempt.score, attempt.total_points))}%"
+        }
+        for attempt in attempts if attempt.student and attempt.quiz
+    ]
+    
+    # Recent lesson creations with their teacher
+    lessons = Lesson.query.options(joinedload(Lesson.author))\
+        .order_by(Lesson.created_at.desc()).limit(per_stream).all()
+    lesson_activities = [
+        {
+            'time': lesson.created_at,
+            'user': lesson.author.username,
+            'action': 'lesson_created',
+            'details': lesson.title
+        }
+        for lesson in lessons if lesson.author
+    ]
+    
+    streams = [quiz_activities, lesson_activities]
+    
+    if include_views:
+        # Recent lesson views with their student and lesson (content_id is not a foreign key)
+        views = db.session.query(StudentInteraction, Lesson)\
+            .outerjoin(Lesson, Lesson.id == StudentInteraction.content_id)\
+            .options(joinedload(StudentInteraction.student))\
+            .filter(StudentInteraction.interaction_type == 'lesson_view')\
+            .order_by(StudentInteraction.timestamp.desc()).limit(per_stream).all()
+        streams.append([
+            {
+                'time': interaction.timestamp,
+                'user': interaction.student.username,
+                'action': 'lesson_viewed',
+                'details': lesson.title
+            }
+            for interaction, lesson in views if interaction.student and lesson
+        ])
+    
+    # Every stream is sorted newest first; ties keep stream order
+    merged = heapq.merge(*streams, key=lambda activity: activity['time'], reverse=True)
+    return list(islice(merged, limit))
@@ -5,22 +5,63 @@ Provides intelligent insights and analysis of student performance and learning p
 
 import pandas as pd
 import numpy as np
-from sklearn.cluster import KMeans
+from sklearn.cluster import KMeans, MiniBatchKMeans
 from sklearn.preprocessing import StandardScaler
-from sklearn.linear_model import LinearRegression
 from datetime import datetime, timedelta
 import json
+import math
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from collections import defaultdict
 
+# Column layout of the bulk rows accepted by analyze_class_performance_bulk
+INTERACTION_COLUMNS = ['student_id', 'interaction_type', 'duration', 'timestamp']
+ATTEMPT_COLUMNS = ['student_id', 'score', 'total_points', 'completed_at']
+
+# Columns returned by StudentAnalytics.calculate_progress_trends
+TREND_COLUMNS = ['attempts', 'slope', 'r_squared', 'trend', 'prediction', 'confidence']
+
+# Per-student metrics students are clustered on
+CLUSTER_FEATURES = ['avg_score', 'engagement', 'progress_rate', 'quiz_count', 'lesson_views']
+
+# Class size from which MiniBatchKMeans replaces full KMeans
+MINIBATCH_MIN_STUDENTS = 2000
+
+class CentroidStore:
+    """Thread-safe store of the last cluster centroids for each analysis scope"""
+    
+    def __init__(self):
+        self._centroids = {}
+        self._lock = threading.Lock()
+    
+    def get(self, scope):
+        with self._lock:
+            centroids = self._centroids.get(scope)
+            return centroids.copy() if centroids is not None else None
+    
+    def set(self, scope, centroids):
+        with self._lock:
+            self._centroids[scope] = np.array(centroids, dtype=float)
+    
+    def clear(self):
+        with self._lock:
+            self._centroids.clear()
+
 class StudentAnalytics:
     """
     AI-powered analytics for student performance tracking and insights
+    
+    Instances only hold configuration and the CentroidStore used to
+    warm-start clustering. Every estimator is created inside the call that
+    fits it, so one instance can serve concurrent requests.
     """
     
-    def __init__(self):
-        self.scaler = StandardScaler()
-        self.performance_model = LinearRegression()
-        self.clustering_model = KMeans(n_clusters=3, random_state=42)
+    def __init__(self, n_clusters=3, random_state=42, minibatch_min_students=MINIBATCH_MIN_STUDENTS):
+        self.n_clusters = n_clusters
+        self.random_state = random_state
+        self.minibatch_min_students = minibatch_min_students
+        self.centroids = CentroidStore()
         
     def analyze_student_performance(self, student_interactions, quiz_attempts):
         """
@@ -39,25 +80,65 @@ class StudentAnalytics:
         # Convert to DataFrames for analysis
         interactions_df = self._interactions_to_dataframe(student_interactions)
         attempts_df = self._attempts_to_dataframe(quiz_attempts)
+        trend_row = self._student_trend_row(attempts_df)
         
         analysis = {
             'performance_metrics': self._calculate_performance_metrics(attempts_df),
             'learning_patterns': self._analyze_learning_patterns(interactions_df),
             'engagement_score': self._calculate_engagement_score(interactions_df),
             'difficulty_areas': self._identify_difficulty_areas(attempts_df),
-            'progress_trend': self._calculate_progress_trend(attempts_df),
+            'progress_trend': self._format_progress_trend(trend_row),
             'recommendations': self._generate_recommendations(interactions_df, attempts_df),
-            'predicted_performance': self._predict_future_performance(attempts_df)
+            'predicted_performance': self._format_prediction(trend_row)
+        }
+        
+        return analysis
+    
+    def analyze_student_state(self, state):
+        """
+        Analyze individual student performance from running aggregates
+        
+        Gives the same results as analyze_student_performance without reading
+        the student's history; every metric is derived from the counters kept
+        up to date by analytics_state.
+        
+        Args:
+            state: StudentAnalyticsState row (or an object with the same attributes)
+            
+        Returns:
+            dict: Comprehensive analysis results
+        """
+        attempt_count = state.attempt_count or 0
+        interaction_count = state.interaction_count or 0
+        
+        if not attempt_count and not interaction_count:
+            return self._empty_analysis()
+        
+        avg_score = state.score_sum / attempt_count if attempt_count else None
+        engagement = self._state_engagement_score(state) if interaction_count else None
+        patterns = self._state_learning_patterns(state)
+        trend_row = self._state_trend_row(state)
+        
+        analysis = {
+            'performance_metrics': self._state_performance_metrics(state),
+            'learning_patterns': patterns,
+            'engagement_score': engagement or 0,
+            'difficulty_areas': self._state_difficulty_areas(state),
+            'progress_trend': self._format_progress_trend(trend_row),
+            'recommendations': self._recommendations_from_metrics(avg_score, engagement, patterns['learning_consistency']),
+            'predicted_performance': self._format_prediction(trend_row)
         }
         
         return analysis
     
-    def analyze_class_performance(self, all_students_data):
+    def analyze_class_performance(self, all_students_data, scope=None):
         """
         Analyze overall class performance and identify patterns
         
         Args:
             all_students_data: Dict of student_id -> (interactions, attempts)
+            scope: Optional key (e.g. 'school' or 'section:3') whose previous
+                centroids warm-start clustering and keep group labels stable
             
         Returns:
             dict: Class-wide analysis results
@@ -86,19 +167,164 @@ class StudentAnalytics:
         # Convert to DataFrame for analysis
         class_df = pd.DataFrame(class_metrics)
         
+        return self._analyze_class_dataframe(class_df, scope)
+    
+    def analyze_class_performance_bulk(self, student_ids, interaction_rows, attempt_rows, scope=None):
+        """
+        Analyze class performance from bulk-loaded rows
+        
+        Produces the same results as analyze_class_performance, but computes
+        every per-student metric with grouped operations in a single pass
+        instead of running a full analysis for each student.
+        
+        Args:
+            student_ids: Ordered list of student ids to include
+            interaction_rows: Sequence of rows matching INTERACTION_COLUMNS
+            attempt_rows: Sequence of rows matching ATTEMPT_COLUMNS
+            scope: Optional clustering scope, as for analyze_class_performance
+            
+        Returns:
+            dict: Class-wide analysis results
+        """
+        if not student_ids:
+            return self._empty_class_analysis()
+        
+        class_df = self._build_class_metrics(student_ids, interaction_rows, attempt_rows)
+        
+        return self._analyze_class_dataframe(class_df, scope)
+    
+    def analyze_sections(self, sections, max_workers=1):
+        """
+        Analyze each section on its own and merge the results
+        
+        Sections are clustered separately with their own warm-start scope
+        ('section:<key>'), and evaluated in a process pool when max_workers
+        is above 1. The merged overview, distribution, engagement and
+        recommendations cover all students exactly as a single analysis would.
+        
+        Args:
+            sections: Dict of section key -> (student_ids, interaction_rows,
+                attempt_rows), rows as for analyze_class_performance_bulk
+            max_workers: Number of worker processes; 1 analyzes in-process
+            
+        Returns:
+            dict: Merged class analysis with each section's analysis under 'sections'
+        """
+        sections = {key: rows for key, rows in sections.items() if rows[0]}
+        if not sections:
+            analysis = self._empty_class_analysis()
+            analysis['sections'] = {}
+            return analysis
+        
+        if (max_workers or 1) <= 1 or len(sections) == 1:
+            results = {
+                key: self.analyze_class_performance_bulk(*rows, scope=f'section:{key}')
+                for key, rows in sections.items()
+            }
+        else:
+            config = (self.n_clusters, self.random_state, self.minibatch_min_students)
+            pool = get_section_pool(max_workers)
+            futures = {
+                key: pool.submit(_analyze_section, config, f'section:{key}', rows, self.centroids.get(f'section:{key}'))
+                for key, rows in sections.items()
+            }
+            results = {}
+            for key, future in futures.items():
+                results[key], centroids = future.result()
+                if centroids is not None:
+                    self.centroids.set(f'section:{key}', centroids)
+        
+        return self.merge_section_analyses(results)
+    
+    def merge_section_analyses(self, results):
+        """
+        Merge per-section class analyses into one school-wide analysis
+        
+        Args:
+            results: Dict of section key -> class analysis
+            
+        Returns:
+            dict: Merged class analysis with the inputs under 'sections'
+        """
+        analyses = list(results.values())
+        overviews = [analysis['class_overview'] for analysis in analyses]
+        total_students = sum(overview['total_students'] for overview in overviews)
+        
+        def weighted_mean(values):
+            return float(sum(value * overview['total_students'] for value, overview in zip(values, overviews)) / total_students) \
+                if total_students else 0
+        
+        average_score = weighted_mean([overview['average_score'] for overview in overviews])
+        average_engagement = weighted_mean([overview['average_engagement'] for overview in overviews])
+        
+        class_overview = {
+            'total_students': total_students,
+            'average_score': average_score,
+            'average_engagement': average_engagement,
+            'total_quiz_attempts': sum(overview['total_quiz_attempts'] for overview in overviews),
+            'total_lesson_views': sum(overview['total_lesson_views'] for overview in overviews)
+        }
+        
+        performance_distribution = defaultdict(int)
+        engagement_insights = defaultdict(int)
+        student_groups = {}
+        at_risk_students = []
+        top_performers = []
+        
+        for key, analysis in results.items():
+            for band, count in analysis['performance_distribution'].items():
+                performance_distribution[band] += count
+            for level, count in analysis['engagement_insights'].items():
+                if level != 'average_engagement':
+                    engagement_insights[level] += count
+            for group, summary in analysis['student_groups'].items():
+                student_groups[f'section_{key}_{group}'] = summary
+            at_risk_students.extend(analysis['at_risk_students'])
+            top_performers.extend(analysis['top_performers'])
+        
+        engagement_insights['average_engagement'] = average_engagement
+        
+        # A single analysis lists at-risk students in student order, which
+        # load_class_rows gives by id
+        at_risk_students = sorted(at_risk_students, key=lambda student: student['student_id'])
+        
+        # Every school-wide top performer is among the top performers of its section
+        top_performers = sorted(top_performers, key=lambda student: student['avg_score'], reverse=True)[:5]
+        
+        clustering = [analysis['clustering'] for analysis in analyses]
+        
+        return {
+            'class_overview': class_overview,
+            'performance_distribution': dict(performance_distribution),
+            'student_groups': student_groups,
+            'at_risk_students': at_risk_students,
+            'top_performers': top_performers,
+            'engagement_insights': dict(engagement_insights),
+            'recommendations': self._class_recommendations_from_metrics(
+                average_score, average_engagement, len(at_risk_students), total_students
+            ),
+            'clustering': {
+                'algorithm': 'per_section',
+                'n_iter': max(info['n_iter'] for info in clustering),
+                'warm_start': all(info['warm_start'] for info in clustering)
+            },
+            'sections': results
+        }
+    
+    def _analyze_class_dataframe(self, class_df, scope=None):
+        """Run clustering and class-level analysis on per-student metrics"""
         if class_df.empty:
             return self._empty_class_analysis()
         
         # Perform clustering to identify student groups
-        feature_columns = ['avg_score', 'engagement', 'progress_rate', 'quiz_count', 'lesson_views']
-        features = class_df[feature_columns].fillna(0)
+        features = class_df[CLUSTER_FEATURES].fillna(0)
         
-        if len(features) >= 3:  # Need at least 3 students for clustering
-            scaled_features = self.scaler.fit_transform(features)
-            clusters = self.clustering_model.fit_predict(scaled_features)
+        if len(features) >= max(3, self.n_clusters):  # Need at least 3 students for clustering
+            clusters, clustering = self._cluster_students(features.to_numpy(dtype=float), scope)
             class_df['cluster'] = clusters
         else:
             class_df['cluster'] = 0
+            clustering = {'algorithm': 'none', 'n_iter': 0, 'warm_start': False}
         
         analysis = {
             'class_overview': self._calculate_class_overview(class_df),
@@ -107,11 +333,195 @@ class StudentAnalytics:
             'at_risk_students': self._identify_at_risk_students(class_df),
             'top_performers': self._identify_top_performers(class_df),
             'engagement_insights': self._analyze_class_engagement(class_df),
-            'recommendations': self._generate_class_recommendations(class_df)
+            'recommendations': self._generate_class_recommendations(class_df),
+            'clustering': clustering
         }
         
         return analysis
     
+    def _cluster_students(self, features, scope):
+        """
+        Cluster students on their class metrics
+        
+        With a scope, the previous centroids for that scope seed the fit, so
+        it converges in a few iterations and each group keeps the label it had
+        on the last call. Without previous centroids, groups are numbered by
+        ascending average score.
+        
+        Args:
+            features: Array of per-student values for CLUSTER_FEATURES
+            scope: Key the centroids are stored under (e.g. 'section:3'), or
+                None to fit from scratch without storing them
+            
+        Returns:
+            tuple: (cluster label per student, clustering info for the response)
+        """
+        scaler = StandardScaler()
+        scaled_features = scaler.fit_transform(features)
+        
+        previous_centroids = self.centroids.get(scope) if scope is not None else None
+        warm_start = previous_centroids is not None and previous_centroids.shape == (self.n_clusters, features.shape[1])
+        
+        if warm_start:
+            init, n_init = scaler.transform(previous_centroids), 1
+        else:
+            init, n_init = 'k-means++', 10
+        
+        if len(features) >= self.minibatch_min_students:
+            algorithm = 'minibatch_kmeans'
+            clustering_model = MiniBatchKMeans(
+                n_clusters=self.n_clusters, init=init, n_init=n_init if warm_start else 3,
+                batch_size=1024, random_state=self.random_state
+            )
+        else:
+            algorithm = 'kmeans'
+            clustering_model = KMeans(n_clusters=self.n_clusters, init=init, n_init=n_init, random_state=self.random_state)
+        
+        labels = clustering_model.fit_predict(scaled_features)
+        centroids = scaler.inverse_transform(clustering_model.cluster_centers_)
+        
+        if not warm_start:
+            # Canonical numbering for a first fit: group_0 has the lowest average score
+            order = np.argsort(centroids[:, CLUSTER_FEATURES.index('avg_score')], kind='mergesort')
+            centroids = centroids[order]
+            labels = np.argsort(order)[labels]
+        
+        if scope is not None:
+            self.centroids.set(scope, centroids)
+        
+        return labels, {
+            'algorithm': algorithm,
+            'n_iter': int(clustering_model.n_iter_),
+            'warm_start': bool(warm_start)
+        }
+    
+    def _build_class_metrics(self, student_ids, interaction_rows, attempt_rows):
+        """Compute per-student class metrics with grouped operations"""
+        index = pd.Index(student_ids, name='student_id')
+        interactions_df = pd.DataFrame.from_records(list(interaction_rows), columns=INTERACTION_COLUMNS)
+        attempts_df = pd.DataFrame.from_records(list(attempt_rows), columns=ATTEMPT_COLUMNS)
+        
+        # Quiz metrics: average score, attempt count and progress slope
+        attempts_df = attempts_df[attempts_df['student_id'].isin(index)]
+        total_points = attempts_df['total_points'].fillna(0).astype(float)
+        scores = attempts_df['score'].fillna(0).astype(float)
+        attempts_df = attempts_df.assign(
+            score_percentage=np.where(total_points > 0, scores / total_points.where(total_points > 0) * 100, 0),
+            completed_at=pd.to_datetime(attempts_df['completed_at'])
+        )
+        attempts_df = attempts_df.sort_values(['student_id', 'completed_at'], kind='mergesort')
+        attempt_groups = attempts_df.groupby('student_id')['score_percentage']
+        progress_trends = self.calculate_progress_trends(
+            attempts_df['student_id'].values, attempts_df['score_percentage'].values
+        )
+        
+        # Interaction metrics: engagement factors and lesson views
+        interactions_df = interactions_df[interactions_df['student_id'].isin(index)]
+        interactions_df = interactions_df.assign(
+            duration=interactions_df['duration'].fillna(0).astype(float),
+            timestamp=pd.to_datetime(interactions_df['timestamp']),
+            is_lesson_view=(interactions_df['interaction_type'] == 'lesson_view')
+        )
+        interaction_groups = interactions_df.groupby('student_id')
+        interaction_count = interaction_groups.size().reindex(index, fill_value=0)
+        
+        # Mirrors _calculate_engagement_score for every student at once
+        frequency = np.minimum(interaction_count / 10, 1) * 30
+        duration = np.minimum(interaction_groups['duration'].mean().reindex(index, fill_value=0) / 300, 1) * 25
+        consistency = self._grouped_consistency_scores(interactions_df).reindex(index, fill_value=0) * 25
+        variety = np.minimum(interaction_groups['interaction_type'].nunique().reindex(index, fill_value=0) / 3, 1) * 20
+        engagement = np.minimum(frequency + duration + consistency + variety, 100).where(interaction_count > 0, 0)
+        
+        class_df = pd.DataFrame({
+            'avg_score': attempt_groups.mean().reindex(index, fill_value=0).astype(float),
+            'engagement': engagement.astype(float),
+            'progress_rate': progress_trends['slope'].reindex(index, fill_value=0).astype(float),
+            'quiz_count': attempt_groups.size().reindex(index, fill_value=0).astype(int),
+            'lesson_views': interaction_groups['is_lesson_view'].sum().reindex(index, fill_value=0).astype(int)
+        }, index=index)
+        
+        return class_df.reset_index()
+    
+    def _grouped_consistency_scores(self, interactions_df):
+        """Vectorized _calculate_consistency_score, one value per student"""
+        if interactions_df.empty:
+            return pd.Series(dtype=float)
+        
+        days = interactions_df['timestamp'].dt.normalize()
+        daily_activity = interactions_df.groupby(['student_id', days]).size()
+        daily_groups = daily_activity.groupby(level='student_id')
+        
+        active_days = daily_groups.size()
+        cv = daily_groups.std() / daily_groups.mean()
+        
+        return (1 - cv).clip(lower=0).where(active_days > 1, 1.0)
+    
+    def calculate_progress_trends(self, student_ids, score_percentages):
+        """
+        Calculate progress trends and predictions for many students at once
+        
+        Attempts are fitted against their index, so slope and R-squared have
+        closed forms equal to a least-squares fit on np.arange(n); every
+        student is handled in the same vectorized pass.
+        
+        Args:
+            student_ids: Student id of each attempt; each student's attempts
+                must be contiguous and in completion order
+            score_percentages: Score percentage of each attempt
+            
+        Returns:
+            pd.DataFrame: Indexed by student id with attempts, slope, r_squared,
+            trend, prediction and confidence columns
+        """
+        student_ids = np.asarray(student_ids)
+        y = np.asarray(score_percentages, dtype=float)
+        
+        if len(student_ids) == 0:
+            return pd.DataFrame(columns=TREND_COLUMNS)
+        
+        # Segment boundaries of each student's attempt series
+        starts = np.flatnonzero(np.r_[True, student_ids[1:] != student_ids[:-1]])
+        counts = np.diff(np.r_[starts, len(student_ids)])
+        ends = starts + counts
+        segment = np.repeat(np.arange(len(starts)), counts)
+        n = counts.astype(float)
+        
+        # Centered sums of squares for x = 0..n-1
+        x_centered = np.arange(len(y)) - starts[segment] - ((n - 1) / 2)[segment]
+        y_centered = y - (np.add.reduceat(y, starts) / n)[segment]
+        sxx = n * (n * n - 1) / 12
+        sxy = np.add.reduceat(x_centered * y_centered, starts)
+        syy = np.add.reduceat(y_centered * y_centered, starts)
+        
+        enough = counts >= 2
+        slope = np.divide(sxy, sxx, out=np.zeros_like(sxy), where=enough)
+        # A constant series is fitted exactly, which LinearRegression scores as 1
+        r_squared = np.where(enough, 1.0, 0.0)
+        varying = enough & (syy > 0)
+        r_squared[varying] = sxy[varying] ** 2 / (sxx[varying] * syy[varying])
+        
+        trend = np.select(
+            [~enough, slope > 2, slope < -2],
+            ['insufficient_data', 'improving', 'declining'],
+            default='stable'
+        )
+        
+        # Predict 2 attempts ahead from the average of the last three
+        cumulative = np.r_[0, np.cumsum(y)]
+        tail_starts = np.maximum(ends - 3, starts)
+        current_avg = (cumulative[ends] - cumulative[tail_starts]) / (ends - tail_starts)
+        prediction = np.clip(current_avg + slope * 2, 0, 100)
+        confidence = np.minimum(r_squared * 100, 95)  # Max 95% confidence
+        
+        return pd.DataFrame({
+            'attempts': counts,
+            'slope': slope,
+            'r_squared': r_squared,
+            'trend': trend,
+            'prediction': prediction,
+            'confidence': confidence
+        }, index=pd.Index(student_ids[starts], name='student_id'), columns=TREND_COLUMNS)
+    
     def _interactions_to_dataframe(self, interactions):
         """Convert StudentInteraction objects to DataFrame"""
         if not interactions:
@@ -145,13 +555,15 @@ class StudentAnalytics:
                 'score': attempt.score,
                 'total_points': attempt.total_points,
                 'score_percentage': score_percentage,
-                'quiz_id': attempt.quiz_id
+                'quiz_id': attempt.quiz_id,
+                'attempt_id': getattr(attempt, 'id', None)
             })
         
         df = pd.DataFrame(data)
         if not df.empty:
             df['completed_at'] = pd.to_datetime(df['completed_at'])
-            df = df.sort_values('completed_at')
+            # Attempts completed at the same time stay in the order they were recorded
+            df = df.sort_values(['completed_at', 'attempt_id'], kind='mergesort')
         return df
     
     def _calculate_performance_metrics(self, attempts_df):
@@ -190,21 +602,14 @@ class StudentAnalytics:
         preferred_hour = interactions_df['hour'].mode().iloc[0] if not interactions_df['hour'].mode().empty else 12
         
         # Convert hour to readable time
-        if 6 <= preferred_hour < 12:
-            preferred_time = 'Morning'
-        elif 12 <= preferred_hour < 18:
-            preferred_time = 'Afternoon'
-        elif 18 <= preferred_hour < 22:
-            preferred_time = 'Evening'
-        else:
-            preferred_time = 'Night'
+        preferred_time = self._describe_hour(preferred_hour)
         
         # Calculate average session duration
         avg_duration = interactions_df['duration'].mean()
         
         # Analyze content preference
         content_counts = interactions_df['interaction_type'].value_counts()
-        content_preference = content_counts.index[0] if not content_counts.empty else 'No data'
+        content_preference = self._most_frequent_type(content_counts.to_dict()) if not content_counts.empty else 'No data'
         
         # Calculate learning consistency (days with activity)
         unique_days = interactions_df['timestamp'].dt.date.nunique()
@@ -218,6 +623,22 @@ class StudentAnalytics:
             'learning_consistency': float(consistency)
         }
     
+    def _most_frequent_type(self, type_counts):
+        """Most frequent interaction type; ties go to the first type name alphabetically"""
+        most = max(type_counts.values())
+        return min(interaction_type for interaction_type, count in type_counts.items() if count == most)
+    
+    def _describe_hour(self, hour):
+        """Convert an hour of the day to a readable time period"""
+        if 6 <= hour < 12:
+            return 'Morning'
+        elif 12 <= hour < 18:
+            return 'Afternoon'
+        elif 18 <= hour < 22:
+            return 'Evening'
+        else:
+            return 'Night'
+    
     def _calculate_engagement_score(self, interactions_df):
         """Calculate student engagement score (0-100)"""
         if interactions_df.empty:
@@ -283,43 +704,50 @@ class StudentAnalytics:
         
         return difficulty_areas
     
+    def _student_trend_row(self, attempts_df):
+        """Run the batched trend calculation for a single student's attempts"""
+        if attempts_df.empty:
+            return None
+        
+        attempts_df = attempts_df.sort_values('completed_at', kind='mergesort')
+        trends = self.calculate_progress_trends(
+            np.zeros(len(attempts_df), dtype=int), attempts_df['score_percentage'].values
+        )
+        return trends.iloc[0]
+    
     def _calculate_progress_trend(self, attempts_df):
         """Calculate progress trend over time"""
-        if len(attempts_df) < 2:
+        return self._format_progress_trend(self._student_trend_row(attempts_df))
+    
+    def _format_progress_trend(self, trend_row):
+        """Build the progress trend result from a calculate_progress_trends row"""
+        if trend_row is None or trend_row['attempts'] < 2:
             return {'trend': 'insufficient_data', 'slope': 0, 'r_squared': 0}
         
-        # Prepare data for linear regression
-        attempts_df = attempts_df.sort_values('completed_at')
-        X = np.arange(len(attempts_df)).reshape(-1, 1)
-        y = attempts_df['score_percentage'].values
-        
-        # Fit linear regression
-        self.performance_model.fit(X, y)
-        slope = self.performance_model.coef_[0]
-        r_squared = self.performance_model.score(X, y)
-        
-        # Determine trend
-        if slope > 2:
-            trend = 'improving'
-        elif slope < -2:
-            trend = 'declining'
-        else:
-            trend = 'stable'
-        
         return {
-            'trend': trend,
-            'slope': float(slope),
-            'r_squared': float(r_squared)
+            'trend': trend_row['trend'],
+            'slope': float(trend_row['slope']),
+            'r_squared': float(trend_row['r_squared'])
         }
     
     def _generate_recommendations(self, interactions_df, attempts_df):
         """Generate personalized recommendations"""
+        avg_score = attempts_df['score_percentage'].mean() if not attempts_df.empty else None
+        engagement = self._calculate_engagement_score(interactions_df) if not interactions_df.empty else None
+        patterns = self._analyze_learning_patterns(interactions_df)
+        
+        return self._recommendations_from_metrics(avg_score, engagement, patterns['learning_consistency'])
+    
+    def _recommendations_from_metrics(self, avg_score, engagement, learning_consistency):
+        """Generate recommendations from average score, engagement and consistency
+        
+        avg_score and engagement are None when the student has no attempts or
+        no interactions respectively.
+        """
         recommendations = []
         
         # Performance-based recommendations
-        if not attempts_df.empty:
-            avg_score = attempts_df['score_percentage'].mean()
-            
+        if avg_score is not None:
             if avg_score < 60:
                 recommendations.append({
                     'type': 'performance',
@@ -340,9 +768,7 @@ class StudentAnalytics:
                 })
         
         # Engagement-based recommendations
-        if not interactions_df.empty:
-            engagement = self._calculate_engagement_score(interactions_df)
-            
+        if engagement is not None:
             if engagement < 40:
                 recommendations.append({
                     'type': 'engagement',
@@ -354,8 +780,7 @@ class StudentAnalytics:
                 })
         
         # Learning pattern recommendations
-        patterns = self._analyze_learning_patterns(interactions_df)
-        if patterns['learning_consistency'] < 50:
+        if learning_consistency < 50:
             recommendations.append({
                 'type': 'consistency',
                 'priority': 'medium',
@@ -369,22 +794,155 @@ class StudentAnalytics:
     
     def _predict_future_performance(self, attempts_df):
         """Predict future performance based on current trends"""
-        if len(attempts_df) < 3:
+        return self._format_prediction(self._student_trend_row(attempts_df))
+    
+    def _format_prediction(self, trend_row):
+        """Build the performance prediction from a calculate_progress_trends row"""
+        if trend_row is None or trend_row['attempts'] < 3:
             return {'prediction': 'insufficient_data', 'confidence': 0}
         
-        trend = self._calculate_progress_trend(attempts_df)
-        current_avg = attempts_df['score_percentage'].tail(3).mean()
+        return {
+            'prediction': float(trend_row['prediction']),
+            'confidence': float(trend_row['confidence']),
+            'trend': trend_row['trend']
+        }
+    
+    def _state_performance_metrics(self, state):
+        """Performance metrics from running attempt aggregates"""
+        n = state.attempt_count or 0
+        if not n:
+            return {
+                'average_score': 0,
+                'highest_score': 0,
+                'lowest_score': 0,
+                'total_attempts': 0,
+                'improvement_rate': 0
+            }
+        
+        # Mean of the last n // 2 attempts minus mean of the first n // 2
+        half = n // 2
+        improvement_rate = (state.second_half_sum - state.first_half_sum) / half if half else 0
+        
+        return {
+            'average_score': float(state.score_sum / n),
+            'highest_score': float(state.score_max),
+            'lowest_score': float(state.score_min),
+            'total_attempts': int(n),
+            'improvement_rate': float(improvement_rate)
+        }
+    
+    def _state_learning_patterns(self, state):
+        """Learning patterns from running interaction aggregates"""
+        n = state.interaction_count or 0
+        if not n:
+            return {
+                'preferred_time': 'No data',
+                'session_duration': 0,
+                'content_preference': 'No data',
+                'learning_consistency': 0
+            }
+        
+        hour_counts = json.loads(state.hour_counts)
+        type_counts = json.loads(state.type_counts)
         
-        # Simple prediction based on trend
-        predicted_score = current_avg + (trend['slope'] * 2)  # Predict 2 attempts ahead
-        predicted_score = max(0, min(100, predicted_score))  # Clamp to valid range
+        # First of the most frequent hours, like Series.mode().iloc[0]
+        preferred_hour = hour_counts.index(max(hour_counts))
+        content_preference = self._most_frequent_type(type_counts) if type_counts else 'No data'
         
-        confidence = min(trend['r_squared'] * 100, 95)  # Max 95% confidence
+        total_days = (state.last_interaction_at - state.first_interaction_at).days + 1
+        consistency = (state.active_days / total_days) * 100 if total_days > 0 else 0
         
         return {
-            'prediction': float(predicted_score),
-            'confidence': float(confidence),
-            'trend': trend['trend']
+            'preferred_time': self._describe_hour(preferred_hour),
+            'session_duration': float(state.duration_sum / n),
+            'content_preference': content_preference,
+            'learning_consistency': float(consistency)
+        }
+    
+    def _state_engagement_score(self, state):
+        """Engagement score (0-100) from running interaction aggregates"""
+        n = state.interaction_count
+        days = state.active_days
+        
+        # Coefficient of variation of daily activity counts
+        if days > 1:
+            mean = n / days
+            variance = max(state.daily_sq_sum - n * n / days, 0) / (days - 1)
+            consistency = max(0, 1 - math.sqrt(variance) / mean)
+        else:
+            consistency = 1 if days == 1 else 0
+        
+        variety = min(len(json.loads(state.type_counts)) / 3, 1)
+        
+        factors = {
+            'frequency': min(n / 10, 1) * 30,
+            'duration': min((state.duration_sum / n) / 300, 1) * 25,
+            'consistency': consistency * 25,
+            'variety': variety * 20
+        }
+        
+        return float(min(sum(factors.values()), 100))
+    
+    def _state_difficulty_areas(self, state):
+        """Difficulty areas from per-quiz attempt aggregates"""
+        n = state.attempt_count or 0
+        if not n:
+            return []
+        
+        overall_avg = state.score_sum / n
+        quiz_stats = json.loads(state.quiz_stats)
+        difficulty_areas = []
+        
+        for quiz_id in sorted(quiz_stats, key=int):
+            attempts, score_sum = quiz_stats[quiz_id]
+            avg_score = score_sum / attempts
+            if avg_score < overall_avg * 0.8:  # 20% below average
+                difficulty_areas.append({
+                    'quiz_id': int(quiz_id),
+                    'average_score': float(avg_score),
+                    'attempts': int(attempts)
+                })
+        
+        return difficulty_areas
+    
+    def _state_trend_row(self, state):
+        """Closed-form trend row, as from calculate_progress_trends, from score sums"""
+        n = state.attempt_count or 0
+        if not n:
+            return None
+        
+        sxx = n * (n * n - 1) / 12
+        sxy = state.score_xy_sum - (n - 1) / 2 * state.score_sum
+        syy = state.score_sq_sum - state.score_sum ** 2 / n
+        slope = sxy / sxx if n >= 2 else 0.0
+        
+        # Treat round-off in the sum of squares as a constant series
+        if n < 2:
+            r_squared = 0.0
+        elif syy <= 1e-9 * max(state.score_sq_sum, 1):
+            r_squared = 1.0
+        else:
+            r_squared = min(sxy * sxy / (sxx * syy), 1.0)
+        
+        if n < 2:
+            trend = 'insufficient_data'
+        elif slope > 2:
+            trend = 'improving'
+        elif slope < -2:
+            trend = 'declining'
+        else:
+            trend = 'stable'
+        
+        recent_scores = json.loads(state.recent_scores)
+        current_avg = sum(recent_scores) / len(recent_scores)
+        
+        return {
+            'attempts': n,
+            'slope': slope,
+            'r_squared': r_squared,
+            'trend': trend,
+            'prediction': max(0, min(100, current_avg + slope * 2)),
+            'confidence': min(r_squared * 100, 95)
         }
     
     def _calculate_class_overview(self, class_df):
@@ -473,11 +1031,17 @@ class StudentAnalytics:
     
     def _generate_class_recommendations(self, class_df):
         """Generate recommendations for the entire class"""
+        return self._class_recommendations_from_metrics(
+            class_df['avg_score'].mean(),
+            class_df['engagement'].mean(),
+            len(self._identify_at_risk_students(class_df)),
+            len(class_df)
+        )
+    
+    def _class_recommendations_from_metrics(self, avg_score, avg_engagement, at_risk_count, total_students):
+        """Build class recommendations from class averages and the at-risk count"""
         recommendations = []
         
-        avg_score = class_df['avg_score'].mean()
-        avg_engagement = class_df['engagement'].mean()
-        
         if avg_score < 70:
             recommendations.append({
                 'type': 'class_performance',
@@ -498,8 +1062,7 @@ class StudentAnalytics:
                 'action': 'increase_interactivity'
             })
         
-        at_risk_count = len(self._identify_at_risk_students(class_df))
-        if at_risk_count > len(class_df) * 0.2:  # More than 20% at risk
+        if at_risk_count > total_students * 0.2:  # More than 20% at risk
             recommendations.append({
                 'type': 'at_risk',
                 'priority': 'high',
@@ -572,12 +1135,56 @@ class StudentAnalytics:
                 'low_engagement': 0,
                 'average_engagement': 0
             },
-            'recommendations': []
+            'recommendations': [],
+            'clustering': {'algorithm': 'none', 'n_iter': 0, 'warm_start': False}
         }
 
+def _analyze_section(config, scope, rows, centroids):
+    """
+    Analyze one section in a worker process
+    
+    Returns:
+        tuple: (class analysis, centroids to warm-start the next call)
+    """
+    analytics_engine = StudentAnalytics(*config)
+    if centroids is not None:
+        analytics_engine.centroids.set(scope, centroids)
+    analysis = analytics_engine.analyze_class_performance_bulk(*rows, scope=scope)
+    return analysis, analytics_engine.centroids.get(scope)
+
+_section_pool = None
+_section_pool_lock = threading.Lock()
+
+def get_section_pool(max_workers):
+    """
+    Get the shared process pool for per-section analysis
+    
+    Workers are spawned rather than forked so they do not inherit the
+    OpenMP and database state of a threaded web worker. The pool is created
+    on first use with max_workers processes and reused afterwards, until
+    shutdown_section_pool.
+    """
+    global _section_pool
+    with _section_pool_lock:
+        if _section_pool is None:
+            _section_pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn'))
+        return _section_pool
+
+def shutdown_section_pool():
+    """Stop the processes of the shared section pool, if it was started"""
+    global _section_pool
+    with _section_pool_lock:
+        pool, _section_pool = _section_pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
 # Utility function to get analytics instance
+_instance_lock = threading.Lock()
+
 def get_analytics_instance():
-    """Get a singleton instance of StudentAnalytics"""
+    """Get a singleton instance of StudentAnalytics, safe to share between threads"""
     if not hasattr(get_analytics_instance, '_instance'):
-        get_analytics_instance._instance = StudentAnalytics()
+        with _instance_lock:
+            if not hasattr(get_analytics_instance, '_instance'):
+                get_analytics_instance._instance = StudentAnalytics()
     return get_analytics_instance._instance
\ No newline at end of file
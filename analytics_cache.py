@@ -0,0 +1,351 @@
+"""
+Result cache for School Platform analytics
+Stores analysis results keyed by student or class scope and drops them as soon
+as a new QuizAttempt or StudentInteraction is committed for a student they cover.
+School-wide results cover every student, so only quiz attempts and account
+changes drop them; they expire after a short TTL to pick up lesson views.
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+
+class MemoryCacheBackend:
+    """
+    In-process LRU store with per-entry TTL
+    
+    Entries carry tags; invalidating a tag drops every entry carrying it and
+    bumps the tag's generation so results computed before the invalidation
+    are not stored afterwards.
+    """
+    
+    # Invalidations only reach this process
+    shared = False
+    
+    def __init__(self, max_entries=1024, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value, tags)
+        self._tags = {}  # tag -> set of keys
+        self._generations = {}
+        self._counters = dict.fromkeys(['hits', 'misses', 'evictions', 'expirations', 'invalidations'], 0)
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._counters['misses'] += 1
+                return None
+            
+            expires_at, value, tags = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self._counters['expirations'] += 1
+                self._counters['misses'] += 1
+                return None
+            
+            self._entries.move_to_end(key)
+            self._counters['hits'] += 1
+            return value
+    
+    def generation(self, tags):
+        with self._lock:
+            return tuple(self._generations.get(tag, 0) for tag in tags)
+    
+    def set(self, key, value, tags=(), generation=None, ttl=None):
+        with self._lock:
+            # Skip results computed from data that was invalidated meanwhile
+            if generation is not None and generation != tuple(self._generations.get(tag, 0) for tag in tags):
+                return False
+            
+            if key in self._entries:
+                self._remove(key)
+            
+            self._entries[key] = (time.monotonic() + (ttl or self.ttl), value, tuple(tags))
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._counters['evictions'] += 1
+            return True
+    
+    def invalidate(self, tags):
+        with self._lock:
+            removed = 0
+            for tag in tags:
+                self._generations[tag] = self._generations.get(tag, 0) + 1
+                for key in list(self._tags.get(tag, ())):
+                    self._remove(key)
+                    removed += 1
+            self._counters['invalidations'] += removed
+            return removed
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+    
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['entries'] = len(self._entries)
+            stats['max_entries'] = self.max_entries
+            stats['ttl'] = self.ttl
+            return stats
+    
+    def _remove(self, key):
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+class RedisCacheBackend:
+    """
+    Redis store shared by every gunicorn worker
+    
+    Entries expire through Redis TTLs; a sorted set of access times keeps
+    the entry count bounded with LRU eviction, and counters live in a Redis
+    hash so stats cover all workers. Requires the optional redis package.
+    """
+    
+    # Invalidations reach every worker
+    shared = True
+    
+    def __init__(self, url, max_entries=1024, ttl=300, prefix='analytics:'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError('ANALYTICS_CACHE_BACKEND=redis requires the redis package')
+        
+        self.client = redis.Redis.from_url(url)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.prefix = prefix
+        self._lru_key = prefix + 'lru'
+        self._stats_key = prefix + 'stats'
+    
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        pipe = self.client.pipeline()
+        if value is None:
+            pipe.zrem(self._lru_key, key)
+            pipe.hincrby(self._stats_key, 'misses', 1)
+        else:
+            pipe.zadd(self._lru_key, {key: time.time()})
+            pipe.hincrby(self._stats_key, 'hits', 1)
+        pipe.execute()
+        return json.loads(value) if value is not None else None
+    
+    def generation(self, tags):
+        if not tags:
+            return ()
+        values = self.client.mget([self.prefix + 'gen:' + tag for tag in tags])
+        return tuple(int(value or 0) for value in values)
+    
+    def set(self, key, value, tags=(), generation=None, ttl=None):
+        if generation is not None and generation != self.generation(tags):
+            return False
+        
+        pipe = self.client.pipeline()
+        pipe.setex(self.prefix + key, ttl or self.ttl, json.dumps(value, default=_json_default))
+        pipe.zadd(self._lru_key, {key: time.time()})
+        for tag in tags:
+            pipe.sadd(self.prefix + 'tag:' + tag, key)
+            pipe.expire(self.prefix + 'tag:' + tag, self.ttl)
+        pipe.execute()
+        
+        overflow = self.client.zcard(self._lru_key) - self.max_entries
+        if overflow > 0:
+            evicted = [member.decode() for member, _ in self.client.zpopmin(self._lru_key, overflow)]
+            if evicted:
+                pipe = self.client.pipeline()
+                pipe.delete(*[self.prefix + member for member in evicted])
+                pipe.hincrby(self._stats_key, 'evictions', len(evicted))
+                pipe.execute()
+        return True
+    
+    def invalidate(self, tags):
+        removed = 0
+        for tag in tags:
+            tag_key = self.prefix + 'tag:' + tag
+            keys = [member.decode() for member in self.client.smembers(tag_key)]
+            pipe = self.client.pipeline()
+            pipe.incr(self.prefix + 'gen:' + tag)
+            pipe.delete(tag_key)
+            if keys:
+                pipe.delete(*[self.prefix + key for key in keys])
+                pipe.zrem(self._lru_key, *keys)
+            results = pipe.execute()
+            if keys:
+                removed += results[2]  # Entries still present, not already evicted or expired
+        if removed:
+            self.client.hincrby(self._stats_key, 'invalidations', removed)
+        return removed
+    
+    def clear(self):
+        keys = list(self.client.scan_iter(self.prefix + '*'))
+        if keys:
+            self.client.delete(*keys)
+    
+    def stats(self):
+        counters = {key.decode(): int(value) for key, value in self.client.hgetall(self._stats_key).items()}
+        stats = {name: counters.get(name, 0) for name in ['hits', 'misses', 'evictions', 'expirations', 'invalidations']}
+        stats['entries'] = self.client.zcard(self._lru_key)
+        stats['max_entries'] = self.max_entries
+        stats['ttl'] = self.ttl
+        return stats
+
+class AnalyticsCache:
+    """
+    Cache of analytics results with write invalidation
+    
+    Student results are tagged student:<id>; class results are tagged with
+    every section they cover (section:<id>, or school for the whole school),
+    so a write for a student only drops the results that include them.
+    Results tagged school are kept at most school_ttl seconds, since lesson
+    views do not invalidate them.
+    """
+    
+    def __init__(self, backend=None, school_ttl=30):
+        self.backend = backend or MemoryCacheBackend()
+        self.school_ttl = school_ttl
+    
+    def get_or_compute(self, key, compute, tags=()):
+        """
+        Return the cached result for key, computing and storing it on a miss
+        
+        Args:
+            key: Cache key, e.g. 'student_analysis:12'
+            compute: Callable producing the result
+            tags: Tags the entry is invalidated by
+        """
+        value = self.backend.get(key)
+        if value is not None:
+            return value
+        
+        generation = self.backend.generation(tags)
+        value = compute()
+        self.backend.set(key, value, tags, generation, ttl=self.school_ttl if SCHOOL_TAG in tags else None)
+        return value
+    
+    def invalidate_students(self, students, school=True):
+        """
+        Drop cached results covering the given students
+        
+        Args:
+            students: Iterable of (student_id, section_id) pairs
+            school: Also drop the school-wide results; lesson views leave
+                them to expire after school_ttl
+        """
+        tags = {SCHOOL_TAG} if school else set()
+        for student_id, section_id in students:
+            tags.add(student_tag(student_id))
+            tags.add(section_tag(section_id))
+        return self.backend.invalidate(sorted(tags))
+    
+    def clear(self):
+        """Drop every cached result"""
+        self.backend.clear()
+    
+    def stats(self):
+        return self.backend.stats()
+
+# Tag of the results covering the whole school
+SCHOOL_TAG = 'school'
+
+def student_tag(student_id):
+    return f'student:{student_id}'
+
+def section_tag(section_id):
+    return f'section:{section_id}' if section_id is not None else 'section:none'
+
+# Shared cache instance, configured by init_app
+analytics_cache = AnalyticsCache()
+
+def init_app(app, db):
+    """
+    Configure the shared cache from app settings and hook invalidation into
+    the database session
+    
+    Settings:
+        ANALYTICS_CACHE_BACKEND: 'memory' (per process) or 'redis' (shared)
+        ANALYTICS_CACHE_URL: Redis URL for the redis backend
+        ANALYTICS_CACHE_MAX_ENTRIES: Maximum number of cached results
+        ANALYTICS_CACHE_TTL: Seconds a result stays valid
+        ANALYTICS_CACHE_SCHOOL_TTL: Seconds a school-wide result stays valid
+    """
+    max_entries = app.config.get('ANALYTICS_CACHE_MAX_ENTRIES', 1024)
+    ttl = app.config.get('ANALYTICS_CACHE_TTL', 300)
+    analytics_cache.school_ttl = min(app.config.get('ANALYTICS_CACHE_SCHOOL_TTL', 30), ttl)
+    
+    if app.config.get('ANALYTICS_CACHE_BACKEND', 'memory') == 'redis':
+        analytics_cache.backend = RedisCacheBackend(app.config['ANALYTICS_CACHE_URL'], max_entries, ttl)
+    else:
+        analytics_cache.backend = MemoryCacheBackend(max_entries, ttl)
+    
+    _register_invalidation(db)
+
+def mark_students_written(session, student_ids, school=True):
+    """
+    Invalidate the given students' results when the session commits
+    
+    Needed for rows written with bulk inserts, which the after_flush hook
+    does not see.
+    
+    Args:
+        school: Also invalidate the school-wide results (False for lesson views)
+    """
+    from app import db, User
+    
+    student_ids = set(student_ids)
+    if not student_ids:
+        return
+    
+    sections = dict(session.connection().execute(
+        db.select(User.id, User.section_id).where(User.id.in_(student_ids))
+    ).all())
+    written = session.info.setdefault('analytics_written_students', set())
+    written.update((student_id, sections.get(student_id)) for student_id in student_ids)
+    if school:
+        session.info['analytics_written_school'] = True
+
+def _json_default(value):
+    # numpy scalars and arrays left in analysis results
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+def _register_invalidation(db):
+    """Invalidate on commit for every new QuizAttempt or StudentInteraction"""
+    from sqlalchemy import event
+    from app import QuizAttempt, StudentInteraction
+    
+    if getattr(_register_invalidation, '_registered', False):
+        return
+    _register_invalidation._registered = True
+    
+    @event.listens_for(db.session, 'after_flush')
+    def collect_written_students(session, flush_context):
+        mark_students_written(session, {obj.student_id for obj in session.new if isinstance(obj, QuizAttempt)})
+        mark_students_written(session, {
+            obj.student_id for obj in session.new if isinstance(obj, StudentInteraction)
+        }, school=False)
+    
+    @event.listens_for(db.session, 'after_commit')
+    def invalidate_written_students(session):
+        students = session.info.pop('analytics_written_students', None)
+        school = session.info.pop('analytics_written_school', False)
+        if students:
+            analytics_cache.invalidate_students(students, school=school)
+    
+    @event.listens_for(db.session, 'after_rollback')
+    def discard_written_students(session):
+        session.info.pop('analytics_written_students', None)
+        session.info.pop('analytics_written_school', None)
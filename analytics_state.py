@@ -0,0 +1,364 @@
+"""
+Incremental analytics state for School Platform
+Keeps per-student running aggregates up to date as quiz attempts and interactions
+are recorded, so StudentAnalytics.analyze_student_state can answer without
+reading the full history.
+
+Usage:
+    python analytics_state.py rebuild    Recompute every student's aggregates from raw rows
+    python analytics_state.py check      Compare aggregate answers with a full recompute
+"""
+
+import argparse
+import json
+import sys
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+# Days of per-day interaction counts kept in the state; interactions dated
+# earlier (late reports, queued attempts graded later) count their day from raw rows
+DAILY_COUNT_DAYS = 7
+
+def score_percentage(score, total_points):
+    """Score percentage of an attempt, as used by the analytics engine"""
+    return (score / total_points * 100) if total_points and total_points > 0 else 0
+
+def new_state(student_id):
+    """Create an empty StudentAnalyticsState for a student"""
+    from app import StudentAnalyticsState
+    
+    return StudentAnalyticsState(
+        student_id=student_id,
+        attempt_count=0,
+        score_sum=0,
+        score_sq_sum=0,
+        score_xy_sum=0,
+        first_half_sum=0,
+        second_half_sum=0,
+        middle_score=0,
+        recent_scores='[]',
+        quiz_stats='{}',
+        interaction_count=0,
+        duration_sum=0,
+        type_counts='{}',
+        hour_counts=json.dumps([0] * 24),
+        daily_counts='{}',
+        active_days=0,
+        daily_sq_sum=0
+    )
+
+def apply_attempt(state, attempt_id, percentage, quiz_id, completed_at, attempt_at):
+    """
+    Fold one quiz attempt into the running aggregates
+    
+    Args:
+        attempt_id: Id of the attempt, the last one in completion order
+        attempt_at: Function returning (id, completed_at, score percentage) of
+            the student's attempt at an index in completion order; only asked
+            for the attempt after the current middle one, when the middle of
+            the history moves on
+    """
+    x = state.attempt_count
+    n = x + 1
+    
+    state.attempt_count = n
+    state.score_sum += percentage
+    state.score_sq_sum += percentage * percentage
+    state.score_xy_sum += x * percentage
+    state.score_min = percentage if state.score_min is None else min(state.score_min, percentage)
+    state.score_max = percentage if state.score_max is None else max(state.score_max, percentage)
+    
+    # Keep the sums of the first and last n // 2 scores for the improvement rate.
+    # The attempt at index (n - 1) // 2 leaves the second half when n becomes
+    # odd and joins the first half when n becomes even, so only that middle
+    # attempt is kept, and it moves on by one attempt every other attempt
+    if n == 1:
+        state.middle_attempt_id, state.middle_completed_at, state.middle_score = attempt_id, completed_at, percentage
+    elif n % 2:
+        state.middle_attempt_id, state.middle_completed_at, state.middle_score = attempt_at((n - 1) // 2)
+    if n % 2:
+        state.second_half_sum -= state.middle_score
+    else:
+        state.first_half_sum += state.middle_score
+    state.second_half_sum += percentage
+    
+    recent_scores = json.loads(state.recent_scores)[-2:] + [percentage]
+    
+    quiz_stats = json.loads(state.quiz_stats)
+    attempts, total = quiz_stats.get(str(quiz_id), [0, 0])
+    quiz_stats[str(quiz_id)] = [attempts + 1, total + percentage]
+    
+    state.recent_scores = json.dumps(recent_scores)
+    state.quiz_stats = json.dumps(quiz_stats)
+    if completed_at is not None:
+        state.last_attempt_at = completed_at if state.last_attempt_at is None else max(state.last_attempt_at, completed_at)
+
+def apply_interaction(state, interaction_type, duration, timestamp, day_count):
+    """
+    Fold one student interaction into the running aggregates
+    
+    Args:
+        day_count: Function returning how many of the student's interactions
+            on a date were folded in before this one; only asked for dates
+            older than the DAILY_COUNT_DAYS kept in the state
+    """
+    state.interaction_count += 1
+    state.duration_sum += duration or 0
+    
+    type_counts = json.loads(state.type_counts)
+    type_counts[interaction_type] = type_counts.get(interaction_type, 0) + 1
+    state.type_counts = json.dumps(type_counts)
+    
+    if timestamp is None:
+        return
+    
+    hour_counts = json.loads(state.hour_counts)
+    hour_counts[timestamp.hour] += 1
+    state.hour_counts = json.dumps(hour_counts)
+    
+    # Per-day counters; the sum of squares gives the daily activity variance.
+    # Only the last DAILY_COUNT_DAYS days are kept, every active one of them
+    daily_counts = json.loads(state.daily_counts)
+    day = timestamp.date()
+    if state.last_interaction_at is None or day > state.last_interaction_at.date() - timedelta(days=DAILY_COUNT_DAYS):
+        count = daily_counts.get(day.isoformat(), 0)
+    else:
+        count = day_count(day)
+    if count == 0:
+        state.active_days += 1
+    daily_counts[day.isoformat()] = count + 1
+    state.daily_sq_sum += 2 * count + 1
+    
+    state.first_interaction_at = timestamp if state.first_interaction_at is None else min(state.first_interaction_at, timestamp)
+    state.last_interaction_at = timestamp if state.last_interaction_at is None else max(state.last_interaction_at, timestamp)
+    
+    oldest = (state.last_interaction_at.date() - timedelta(days=DAILY_COUNT_DAYS - 1)).isoformat()
+    state.daily_counts = json.dumps({date: count for date, count in daily_counts.items() if date >= oldest})
+
+def record_activity(student_id, attempts=(), interactions=(), durations=()):
+    """
+    Update a student's aggregates for newly written attempts and interactions
+    
+    Call after adding the rows to the session and before committing, so the
+    aggregates are committed together with the rows. A student without
+    aggregates yet gets them rebuilt from raw rows, which then already
+    include the pending ones. Each row costs a constant amount of work: at
+    most one indexed lookup of the next middle attempt, or of the count of
+    a day older than the state keeps.
+    
+    Args:
+        student_id: Student the rows belong to
+        attempts: New QuizAttempt objects
+        interactions: New StudentInteraction objects
+        durations: Seconds added to the durations of existing interactions
+    """
+    from app import db, StudentAnalyticsState
+    
+    state = db.session.get(StudentAnalyticsState, student_id)
+    if state is None:
+        rebuild_student_state(student_id)
+        return
+    
+    if attempts:
+        db.session.flush()  # Assign ids, the middle attempt is tracked by id
+    for attempt in attempts:
+        apply_attempt(
+            state, attempt.id, score_percentage(attempt.score, attempt.total_points), attempt.quiz_id, attempt.completed_at,
+            lambda index: _stored_attempt_after(student_id, state.middle_completed_at, state.middle_attempt_id)
+        )
+    
+    # The new rows are already counted by the database (flushed by the count
+    # query), so a day's count before a row excludes the rows not folded in yet
+    unfolded = Counter(interaction.timestamp.date() for interaction in interactions if interaction.timestamp is not None)
+    stored_counts = {}
+    def day_count(day):
+        if day not in stored_counts:
+            stored_counts[day] = _stored_day_count(student_id, day)
+        return stored_counts[day] - unfolded[day]
+    
+    for interaction in interactions:
+        apply_interaction(state, interaction.interaction_type, interaction.duration, interaction.timestamp, day_count)
+        if interaction.timestamp is not None:
+            unfolded[interaction.timestamp.date()] -= 1
+    
+    for duration in durations:
+        state.duration_sum += duration
+
+def _stored_attempt_after(student_id, completed_at, attempt_id):
+    """(id, completed_at, score percentage) of a student's next attempt in completion order"""
+    from app import db, QuizAttempt
+    
+    next_id, next_completed_at, score, total_points = db.session.query(
+        QuizAttempt.id, QuizAttempt.completed_at, QuizAttempt.score, QuizAttempt.total_points
+    ).filter(
+        QuizAttempt.student_id == student_id,
+        db.or_(
+            QuizAttempt.completed_at > completed_at,
+            db.and_(QuizAttempt.completed_at == completed_at, QuizAttempt.id > attempt_id)
+        )
+    ).order_by(QuizAttempt.completed_at, QuizAttempt.id).limit(1).one()
+    return next_id, next_completed_at, score_percentage(score, total_points)
+
+def _stored_day_count(student_id, day):
+    """Number of a student's stored interactions on a date"""
+    from app import db, StudentInteraction
+    
+    start = datetime.combine(day, datetime.min.time())
+    return db.session.query(db.func.count(StudentInteraction.id)).filter(
+        StudentInteraction.student_id == student_id,
+        StudentInteraction.timestamp >= start,
+        StudentInteraction.timestamp < start + timedelta(days=1)
+    ).scalar()
+
+def _fold_rows(state, attempt_rows, interaction_rows):
+    """Fold a student's raw rows, attempts in completion order, into a new state"""
+    attempts = []
+    for attempt_id, score, total_points, quiz_id, completed_at in attempt_rows:
+        attempts.append((attempt_id, completed_at, score_percentage(score, total_points)))
+        apply_attempt(state, attempt_id, attempts[-1][2], quiz_id, completed_at, attempts.__getitem__)
+    
+    days = Counter()
+    for interaction_type, duration, timestamp in interaction_rows:
+        apply_interaction(state, interaction_type, duration, timestamp, days.__getitem__)
+        if timestamp is not None:
+            days[timestamp.date()] += 1
+
+def rebuild_student_state(student_id):
+    """
+    Recompute one student's aggregates from their raw attempts and interactions
+    
+    Returns:
+        The rebuilt StudentAnalyticsState (added to the session, not committed)
+    """
+    from app import db, StudentAnalyticsState, QuizAttempt, StudentInteraction
+    
+    db.session.flush()
+    state = db.session.get(StudentAnalyticsState, student_id)
+    if state is not None:
+        db.session.delete(state)
+        db.session.flush()
+    
+    state = new_state(student_id)
+    
+    attempt_rows = db.session.query(
+        QuizAttempt.id, QuizAttempt.score, QuizAttempt.total_points, QuizAttempt.quiz_id, QuizAttempt.completed_at
+    ).filter_by(student_id=student_id).order_by(QuizAttempt.completed_at, QuizAttempt.id).all()
+    interaction_rows = db.session.query(
+        StudentInteraction.interaction_type, StudentInteraction.duration, StudentInteraction.timestamp
+    ).filter_by(student_id=student_id).order_by(StudentInteraction.id).all()
+    _fold_rows(state, attempt_rows, interaction_rows)
+    
+    db.session.add(state)
+    return state
+
+def rebuild_all_states():
+    """
+    Recompute every student's aggregates from raw rows
+    
+    Returns:
+        int: Number of students rebuilt
+    """
+    from app import db, User, StudentAnalyticsState, QuizAttempt, StudentInteraction
+    
+    student_ids = [student_id for student_id, in db.session.query(User.id).filter_by(role='student')]
+    StudentAnalyticsState.query.delete()
+    states = {student_id: new_state(student_id) for student_id in student_ids}
+    
+    attempt_rows = defaultdict(list)
+    for student_id, *row in db.session.query(
+        QuizAttempt.student_id, QuizAttempt.id, QuizAttempt.score, QuizAttempt.total_points,
+        QuizAttempt.quiz_id, QuizAttempt.completed_at
+    ).order_by(QuizAttempt.completed_at, QuizAttempt.id):
+        attempt_rows[student_id].append(row)
+    
+    interaction_rows = defaultdict(list)
+    for student_id, *row in db.session.query(
+        StudentInteraction.student_id, StudentInteraction.interaction_type,
+        StudentInteraction.duration, StudentInteraction.timestamp
+    ).order_by(StudentInteraction.id):
+        interaction_rows[student_id].append(row)
+    
+    for student_id, state in states.items():
+        _fold_rows(state, attempt_rows[student_id], interaction_rows[student_id])
+    
+    db.session.add_all(states.values())
+    db.session.commit()
+    return len(states)
+
+def check_consistency(tolerance=1e-6):
+    """
+    Compare aggregate-based answers with a full recompute for every student
+    
+    Args:
+        tolerance: Allowed absolute/relative difference between numeric values
+    
+    Returns:
+        list: (student_id, path, aggregate value, recomputed value) for each mismatch
+    """
+    from app import db, User, StudentAnalyticsState, QuizAttempt, StudentInteraction
+    from ai_analytics import get_analytics_instance
+    
+    analytics_engine = get_analytics_instance()
+    mismatches = []
+    
+    for student in User.query.filter_by(role='student').all():
+        interactions = StudentInteraction.query.filter_by(student_id=student.id).all()
+        quiz_attempts = QuizAttempt.query.filter_by(student_id=student.id).all()
+        expected = analytics_engine.analyze_student_performance(interactions, quiz_attempts)
+        
+        state = db.session.get(StudentAnalyticsState, student.id)
+        if state is not None:
+            _compare(student.id, '', analytics_engine.analyze_student_state(state), expected, tolerance, mismatches)
+            continue
+        
+        # Without aggregates the answer is the empty one, right only without raw rows
+        missing = []
+        _compare(student.id, '', analytics_engine.analyze_student_state(new_state(student.id)), expected, tolerance, missing)
+        if missing:
+            mismatches.append((student.id, '', 'missing', 'present'))
+    
+    return mismatches
+
+def _compare(student_id, path, actual, expected, tolerance, mismatches):
+    """Recursively collect differences between two analysis results"""
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        for key in sorted(set(expected) | set(actual), key=str):
+            _compare(student_id, f'{path}/{key}', actual.get(key), expected.get(key), tolerance, mismatches)
+    elif isinstance(expected, list) and isinstance(actual, list) and len(expected) == len(actual):
+        for index, (a, e) in enumerate(zip(actual, expected)):
+            _compare(student_id, f'{path}[{index}]', a, e, tolerance, mismatches)
+    elif isinstance(expected, (int, float)) and isinstance(actual, (int, float)):
+        if abs(actual - expected) > tolerance * max(1, abs(expected)):
+            mismatches.append((student_id, path, actual, expected))
+    elif actual != expected:
+        mismatches.append((student_id, path, actual, expected))
+
+def main():
+    parser = argparse.ArgumentParser(description='Maintain per-student analytics aggregates')
+    parser.add_argument('command', choices=['rebuild', 'check'])
+    parser.add_argument('--tolerance', type=float, default=1e-6, help='numeric tolerance for check')
+    args = parser.parse_args()
+    
+    from app import app, db
+    
+    with app.app_context():
+        db.create_all()
+        
+        if args.command == 'rebuild':
+            count = rebuild_all_states()
+            print(f"Rebuilt analytics state for {count} students")
+            return 0
+        
+        mismatches = check_consistency(args.tolerance)
+        for student_id, path, actual, expected in mismatches:
+            print(f"Student {student_id} {path or '/'}: aggregate={actual!r} recomputed={expected!r}")
+        
+        if mismatches:
+            print(f"Found {len(mismatches)} mismatches")
+            return 1
+        
+        print("Analytics state is consistent with raw data")
+        return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,31 +1,35 @@
-from flask import Flask, request, jsonify
-from flask_cors import CORS
+from flask import Blueprint, request, jsonify
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
 from datetime import datetime, timedelta
+from sqlalchemy.orm import joinedload
 import os
 import json
 import jwt
 from functools import wraps
 
 # Import existing models and configurations
-from app import db, User, Section, Lesson, Quiz, Question, QuizAttempt, StudentInteraction, Competition
+from app import db, User, Section, Lesson, Quiz, Question, QuizAttempt, QuizSubmission, StudentInteraction, Competition
+from analytics_state import record_activity
+from pagination import paginate_request, InvalidCursor
+from activity_feed import platform_counts, recent_activities as get_recent_activities
+from analytics_cache import analytics_cache, student_tag
+from interaction_buffer import interaction_buffer
+from grading import answer_keys
+from principal_cache import principal_cache
+from submission_queue import (
+    submission_grader, submit as queue_submission, submission_status, new_submission_token,
+    is_valid_submission_token, SubmissionTokenConflict
+)
 from config import Config
 
-# Initialize Flask app for mobile API
-api_app = Flask(__name__)
-api_app.config.from_object(Config)
-
-# Enable CORS for mobile app
-CORS(api_app, origins=["*"])
-
-# Initialize extensions
-db.init_app(api_app)
+# Mobile API routes, registered by app.py under /api
+mobile_api = Blueprint('mobile_api', __name__)
 
 # JWT Configuration
-JWT_SECRET = api_app.config['SECRET_KEY']
+JWT_SECRET = Config.SECRET_KEY
 JWT_EXPIRATION_DELTA = timedelta(days=7)
 
 def generate_token(user_id):
@@ -36,16 +40,19 @@ def generate_token(user_id):
     }
     return jwt.encode(payload, JWT_SECRET, algorithm='HS256')
 
-def verify_token(token):
-    """Verify JWT token and return user_id"""
+def decode_token(token):
+    """Decode and verify JWT token, returning its payload"""
     try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=['HS256'])
-        return payload['user_id']
+        return jwt.decode(token, JWT_SECRET, algorithms=['HS256'])
     except jwt.ExpiredSignatureError:
         return None
     except jwt.InvalidTokenError:
         return None
 
+def verify_token(token):
+    """Verify JWT token and return user_id"""
+    return principal_cache.token_user_id(token, decode_token)
+
 def token_required(f):
     """Decorator to require valid JWT token"""
     @wraps(f)
@@ -61,7 +68,8 @@ def token_required(f):
         if not user_id:
             return jsonify({'error': 'Token is invalid or expired'}), 401
         
-        current_user = User.query.get(user_id)
+        # Cached snapshot of the user (id, role, section_id, username)
+        current_user = principal_cache.get(user_id)
         if not current_user:
             return jsonify({'error': 'User not found'}), 401
         
@@ -80,7 +88,7 @@ def role_required(roles):
     return decorator
 
 # Authentication Routes
-@api_app.route('/api/auth/login', methods=['POST'])
+@mobile_api.route('/auth/login', methods=['POST'])
 def login():
     """Mobile login endpoint"""
     data = request.get_json()
@@ -119,7 +127,7 @@ def login():
     
     return jsonify({'error': 'Invalid credentials'}), 401
 
-@api_app.route('/api/auth/verify', methods=['GET'])
+@mobile_api.route('/auth/verify', methods=['GET'])
 @token_required
 def verify_token_endpoint(current_user):
     """Verify token and return user info"""
@@ -144,7 +152,7 @@ def verify_token_endpoint(current_user):
     }), 200
 
 # Dashboard Routes
-@api_app.route('/api/dashboard/student', methods=['GET'])
+@mobile_api.route('/dashboard/student', methods=['GET'])
 @token_required
 @role_required(['student'])
 def student_dashboard(current_user):
@@ -212,7 +220,7 @@ def student_dashboard(current_user):
         }
     }), 200
 
-@api_app.route('/api/dashboard/teacher', methods=['GET'])
+@mobile_api.route('/dashboard/teacher', methods=['GET'])
 @token_required
 @role_required(['teacher'])
 def teacher_dashboard(current_user):
@@ -268,82 +276,49 @@ def teacher_dashboard(current_user):
         }
     }), 200
 
-@api_app.route('/api/dashboard/admin', methods=['GET'])
+@mobile_api.route('/dashboard/admin', methods=['GET'])
 @token_required
 @role_required(['admin'])
 def admin_dashboard(current_user):
     """Get admin dashboard data"""
-    # Get statistics
-    total_users = User.query.count()
-    total_teachers = User.query.filter_by(role='teacher').count()
-    total_students = User.query.filter_by(role='student').count()
-    total_lessons = Lesson.query.count()
-    total_quizzes = Quiz.query.count()
-    total_sections = Section.query.count()
-    
-    # Get recent activities
-    recent_activities = []
-    
-    # Recent quiz attempts
-    quiz_attempts = QuizAttempt.query.order_by(QuizAttempt.completed_at.desc()).limit(5).all()
-    for attempt in quiz_attempts:
-        student = User.query.get(attempt.student_id)
-        quiz = Quiz.query.get(attempt.quiz_id)
-        if student and quiz:
-            recent_activities.append({
-                'time': attempt.completed_at.isoformat(),
-                'user': student.username,
-                'action': 'quiz_completed',
-                'details': f"{quiz.title} - Score: {int((attempt.score / attempt.total_points) * 100)}%"
-            })
-    
-    # Recent lessons
-    lessons = Lesson.query.order_by(Lesson.created_at.desc()).limit(5).all()
-    for lesson in lessons:
-        teacher = User.query.get(lesson.teacher_id)
-        if teacher:
-            recent_activities.append({
-                'time': lesson.created_at.isoformat(),
-                'user': teacher.username,
-                'action': 'lesson_created',
-                'details': lesson.title
-            })
-    
-    # Sort activities by time
-    recent_activities.sort(key=lambda x: x['time'], reverse=True)
-    recent_activities = recent_activities[:10]
+    # Get statistics in one aggregate query
+    stats = platform_counts()
+    
+    # Recent quiz completions and lesson creations
+    recent_activities = [
+        dict(activity, time=activity['time'].isoformat())
+        for activity in get_recent_activities(limit=10, include_views=False)
+    ]
     
     return jsonify({
-        'stats': {
-            'total_users': total_users,
-            'total_teachers': total_teachers,
-            'total_students': total_students,
-            'total_lessons': total_lessons,
-            'total_quizzes': total_quizzes,
-            'total_sections': total_sections
-        },
+        'stats': stats,
         'recent_activities': recent_activities
     }), 200
 
 # Lessons Routes
-@api_app.route('/api/lessons', methods=['GET'])
+@mobile_api.route('/lessons', methods=['GET'])
 @token_required
 def get_lessons(current_user):
-    """Get lessons based on user role"""
+    """Get one page of lessons based on user role (?cursor=, ?before=, ?per_page=)"""
     if current_user.role == 'student':
         if current_user.section_id:
-            lessons = Lesson.query.filter_by(is_published=True, section_id=current_user.section_id).all()
+            lessons_query = Lesson.query.filter_by(is_published=True, section_id=current_user.section_id)
         else:
-            lessons = Lesson.query.filter_by(is_published=True).all()
+            lessons_query = Lesson.query.filter_by(is_published=True)
     elif current_user.role == 'teacher':
-        lessons = Lesson.query.filter_by(teacher_id=current_user.id).all()
+        lessons_query = Lesson.query.filter_by(teacher_id=current_user.id)
     else:  # admin
-        lessons = Lesson.query.all()
+        lessons_query = Lesson.query
+    
+    try:
+        page = paginate_request(lessons_query.options(joinedload(Lesson.author), joinedload(Lesson.section_ref)), Lesson)
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     
     lessons_data = []
-    for lesson in lessons:
-        teacher = User.query.get(lesson.teacher_id)
-        section = Section.query.get(lesson.section_id)
+    for lesson in page.items:
+        teacher = lesson.author
+        section = lesson.section_ref
         lessons_data.append({
             'id': lesson.id,
             'title': lesson.title,
@@ -355,9 +330,9 @@ def get_lessons(current_user):
             'file_path': lesson.file_path
         })
     
-    return jsonify({'lessons': lessons_data}), 200
+    return jsonify({'lessons': lessons_data, 'pagination': page.to_dict()}), 200
 
-@api_app.route('/api/lessons/<int:lesson_id>', methods=['GET'])
+@mobile_api.route('/lessons/<int:lesson_id>', methods=['GET'])
 @token_required
 def get_lesson_detail(current_user, lesson_id):
     """Get lesson details"""
@@ -372,16 +347,9 @@ def get_lesson_detail(current_user, lesson_id):
     elif current_user.role == 'teacher' and lesson.teacher_id != current_user.id:
         return jsonify({'error': 'Access denied'}), 403
     
-    # Record student interaction
+    # Record student interaction (written in batches by the interaction buffer)
     if current_user.role == 'student':
-        interaction = StudentInteraction(
-            student_id=current_user.id,
-            interaction_type='lesson_view',
-            content_id=lesson_id,
-            timestamp=datetime.utcnow()
-        )
-        db.session.add(interaction)
-        db.session.commit()
+        interaction_buffer.enqueue(current_user.id, 'lesson_view', content_id=lesson_id)
     
     teacher = User.query.get(lesson.teacher_id)
     section = Section.query.get(lesson.section_id)
@@ -400,31 +368,50 @@ def get_lesson_detail(current_user, lesson_id):
     }), 200
 
 # Quizzes Routes
-@api_app.route('/api/quizzes', methods=['GET'])
+@mobile_api.route('/quizzes', methods=['GET'])
 @token_required
 def get_quizzes(current_user):
-    """Get quizzes based on user role"""
+    """Get one page of quizzes based on user role (?cursor=, ?before=, ?per_page=)"""
     if current_user.role == 'student':
         if current_user.section_id:
-            quizzes = Quiz.query.filter_by(is_published=True, section_id=current_user.section_id).all()
+            quizzes_query = Quiz.query.filter_by(is_published=True, section_id=current_user.section_id)
         else:
-            quizzes = Quiz.query.filter_by(is_published=True).all()
+            quizzes_query = Quiz.query.filter_by(is_published=True)
     elif current_user.role == 'teacher':
-        quizzes = Quiz.query.filter_by(teacher_id=current_user.id).all()
+        quizzes_query = Quiz.query.filter_by(teacher_id=current_user.id)
     else:  # admin
-        quizzes = Quiz.query.all()
+        quizzes_query = Quiz.query
+    
+    try:
+        page = paginate_request(quizzes_query.options(joinedload(Quiz.author), joinedload(Quiz.section_ref)), Quiz)
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # Question counts and the student's first attempt for the whole page
+    quiz_ids = [quiz.id for quiz in page.items]
+    questions_counts = dict(
+        db.session.query(Question.quiz_id, db.func.count(Question.id))
+        .filter(Question.quiz_id.in_(quiz_ids)).group_by(Question.quiz_id).all()
+    )
+    first_attempts = {}
+    if current_user.role == 'student':
+        student_attempts = QuizAttempt.query.filter(
+            QuizAttempt.student_id == current_user.id, QuizAttempt.quiz_id.in_(quiz_ids)
+        ).order_by(QuizAttempt.id)
+        for attempt in student_attempts:
+            first_attempts.setdefault(attempt.quiz_id, attempt)
     
     quizzes_data = []
-    for quiz in quizzes:
-        teacher = User.query.get(quiz.teacher_id)
-        section = Section.query.get(quiz.section_id)
-        questions_count = Question.query.filter_by(quiz_id=quiz.id).count()
+    for quiz in page.items:
+        teacher = quiz.author
+        section = quiz.section_ref
+        questions_count = questions_counts.get(quiz.id, 0)
         
         # Check if student has attempted this quiz
         attempted = False
         score_info = None
         if current_user.role == 'student':
-            attempt = QuizAttempt.query.filter_by(student_id=current_user.id, quiz_id=quiz.id).first()
+            attempt = first_attempts.get(quiz.id)
             attempted = attempt is not None
             if attempt:
                 score_info = {
@@ -447,9 +434,9 @@ def get_quizzes(current_user):
             'score_info': score_info
         })
     
-    return jsonify({'quizzes': quizzes_data}), 200
+    return jsonify({'quizzes': quizzes_data, 'pagination': page.to_dict()}), 200
 
-@api_app.route('/api/quizzes/<int:quiz_id>', methods=['GET'])
+@mobile_api.route('/quizzes/<int:quiz_id>', methods=['GET'])
 @token_required
 def get_quiz_detail(current_user, quiz_id):
     """Get quiz details with questions"""
@@ -501,7 +488,7 @@ def get_quiz_detail(current_user, quiz_id):
         'questions': questions_data
     }), 200
 
-@api_app.route('/api/quizzes/<int:quiz_id>/submit', methods=['POST'])
+@mobile_api.route('/quizzes/<int:quiz_id>/submit', methods=['POST'])
 @token_required
 @role_required(['student'])
 def submit_quiz(current_user, quiz_id):
@@ -516,28 +503,18 @@ def submit_quiz(current_user, quiz_id):
     
     data = request.get_json()
     answers = data.get('answers', {})
+    if not isinstance(answers, dict):
+        return jsonify({'error': 'Answers must be an object of question id to answer'}), 400
     
-    questions = Question.query.filter_by(quiz_id=quiz_id).all()
+    answer_key = answer_keys.get(quiz_id)
     
     # Validate that all questions have been answered
-    for question in questions:
+    for question in answer_key.questions:
         if str(question.id) not in answers:
             return jsonify({'error': f'Question {question.id} not answered'}), 400
     
-    score = 0
-    total_points = 0
-    
-    for question in questions:
-        answer = answers.get(str(question.id), '')
-        total_points += question.points
-        
-        # Check if answer is correct
-        if question.question_type in ['multiple_choice', 'true_false']:
-            if answer.strip() == question.correct_answer.strip():
-                score += question.points
-        elif question.question_type == 'short_answer':
-            if answer.lower().strip() == question.correct_answer.lower().strip():
-                score += question.points
+    score = answer_key.grade(answers)
+    total_points = answer_key.total_points
     
     # Save quiz attempt
     attempt = QuizAttempt(
@@ -559,6 +536,7 @@ def submit_quiz(current_user, quiz_id):
         timestamp=datetime.utcnow()
     )
     db.session.add(interaction)
+    record_activity(current_user.id, attempts=[attempt], interactions=[interaction])
     db.session.commit()
     
     percentage = round((score / total_points) * 100) if total_points > 0 else 0
@@ -571,8 +549,58 @@ def submit_quiz(current_user, quiz_id):
         'message': f'Quiz completed! Your score: {score}/{total_points} ({percentage}%)'
     }), 200
 
+@mobile_api.route('/quizzes/<int:quiz_id>/submissions', methods=['POST'])
+@token_required
+@role_required(['student'])
+def queue_quiz_submission(current_user, quiz_id):
+    """Queue quiz answers for grading and return at once; poll the status for the score"""
+    quiz = Quiz.query.get_or_404(quiz_id)
+    
+    # Check access permissions
+    if not quiz.is_published:
+        return jsonify({'error': 'Quiz not available'}), 403
+    if current_user.section_id and quiz.section_id != current_user.section_id:
+        return jsonify({'error': 'Access denied'}), 403
+    
+    data = request.get_json()
+    answers = data.get('answers', {})
+    if not isinstance(answers, dict):
+        return jsonify({'error': 'Answers must be an object of question id to answer'}), 400
+    
+    # The app sends the same token again when it retries a submission
+    token = data.get('submission_token') or new_submission_token()
+    if not is_valid_submission_token(token):
+        return jsonify({'error': 'Invalid submission token'}), 400
+    
+    # Validate that all questions have been answered
+    for question in answer_keys.get(quiz_id).questions:
+        if str(question.id) not in answers:
+            return jsonify({'error': f'Question {question.id} not answered'}), 400
+    
+    try:
+        submission, created = queue_submission(current_user.id, quiz_id, answers, token)
+    except SubmissionTokenConflict:
+        return jsonify({'error': 'Submission token already used'}), 409
+    
+    return jsonify(submission_status(submission)), 202 if created else 200
+
+# Served at /api/quiz_submissions/<token> by app.quiz_submission_status,
+# which shares the URL with the web page and hands bearer tokens to this view
+@token_required
+def get_quiz_submission(current_user, token):
+    """Get the grading status and score of a queued submission"""
+    submission = QuizSubmission.query.filter_by(token=token, student_id=current_user.id).first()
+    if submission is None:
+        return jsonify({'error': 'Submission not found'}), 404
+    
+    # Make sure a grader runs in this process while submissions wait
+    if submission.status == 'queued':
+        submission_grader.notify()
+    
+    return jsonify(submission_status(submission)), 200
+
 # Sections Routes
-@api_app.route('/api/sections', methods=['GET'])
+@mobile_api.route('/sections', methods=['GET'])
 @token_required
 def get_sections(current_user):
     """Get all sections"""
@@ -589,13 +617,25 @@ def get_sections(current_user):
     return jsonify({'sections': sections_data}), 200
 
 # Analytics Routes
-@api_app.route('/api/analytics/student/<int:student_id>', methods=['GET'])
+@mobile_api.route('/analytics/student/<int:student_id>', methods=['GET'])
 @token_required
 @role_required(['admin', 'teacher'])
 def get_student_analytics(current_user, student_id):
     """Get analytics for a specific student"""
     student = User.query.get_or_404(student_id)
     
+    analytics = analytics_cache.get_or_compute(
+        f'student_stats:{student_id}',
+        lambda: _compute_student_stats(student),
+        tags=[student_tag(student_id)]
+    )
+    
+    return jsonify(analytics), 200
+
+def _compute_student_stats(student):
+    """Basic statistics and recent attempts for a student"""
+    student_id = student.id
+    
     # Get student interactions and quiz attempts
     interactions = StudentInteraction.query.filter_by(student_id=student_id).all()
     quiz_attempts = QuizAttempt.query.filter_by(student_id=student_id).all()
@@ -625,7 +665,7 @@ def get_student_analytics(current_user, student_id):
             'completed_at': attempt.completed_at.isoformat()
         })
     
-    return jsonify({
+    return {
         'student': {
             'id': student.id,
             'username': student.username,
@@ -637,10 +677,10 @@ def get_student_analytics(current_user, student_id):
             'average_score': average_percentage
         },
         'recent_attempts': recent_attempts_data
-    }), 200
+    }
 
 # File serving route for lesson files
-@api_app.route('/api/files/<path:filename>')
+@mobile_api.route('/files/<path:filename>')
 @token_required
 def serve_file(current_user, filename):
     """Serve uploaded files"""
@@ -648,6 +688,8 @@ def serve_file(current_user, filename):
     return send_from_directory('static/uploads', filename)
 
 if __name__ == '__main__':
-    with api_app.app_context():
+    # Serve the whole app, mobile API included, on the mobile API port
+    from app import app
+    with app.app_context():
         db.create_all()
-    api_app.run(debug=True, port=5001)
+    app.run(debug=True, port=5001)
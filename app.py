@@ -1,22 +1,35 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session, abort
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
 from flask_cors import CORS
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 import os
 import json
 import io
-from ai_analytics import get_analytics_instance
-from translations import get_translation, get_all_translations, translations
-from pdf_user_processor import extract_users_from_pdf
-from excel_user_processor import extract_users_from_excel, create_users_from_data
+from lazy_modules import analytics, init_app as init_lazy_modules
+from analytics_state import record_activity
+from pagination import paginate_request, InvalidCursor
+from activity_feed import platform_counts, section_user_counts as count_section_users, recent_activities as get_recent_activities
+from analytics_cache import analytics_cache, student_tag, section_tag, SCHOOL_TAG, init_app as init_analytics_cache
+from interaction_buffer import interaction_buffer, init_app as init_interaction_buffer
+from grading import answer_keys, init_app as init_grading
+from principal_cache import principal_cache, init_app as init_principal_cache
+from submission_queue import (
+    submission_grader, submit as queue_submission, submission_status, new_submission_token,
+    is_valid_submission_token, SubmissionTokenConflict, init_app as init_submission_queue
+)
+from import_jobs import import_job_runner, submit_job, save_upload, job_status, claim_rows_file, init_app as init_import_jobs
+from config import Config, config as config_classes
+from i18n import bundle_response, init_app as init_i18n
+from sqlite_profile import init_app as init_sqlite_profile
 
 # Initialize Flask app
 app = Flask(__name__)
+# APP_CONFIG=testing selects TestingConfig (in-memory database), as the test suite does
+app.config.from_object(config_classes.get(os.environ.get('APP_CONFIG'), Config))
 app.config['SECRET_KEY'] = 'your-secret-key-here'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///school_platform.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['UPLOAD_FOLDER'] = 'static/uploads'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
@@ -30,7 +43,7 @@ os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 # Allowed file extensions
 ALLOWED_EXTENSIONS = {'pdf', 'doc', 'docx', 'ppt', 'pptx', 'jpg', 'jpeg', 'png', 'gif', 'xlsx', 'xls', 'mp4', 'webm', 'ogg'}
 ALLOWED_PDF_EXTENSIONS = {'pdf'}
-ALLOWED_EXCEL_EXTENSIONS = {'xlsx', 'xls'}
+ALLOWED_EXCEL_EXTENSIONS = {'xlsx', 'xls', 'csv'}
 ALLOWED_VIDEO_EXTENSIONS = {'mp4', 'webm', 'ogg'}
 
 def allowed_file(filename):
@@ -47,6 +60,8 @@ def allowed_excel_file(filename):
 
 # Initialize extensions
 db = SQLAlchemy(app)
+# WAL, busy timeout and cache PRAGMAs on every SQLite connection (SQLITE_PROFILE)
+init_sqlite_profile(app, db)
 login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'login'
@@ -61,10 +76,10 @@ def from_json_filter(value):
             return []
     return []
 
-# User loader for Flask-Login
+# User loader for Flask-Login; a cached snapshot of the user, not a User row
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    return principal_cache.get(int(user_id))
 
 # Database Models
 class Section(db.Model):
@@ -85,13 +100,19 @@ class User(UserMixin, db.Model):
     password_hash = db.Column(db.String(120), nullable=False)
     role = db.Column(db.String(20), nullable=False)  # admin, teacher, student
     section_id = db.Column(db.Integer, db.ForeignKey('section.id'))  # Reference to Section table
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)  # Keyset pagination position
     
     # Relationships
     lessons = db.relationship('Lesson', backref='author', lazy=True)
     quizzes = db.relationship('Quiz', backref='author', lazy=True)
     quiz_attempts = db.relationship('QuizAttempt', backref='student', lazy=True)
     interactions = db.relationship('StudentInteraction', backref='student', lazy=True)
+    
+    # Indexes for role/section filters and keyset pagination
+    __table_args__ = (
+        db.Index('ix_user_role_section', 'role', 'section_id'),
+        db.Index('ix_user_created', 'created_at', 'id'),
+    )
 
 class Lesson(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -103,8 +124,15 @@ class Lesson(db.Model):
     file_type = db.Column(db.String(50))   # pdf, docx, pptx, jpg, png, etc.
     teacher_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     section_id = db.Column(db.Integer, db.ForeignKey('section.id'), nullable=False)  # Reference to Section table
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)  # Keyset pagination position
     is_published = db.Column(db.Boolean, default=False)
+    
+    # Indexes for section, teacher and newest-first listings
+    __table_args__ = (
+        db.Index('ix_lesson_section_published', 'section_id', 'is_published', 'created_at', 'id'),
+        db.Index('ix_lesson_teacher', 'teacher_id', 'created_at', 'id'),
+        db.Index('ix_lesson_created', 'created_at', 'id'),
+    )
 
 class Quiz(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -112,12 +140,20 @@ class Quiz(db.Model):
     description = db.Column(db.Text)
     teacher_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     section_id = db.Column(db.Integer, db.ForeignKey('section.id'), nullable=False)  # Reference to Section table
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)  # Keyset pagination position
     is_published = db.Column(db.Boolean, default=False)
+    revision = db.Column(db.Integer, default=0, nullable=False)  # Bumped when the quiz or its questions change (grading.py)
     
     # Relationships
     questions = db.relationship('Question', backref='quiz', lazy=True, cascade='all, delete-orphan')
     attempts = db.relationship('QuizAttempt', backref='quiz', lazy=True)
+    
+    # Indexes for section, teacher and newest-first listings
+    __table_args__ = (
+        db.Index('ix_quiz_section_published', 'section_id', 'is_published', 'created_at', 'id'),
+        db.Index('ix_quiz_teacher', 'teacher_id', 'created_at', 'id'),
+        db.Index('ix_quiz_created', 'created_at', 'id'),
+    )
 
 class Question(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -127,6 +163,10 @@ class Question(db.Model):
     options = db.Column(db.Text)  # JSON string for multiple choice options
     correct_answer = db.Column(db.Text, nullable=False)
     points = db.Column(db.Integer, default=1)
+    
+    __table_args__ = (
+        db.Index('ix_question_quiz', 'quiz_id'),
+    )
 
 class QuizAttempt(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -136,6 +176,13 @@ class QuizAttempt(db.Model):
     total_points = db.Column(db.Integer, default=0)
     answers = db.Column(db.Text)  # JSON string of answers
     completed_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Indexes for per-student history, per-quiz results and recent activity
+    __table_args__ = (
+        db.Index('ix_quiz_attempt_student_completed', 'student_id', 'completed_at'),
+        db.Index('ix_quiz_attempt_quiz_student', 'quiz_id', 'student_id'),
+        db.Index('ix_quiz_attempt_completed', 'completed_at'),
+    )
 
 class Competition(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -154,9 +201,114 @@ class StudentInteraction(db.Model):
     duration = db.Column(db.Integer)  # Time spent in seconds
     performance_score = db.Column(db.Float)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Indexes for per-student activity by type and recent activity by type
+    __table_args__ = (
+        db.Index('ix_student_interaction_student_type_time', 'student_id', 'interaction_type', 'timestamp'),
+        db.Index('ix_student_interaction_type_time', 'interaction_type', 'timestamp'),
+    )
+
+class ContentProgress(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    content_type = db.Column(db.String(20), nullable=False)  # lesson, quiz
+    content_id = db.Column(db.Integer, nullable=False)
+    progress = db.Column(db.Float, nullable=False)  # Fraction completed (0-1)
+    duration = db.Column(db.Integer)  # Time spent in seconds, as last reported
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)  # Time of the last report
+    
+    # One row per student and lesson or quiz, updated in place by each report
+    __table_args__ = (
+        db.UniqueConstraint('student_id', 'content_type', 'content_id', name='uq_content_progress'),
+    )
+
+class StudentAnalyticsState(db.Model):
+    student_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    
+    # Quiz attempt aggregates (x = attempt index, y = score percentage)
+    attempt_count = db.Column(db.Integer, default=0, nullable=False)
+    score_sum = db.Column(db.Float, default=0, nullable=False)
+    score_sq_sum = db.Column(db.Float, default=0, nullable=False)
+    score_xy_sum = db.Column(db.Float, default=0, nullable=False)
+    score_min = db.Column(db.Float)
+    score_max = db.Column(db.Float)
+    first_half_sum = db.Column(db.Float, default=0, nullable=False)  # Sum of the first attempt_count // 2 scores
+    second_half_sum = db.Column(db.Float, default=0, nullable=False)  # Sum of the last attempt_count // 2 scores
+    middle_attempt_id = db.Column(db.Integer)  # Attempt at index (attempt_count - 1) // 2 in completion order
+    middle_completed_at = db.Column(db.DateTime)
+    middle_score = db.Column(db.Float, default=0, nullable=False)
+    recent_scores = db.Column(db.Text, default='[]')  # JSON list of the last 3 scores
+    quiz_stats = db.Column(db.Text, default='{}')  # JSON quiz_id -> [attempts, score sum]
+    last_attempt_at = db.Column(db.DateTime)
+    
+    # Interaction aggregates
+    interaction_count = db.Column(db.Integer, default=0, nullable=False)
+    duration_sum = db.Column(db.Float, default=0, nullable=False)
+    type_counts = db.Column(db.Text, default='{}')  # JSON interaction_type -> count
+    hour_counts = db.Column(db.Text, default='[]')  # JSON list of 24 per-hour counts
+    daily_counts = db.Column(db.Text, default='{}')  # JSON ISO date -> count, for the last DAILY_COUNT_DAYS days
+    active_days = db.Column(db.Integer, default=0, nullable=False)
+    daily_sq_sum = db.Column(db.Float, default=0, nullable=False)  # Sum of squared daily counts
+    first_interaction_at = db.Column(db.DateTime)
+    last_interaction_at = db.Column(db.DateTime)
+    
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class QuizSubmission(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    token = db.Column(db.String(64), unique=True, nullable=False)  # One attempt per submission token
+    student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    quiz_id = db.Column(db.Integer, nullable=False)  # Not a foreign key, so submissions outlive deleted quizzes
+    answers = db.Column(db.Text)  # JSON string of answers
+    status = db.Column(db.String(20), default='queued', nullable=False)  # queued, graded, failed
+    attempt_id = db.Column(db.Integer, db.ForeignKey('quiz_attempt.id'))
+    score = db.Column(db.Float)
+    total_points = db.Column(db.Integer)
+    error = db.Column(db.String(200))
+    submitted_at = db.Column(db.DateTime, default=datetime.utcnow)
+    graded_at = db.Column(db.DateTime)
+    
+    # Index for claiming the oldest queued submissions
+    __table_args__ = (
+        db.Index('ix_quiz_submission_status', 'status', 'id'),
+    )
+
+class ImportJob(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)  # parse, create
+    status = db.Column(db.String(20), default='queued', nullable=False)  # queued, running, completed, failed
+    created_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    file_path = db.Column(db.String(300))  # Uploaded file of a queued parse job, rows file of a read file or a create job
+    payload = db.Column(db.Text)  # JSON import settings and rows, cleared when the job finishes
+    result = db.Column(db.Text)  # JSON preview of a parse job, summary of a create job
+    error = db.Column(db.Text)
+    rows_total = db.Column(db.Integer, default=0, nullable=False)
+    rows_parsed = db.Column(db.Integer, default=0, nullable=False)
+    rows_hashed = db.Column(db.Integer, default=0, nullable=False)
+    rows_inserted = db.Column(db.Integer, default=0, nullable=False)
+    rows_failed = db.Column(db.Integer, default=0, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Index for claiming the oldest queued job
+    __table_args__ = (
+        db.Index('ix_import_job_status', 'status', 'id'),
+    )
+
+# Invalidate cached analytics whenever attempts or interactions are committed
+init_analytics_cache(app, db)
+init_interaction_buffer(app)
+init_grading(app, db)
+init_principal_cache(app, db)
+translation_catalog = init_i18n(app)
+init_submission_queue(app)
+init_import_jobs(app)
+init_lazy_modules(app)
 
 # Import and register mobile API blueprint
-from api_mobile import mobile_api
+from api_mobile import mobile_api, get_quiz_submission as get_mobile_quiz_submission
 app.register_blueprint(mobile_api, url_prefix='/api')
 
 # Routes
@@ -202,12 +354,44 @@ def set_language(language):
 
 @app.context_processor
 def inject_language():
-    current_lang = session.get('language', 'en')
-    return dict(
-        current_language=current_lang,
-        t=lambda key: get_translation(key, current_lang),
-        translations=get_all_translations(current_lang)
-    )
+    # current_language, t and translations, built once per language
+    return translation_catalog.template_context(session.get('language', 'en'))
+
+@app.template_global()
+def i18n_bundle_url(language):
+    """Versioned URL of a language's translation bundle, English for unknown languages"""
+    bundle = translation_catalog.bundle(language) or translation_catalog.bundle('en')
+    return url_for('i18n_bundle_version', language=bundle.language, version=bundle.version)
+
+@app.route('/api/i18n')
+def i18n_manifest():
+    # Versioned bundle URLs, checked by clients on start to know when to download again
+    response = jsonify({
+        'default_language': 'en',
+        'languages': {language: i18n_bundle_url(language) for language in translation_catalog.languages}
+    })
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.route('/api/i18n/<language>')
+def i18n_bundle(language):
+    bundle = translation_catalog.bundle(language)
+    if bundle is None:
+        return jsonify({'error': 'Unknown language'}), 404
+    return bundle_response(bundle)
+
+@app.route('/api/i18n/<language>/<version>')
+def i18n_bundle_version(language, version):
+    bundle = translation_catalog.bundle(language)
+    if bundle is None:
+        return jsonify({'error': 'Unknown language'}), 404
+    
+    # A URL of an earlier release points to the current bundle
+    if version != bundle.version:
+        response = redirect(url_for('i18n_bundle_version', language=language, version=bundle.version))
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    return bundle_response(bundle, immutable=True)
 
 # Dashboard Routes
 @app.route('/admin/dashboard')
@@ -217,73 +401,23 @@ def admin_dashboard():
         flash('Access denied')
         return redirect(url_for('index'))
     
-    # Get statistics
-    total_users = User.query.count()
-    total_teachers = User.query.filter_by(role='teacher').count()
-    total_students = User.query.filter_by(role='student').count()
-    total_lessons = Lesson.query.count()
-    total_quizzes = Quiz.query.count()
-    total_sections = Section.query.count()
+    # Get statistics in one aggregate query
+    stats = platform_counts()
     
-    # Get all users and sections for management
-    all_users = User.query.all()
+    # Get sections for management, with user counts from one grouped query
     all_sections = Section.query.all()
+    section_user_counts = count_section_users()
     
-    # Get recent activities
-    recent_activities = []
-    
-    # Get recent quiz attempts
-    quiz_attempts = QuizAttempt.query.order_by(QuizAttempt.completed_at.desc()).limit(5).all()
-    for attempt in quiz_attempts:
-        student = User.query.get(attempt.student_id)
-        quiz = Quiz.query.get(attempt.quiz_id)
-        if student and quiz:
-            recent_activities.append({
-                'time': attempt.completed_at,
-                'user': student.username,
-                'action': 'quiz_completed',
-                'details': f"{quiz.title} - {get_translation('score', session.get('language', 'en'))}: {int((attempt.score / attempt.total_points) * 100)}%"
-            })
-    
-    # Get recent lesson creations
-    lessons = Lesson.query.order_by(Lesson.created_at.desc()).limit(5).all()
-    for lesson in lessons:
-        teacher = User.query.get(lesson.teacher_id)
-        if teacher:
-            recent_activities.append({
-                'time': lesson.created_at,
-                'user': teacher.username,
-                'action': 'lesson_created',
-                'details': lesson.title
-            })
-    
-    # Get recent student interactions (lesson views)
-    interactions = StudentInteraction.query.filter_by(interaction_type='lesson_view').order_by(StudentInteraction.timestamp.desc()).limit(5).all()
-    for interaction in interactions:
-        student = User.query.get(interaction.student_id)
-        lesson = Lesson.query.get(interaction.content_id)
-        if student and lesson:
-            recent_activities.append({
-                'time': interaction.timestamp,
-                'user': student.username,
-                'action': 'lesson_viewed',
-                'details': lesson.title
-            })
-    
-    # Sort activities by time (most recent first)
-    recent_activities.sort(key=lambda x: x['time'], reverse=True)
-    recent_activities = recent_activities[:10]  # Limit to 10 most recent activities
+    # Get the 10 most recent quiz completions, lesson creations and lesson views
+    recent_activities = get_recent_activities(
+        limit=10, score_label=translation_catalog.translate('score', session.get('language', 'en'))
+    )
     
     return render_template('admin_dashboard.html',
-                         total_users=total_users,
-                         total_teachers=total_teachers,
-                         total_students=total_students,
-                         total_lessons=total_lessons,
-                         total_quizzes=total_quizzes,
-                         total_sections=total_sections,
-                         all_users=all_users,
                          all_sections=all_sections,
-                         recent_activities=recent_activities)
+                         section_user_counts=section_user_counts,
+                         recent_activities=recent_activities,
+                         **stats)
 
 # Admin section management routes
 @app.route('/admin/create_section', methods=['POST'])
@@ -393,6 +527,7 @@ def admin_delete_user(user_id):
     # Delete user and related data
     db.session.delete(user)
     db.session.commit()
+    analytics_cache.invalidate_students([(user.id, user.section_id)])
     
     flash(f'User {user.username} deleted successfully')
     return redirect(url_for('admin_dashboard'))
@@ -414,6 +549,7 @@ def admin_delete_all_users():
         count += 1
     
     db.session.commit()
+    analytics_cache.clear()
     
     flash(f'Successfully deleted {count} users')
     return redirect(url_for('user_management'))
@@ -431,8 +567,22 @@ def user_management():
     total_students = User.query.filter_by(role='student').count()
     total_admins = User.query.filter_by(role='admin').count()
     
-    # Get all users and sections for management
-    all_users = User.query.all()
+    # Get one page of users, filtered by role and username/email search
+    users_query = User.query
+    role = request.args.get('role')
+    if role:
+        users_query = users_query.filter_by(role=role)
+    search = request.args.get('q', '').strip()
+    if search:
+        pattern = f'%{search}%'
+        users_query = users_query.filter(db.or_(User.username.ilike(pattern), User.email.ilike(pattern)))
+    
+    try:
+        page = paginate_request(users_query, User)
+    except InvalidCursor:
+        abort(400)
+    
+    all_users = page.items
     all_sections = Section.query.all()
     
     return render_template('user_management.html',
@@ -441,7 +591,8 @@ def user_management():
                          total_students=total_students,
                          total_admins=total_admins,
                          all_users=all_users,
-                         all_sections=all_sections)
+                         all_sections=all_sections,
+                         page=page)
 
 @app.route('/admin/upload_users', methods=['GET', 'POST'])
 @login_required
@@ -473,9 +624,6 @@ def upload_users_pdf():
         flash('Access denied')
         return redirect(url_for('index'))
     
-    # Get all sections for the dropdown
-    all_sections = Section.query.all()
-    
     # Check if a file was uploaded
     if 'pdf_file' not in request.files:
         flash('No file part')
@@ -498,59 +646,20 @@ def upload_users_pdf():
         flash('Section is required for student accounts')
         return redirect(url_for('upload_users'))
     
-    # Process the file based on its type
-    file_content = file.read()
-    file.seek(0)  # Reset file pointer to beginning
-    
-    # Check if the file is an Excel file
-    if allowed_excel_file(file.filename):
-        # Extract user data from Excel
-        users_data = extract_users_from_excel(io.BytesIO(file_content))
-    # Check if the file is a PDF
-    elif allowed_pdf_file(file.filename):
-        # Extract user data from PDF
-        users_data = extract_users_from_pdf(io.BytesIO(file_content))
-    else:
-        flash('Only PDF and Excel files are allowed')
+    # Only PDF and Excel files can be read
+    if not (allowed_excel_file(file.filename) or allowed_pdf_file(file.filename)):
+        flash('Only PDF, Excel and CSV files are allowed')
         return redirect(url_for('upload_users'))
     
-    # Check if there was an error
-    if isinstance(users_data, dict) and 'error' in users_data:
-        flash(users_data['error'])
-        return redirect(url_for('upload_users'))
-    
-    # If no users were found
-    if not users_data:
-        flash('No user data found in the PDF')
-        return redirect(url_for('upload_users'))
-    
-    # Add role and section information to preview data
-    preview_data = []
-    for user in users_data:
-        user_info = user.copy()
-        user_info['role'] = default_role
-        
-        # Add section name if applicable
-        if default_role == 'student' and section_id:
-            section = Section.query.get(int(section_id))
-            user_info['section_name'] = section.name if section else 'Unknown'
-        else:
-            user_info['section_name'] = 'N/A'
-        
-        preview_data.append(user_info)
-    
-    # Convert preview data to JSON for the hidden form field
-    preview_data_json = json.dumps({
-        'users': preview_data,
+    # Read the file in the background; the job page shows the preview when it is done
+    file_path = save_upload(file.read(), file.filename, import_job_runner.folder)
+    job = submit_job('parse', current_user.id, {
         'default_role': default_role,
         'section_id': section_id,
         'default_password': default_password
-    })
+    }, file_path=file_path)
     
-    return render_template('upload_users.html',
-                          all_sections=all_sections,
-                          preview_data=preview_data,
-                          preview_data_json=preview_data_json)
+    return redirect(url_for('import_job', job_id=job.id))
 
 @app.route('/admin/confirm_users_upload', methods=['POST'])
 @login_required
@@ -561,40 +670,77 @@ def confirm_users_upload():
     
     # Get the JSON data from the form
     confirm_data = request.form.get('confirm_data', '{}')
+    parse_job_id = request.form.get('parse_job_id', type=int)
     
     try:
         data = json.loads(confirm_data)
         users = data.get('users', [])
+        rows_file = None
+        
+        # A previewed file is imported from the rows its parse job stored,
+        # with the settings it was uploaded with
+        if parse_job_id is not None:
+            parse_job = db.session.get(ImportJob, parse_job_id)
+            rows_file = claim_rows_file(parse_job) if parse_job else None
+            if rows_file is None:
+                flash('This preview has expired or was already imported, please upload the file again')
+                return redirect(url_for('upload_users'))
+            data = json.loads(parse_job.result)
+            users = []
+        
         default_role = data.get('default_role', 'student')
         section_id = data.get('section_id', '')
         default_password = data.get('default_password', 'changeme')
         
-        # Create the users
-        result = create_users_from_data(users, default_role, section_id, default_password)
-        
-        # Check for errors
-        if 'error' in result:
-            flash(result['error'])
-            return redirect(url_for('upload_users'))
-        
-        # Show success message
-        created_count = len(result['created'])
-        error_count = len(result['errors'])
-        
-        if created_count > 0:
-            flash(f'Successfully created {created_count} user accounts')
+        # Create the users in the background and follow the job's progress
+        job = submit_job('create', current_user.id, {
+            'users': users,
+            'default_role': default_role,
+            'section_id': section_id,
+            'default_password': default_password
+        }, file_path=rows_file)
         
-        if error_count > 0:
-            flash(f'Failed to create {error_count} user accounts')
-            for error in result['errors']:
-                flash(error)
-        
-        return redirect(url_for('user_management'))
+        return redirect(url_for('import_job', job_id=job.id))
     
     except Exception as e:
         flash(f'Error processing data: {str(e)}')
         return redirect(url_for('upload_users'))
 
+@app.route('/admin/import_jobs/<int:job_id>')
+@login_required
+def import_job(job_id):
+    if current_user.role != 'admin':
+        flash('Access denied')
+        return redirect(url_for('index'))
+    
+    job = ImportJob.query.get_or_404(job_id)
+    
+    # A read file is previewed on the upload page, ready to be confirmed
+    if job.kind == 'parse' and job.status == 'completed':
+        preview_data_json = job.result
+        preview = json.loads(preview_data_json)
+        return render_template('upload_users.html',
+                              all_sections=Section.query.all(),
+                              preview_data=preview['users'],
+                              preview_data_json=preview_data_json,
+                              rows_total=preview.get('rows_total', len(preview['users'])),
+                              parse_job_id=job.id)
+    if job.kind == 'parse' and job.status == 'failed':
+        flash(job.error)
+        return redirect(url_for('upload_users'))
+    
+    return render_template('import_job.html', job=job, status=job_status(job))
+
+@app.route('/api/import_jobs/<int:job_id>')
+@login_required
+def import_job_progress(job_id):
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Access denied'}), 403
+    
+    job = ImportJob.query.get_or_404(job_id)
+    import_job_runner.notify()
+    return jsonify(job_status(job))
+
 @app.route('/admin/edit_user', methods=['POST'])
 @login_required
 def admin_edit_user():
@@ -616,6 +762,7 @@ def admin_edit_user():
     password = request.form.get('password')
     
     user = User.query.get_or_404(user_id)
+    previous_section_id = user.section_id
     
     # Check if username/email already exists (excluding current user)
     if User.query.filter(User.username == username, User.id != user_id).first():
@@ -636,6 +783,7 @@ def admin_edit_user():
         user.password_hash = generate_password_hash(password)
     
     db.session.commit()
+    analytics_cache.invalidate_students([(user.id, previous_section_id), (user.id, user.section_id)])
     
     flash(f'User {username} updated successfully')
     return redirect(url_for('user_management'))
@@ -683,27 +831,26 @@ def student_dashboard():
 def lessons():
     if current_user.role == 'student':
         if current_user.section_id:
-            lessons = Lesson.query.filter_by(is_published=True, section_id=current_user.section_id).all()
+            lessons_query = Lesson.query.filter_by(is_published=True, section_id=current_user.section_id)
         else:
-            lessons = Lesson.query.filter_by(is_published=True).all()
+            lessons_query = Lesson.query.filter_by(is_published=True)
     else:
-        lessons = Lesson.query.all()
-    return render_template('lessons.html', lessons=lessons)
+        lessons_query = Lesson.query
+    
+    try:
+        page = paginate_request(lessons_query, Lesson)
+    except InvalidCursor:
+        abort(400)
+    return render_template('lessons.html', lessons=page.items, page=page)
 
 @app.route('/lesson/<int:lesson_id>')
 @login_required
 def view_lesson(lesson_id):
     lesson = Lesson.query.get_or_404(lesson_id)
     
-    # Record student interaction
+    # Record student interaction (written in batches by the interaction buffer)
     if current_user.role == 'student':
-        interaction = StudentInteraction(
-            student_id=current_user.id,
-            interaction_type='lesson_view',
-            content_id=lesson_id
-        )
-        db.session.add(interaction)
-        db.session.commit()
+        interaction_buffer.enqueue(current_user.id, 'lesson_view', content_id=lesson_id)
     
     return render_template('lesson_detail.html', lesson=lesson)
 
@@ -811,19 +958,24 @@ def edit_lesson(lesson_id):
 def quizzes():
     if current_user.role == 'student':
         if current_user.section_id:
-            quizzes = Quiz.query.filter_by(is_published=True, section_id=current_user.section_id).all()
+            quizzes_query = Quiz.query.filter_by(is_published=True, section_id=current_user.section_id)
         else:
-            quizzes = Quiz.query.filter_by(is_published=True).all()
+            quizzes_query = Quiz.query.filter_by(is_published=True)
     else:
-        quizzes = Quiz.query.all()
-    return render_template('quizzes.html', quizzes=quizzes)
+        quizzes_query = Quiz.query
+    
+    try:
+        page = paginate_request(quizzes_query, Quiz)
+    except InvalidCursor:
+        abort(400)
+    return render_template('quizzes.html', quizzes=page.items, page=page)
 
 @app.route('/quiz/<int:quiz_id>')
 @login_required
 def take_quiz(quiz_id):
     quiz = Quiz.query.get_or_404(quiz_id)
     questions = Question.query.filter_by(quiz_id=quiz_id).all()
-    return render_template('take_quiz.html', quiz=quiz, questions=questions)
+    return render_template('take_quiz.html', quiz=quiz, questions=questions, submission_token=new_submission_token())
 
 @app.route('/submit_quiz/<int:quiz_id>', methods=['POST'])
 @login_required
@@ -833,31 +985,30 @@ def submit_quiz(quiz_id):
         return redirect(url_for('index'))
     
     quiz = Quiz.query.get_or_404(quiz_id)
-    questions = Question.query.filter_by(quiz_id=quiz_id).all()
+    answer_key = answer_keys.get(quiz_id)
     
     # Validate that all questions have been answered
-    for question in questions:
+    answers = {}
+    for question in answer_key.questions:
         answer = request.form.get(f'question_{question.id}')
         if not answer or answer.strip() == '':
             flash('Please answer all questions before submitting')
             return redirect(url_for('take_quiz', quiz_id=quiz_id))
+        answers[str(question.id)] = answer
     
-    answers = {}
-    score = 0
-    total_points = 0
+    # Queued mode: store the answers and let the grader write the attempt
+    if app.config.get('QUIZ_SUBMISSION_QUEUE_ENABLED'):
+        token = request.form.get('submission_token') or new_submission_token()
+        if not is_valid_submission_token(token):
+            abort(400)
+        try:
+            queue_submission(current_user.id, quiz_id, answers, token)
+        except SubmissionTokenConflict:
+            abort(400)
+        return redirect(url_for('quiz_submission', token=token))
     
-    for question in questions:
-        answer = request.form.get(f'question_{question.id}')
-        answers[str(question.id)] = answer
-        total_points += question.points
-        
-        # Check if answer is correct
-        if question.question_type == 'multiple_choice' or question.question_type == 'true_false':
-            if answer and answer.strip() == question.correct_answer.strip():
-                score += question.points
-        elif question.question_type == 'short_answer':
-            if answer and answer.lower().strip() == question.correct_answer.lower().strip():
-                score += question.points
+    score = answer_key.grade(answers)
+    total_points = answer_key.total_points
     
     # Save quiz attempt
     attempt = QuizAttempt(
@@ -865,7 +1016,8 @@ def submit_quiz(quiz_id):
         quiz_id=quiz_id,
         score=score,
         total_points=total_points,
-        answers=json.dumps(answers)
+        answers=json.dumps(answers),
+        completed_at=datetime.utcnow()
     )
     db.session.add(attempt)
     
@@ -874,15 +1026,42 @@ def submit_quiz(quiz_id):
         student_id=current_user.id,
         interaction_type='quiz_attempt',
         content_id=quiz_id,
-        performance_score=score/total_points if total_points > 0 else 0
+        performance_score=score/total_points if total_points > 0 else 0,
+        timestamp=datetime.utcnow()
     )
     db.session.add(interaction)
+    record_activity(current_user.id, attempts=[attempt], interactions=[interaction])
     
     db.session.commit()
     
     flash(f'Quiz completed! Your score: {score}/{total_points}')
     return redirect(url_for('student_dashboard'))
 
+@app.route('/quiz_submission/<token>')
+@login_required
+def quiz_submission(token):
+    submission = QuizSubmission.query.filter_by(token=token, student_id=current_user.id).first_or_404()
+    quiz = db.session.get(Quiz, submission.quiz_id)
+    return render_template('quiz_submission.html', submission=submission, quiz=quiz)
+
+@app.route('/api/quiz_submissions/<token>')
+def quiz_submission_status(token):
+    # The mobile app polls the same URL with its bearer token
+    if request.headers.get('Authorization'):
+        return get_mobile_quiz_submission(token)
+    if not current_user.is_authenticated:
+        return login_manager.unauthorized()
+    
+    submission = QuizSubmission.query.filter_by(token=token).first()
+    if submission is None or (submission.student_id != current_user.id and current_user.role != 'admin'):
+        return jsonify({'error': 'Submission not found'}), 404
+    
+    # Make sure a grader runs in this process while submissions wait
+    if submission.status == 'queued':
+        submission_grader.notify()
+    
+    return jsonify(submission_status(submission))
+
 @app.route('/create_quiz', methods=['GET', 'POST'])
 @login_required
 def create_quiz():
@@ -1120,13 +1299,24 @@ def student_analytics(student_id):
     if current_user.role not in ['admin', 'teacher']:
         return jsonify({'error': 'Access denied'}), 403
     
-    # Get student interactions and quiz attempts
-    interactions = StudentInteraction.query.filter_by(student_id=student_id).all()
-    quiz_attempts = QuizAttempt.query.filter_by(student_id=student_id).all()
+    def compute_analysis():
+        analytics_engine = analytics.get_analytics_instance()
+        
+        # Answer from running aggregates when the student has them
+        state = db.session.get(StudentAnalyticsState, student_id)
+        if state is not None:
+            return analytics_engine.analyze_student_state(state)
+        
+        # Get student interactions and quiz attempts
+        interactions = StudentInteraction.query.filter_by(student_id=student_id).all()
+        quiz_attempts = QuizAttempt.query.filter_by(student_id=student_id).all()
+        
+        # Use AI analytics for comprehensive analysis
+        return analytics_engine.analyze_student_performance(interactions, quiz_attempts)
     
-    # Use AI analytics for comprehensive analysis
-    analytics_engine = get_analytics_instance()
-    analysis = analytics_engine.analyze_student_performance(interactions, quiz_attempts)
+    analysis = analytics_cache.get_or_compute(
+        f'student_analysis:{student_id}', compute_analysis, tags=[student_tag(student_id)]
+    )
     
     return jsonify(analysis)
 
@@ -1172,21 +1362,331 @@ def class_analytics():
     if current_user.role not in ['admin', 'teacher']:
         return jsonify({'error': 'Access denied'}), 403
     
-    # Get all students and their data
-    students = User.query.filter_by(role='student').all()
-    all_students_data = {}
+    # Optional scope: ?section_id=<id> (repeatable) or ?teacher_id=<id> for the
+    # sections a teacher has lessons or quizzes in; ?by_section=1 analyzes each
+    # section separately in parallel and merges the results
+    section_ids = request.args.getlist('section_id', type=int)
+    teacher_id = request.args.get('teacher_id', type=int)
+    by_section = request.args.get('by_section', '').lower() in ['1', 'true', 'on']
+    
+    if teacher_id is not None:
+        section_ids += teacher_section_ids(teacher_id)
+    section_ids = sorted(set(section_ids))
+    scoped = bool(section_ids) or teacher_id is not None
+    
+    if scoped:
+        scope = 'sections:' + ','.join(map(str, section_ids))
+        tags = [section_tag(section_id) for section_id in section_ids]
+    else:
+        scope, tags = 'school', [SCHOOL_TAG]
     
-    for student in students:
-        interactions = StudentInteraction.query.filter_by(student_id=student.id).all()
-        quiz_attempts = QuizAttempt.query.filter_by(student_id=student.id).all()
-        all_students_data[student.id] = (interactions, quiz_attempts)
+    def compute_analysis():
+        student_rows, interaction_rows, attempt_rows = load_class_rows(section_ids if scoped else None)
+        analytics_engine = analytics.get_analytics_instance()
+        
+        if by_section:
+            # Split rows by the section of their student
+            sections = {}
+            student_sections = {}
+            for student_id, section_id in student_rows:
+                key = str(section_id) if section_id is not None else 'none'
+                student_sections[student_id] = key
+                sections.setdefault(key, ([], [], []))[0].append(student_id)
+            for row in interaction_rows:
+                sections[student_sections[row[0]]][1].append(row)
+            for row in attempt_rows:
+                sections[student_sections[row[0]]][2].append(row)
+            
+            return analytics_engine.analyze_sections(sections, app.config.get('CLASS_ANALYTICS_WORKERS', 1))
+        
+        # Use AI analytics for comprehensive class analysis
+        student_ids = [student_id for student_id, _ in student_rows]
+        return analytics_engine.analyze_class_performance_bulk(student_ids, interaction_rows, attempt_rows, scope=scope)
     
-    # Use AI analytics for comprehensive class analysis
-    analytics_engine = get_analytics_instance()
-    analysis = analytics_engine.analyze_class_performance(all_students_data)
+    cache_key = f'class_analysis:{scope}' + (':by_section' if by_section else '')
+    analysis = analytics_cache.get_or_compute(cache_key, compute_analysis, tags=tags)
     
     return jsonify(analysis)
 
+def teacher_section_ids(teacher_id):
+    """Sections a teacher has lessons or quizzes in"""
+    lesson_sections = db.session.query(Lesson.section_id).filter_by(teacher_id=teacher_id)
+    quiz_sections = db.session.query(Quiz.section_id).filter_by(teacher_id=teacher_id)
+    return [section_id for section_id, in lesson_sections.union(quiz_sections)]
+
+def load_class_rows(section_ids=None):
+    """
+    Load students and their interactions and attempts in three bulk queries
+    
+    Args:
+        section_ids: Only load students of these sections (None for all students)
+        
+    Returns:
+        tuple: ([(student_id, section_id)], interaction rows, attempt rows) as tuples
+    """
+    student_filter = [User.role == 'student']
+    if section_ids is not None:
+        student_filter.append(User.section_id.in_(section_ids))
+    
+    student_rows = db.session.query(User.id, User.section_id).filter(*student_filter).order_by(User.id).all()
+    
+    interaction_rows = db.session.query(
+        StudentInteraction.student_id,
+        StudentInteraction.interaction_type,
+        StudentInteraction.duration,
+        StudentInteraction.timestamp
+    ).join(User, User.id == StudentInteraction.student_id).filter(*student_filter).all()
+    
+    attempt_rows = db.session.query(
+        QuizAttempt.student_id,
+        QuizAttempt.score,
+        QuizAttempt.total_points,
+        QuizAttempt.completed_at
+    ).join(User, User.id == QuizAttempt.student_id).filter(*student_filter).all()
+    
+    return (
+        [tuple(row) for row in student_rows],
+        [tuple(row) for row in interaction_rows],
+        [tuple(row) for row in attempt_rows]
+    )
+
+@app.route('/api/analytics_cache_stats')
+@login_required
+def analytics_cache_stats():
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Access denied'}), 403
+    
+    return jsonify(analytics_cache.stats())
+
+@app.route('/api/interaction_buffer_stats')
+@login_required
+def interaction_buffer_stats():
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Access denied'}), 403
+    
+    return jsonify(interaction_buffer.stats())
+
+@app.route('/api/answer_key_stats')
+@login_required
+def answer_key_stats():
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Access denied'}), 403
+    
+    return jsonify(answer_keys.stats())
+
+@app.route('/api/principal_cache_stats')
+@login_required
+def principal_cache_stats():
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Access denied'}), 403
+    
+    return jsonify(principal_cache.stats())
+
+@app.route('/api/quiz_submission_stats')
+@login_required
+def quiz_submission_stats():
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Access denied'}), 403
+    
+    return jsonify(submission_grader.stats())
+
+# Interaction types the tracking endpoints record. Only time spent on a
+# lesson is taken from the client: quiz attempts are logged by the server
+# when it grades them, and scores reported by a client are never trusted
+TRACKED_INTERACTION_TYPES = {'lesson_view'}
+PROGRESS_CONTENT_TYPES = {'lesson', 'quiz'}
+
+@app.route('/api/track_interaction', methods=['POST'])
+@login_required
+def track_interaction():
+    return ingest_tracking_events(lambda event: tracked_interaction(
+        event.get('type'), event.get('content_id'), event.get('duration'), event.get('timestamp')
+    ))
+
+@app.route('/api/track_event', methods=['POST'])
+@login_required
+def track_event():
+    def to_interaction(event):
+        event_data = event.get('event_data') if isinstance(event.get('event_data'), dict) else {}
+        return tracked_interaction(
+            event.get('event_type'), event_data.get('content_id'), event_data.get('duration'), event.get('timestamp')
+        )
+    
+    return ingest_tracking_events(to_interaction)
+
+@app.route('/api/update_progress', methods=['POST'])
+@login_required
+def update_progress():
+    def to_progress(event):
+        content_id = tracking_id(event.get('content_id'))
+        progress = tracking_number(event.get('progress'), 0, 100)
+        if event.get('content_type') not in PROGRESS_CONTENT_TYPES or content_id is None or progress is None:
+            return None
+        return {
+            'content_type': event['content_type'],
+            'content_id': content_id,
+            'progress': progress / 100,
+            'duration': tracking_number(event.get('duration'), 0, app.config.get('TRACKING_MAX_DURATION', 4 * 3600)),
+            'timestamp': tracking_timestamp(event.get('timestamp'))
+        }
+    
+    # Progress is state, not activity: it is kept out of the interactions
+    # analytics read, and only the latest report of each lesson or quiz is kept
+    return ingest_tracking_events(
+        to_progress, store=save_content_progress,
+        key=lambda progress: (progress['content_type'], progress['content_id'])
+    )
+
+def tracked_interaction(interaction_type, content_id, duration, timestamp):
+    """
+    Validate one tracked interaction
+    
+    Lesson views are logged by view_lesson when the page loads, so a tracked
+    lesson_view only reports the time spent so far and must have a duration,
+    which is attached to that logged view. Any performance_score sent with
+    the event is ignored.
+    
+    Returns:
+        dict: INTERACTION_FIELDS values (without student_id), or None if invalid
+    """
+    content_id = tracking_id(content_id)
+    duration = tracking_number(duration, 0, app.config.get('TRACKING_MAX_DURATION', 4 * 3600))
+    if interaction_type not in TRACKED_INTERACTION_TYPES or content_id is None or duration is None:
+        return None
+    
+    return {
+        'interaction_type': interaction_type,
+        'content_id': content_id,
+        'duration': duration,
+        'performance_score': None,
+        'timestamp': tracking_timestamp(timestamp),
+        'attach_duration': True
+    }
+
+def tracking_number(value, minimum=None, maximum=None):
+    """Integer from a tracking event, clamped to [minimum, maximum] where given, or None"""
+    if isinstance(value, bool):
+        return None
+    try:
+        number = int(value)
+    except (TypeError, ValueError, OverflowError):
+        return None
+    if maximum is not None:
+        number = min(number, maximum)
+    if minimum is not None:
+        number = max(number, minimum)
+    return number
+
+def tracking_id(value):
+    """Content id from a tracking event, or None if it is not a positive integer"""
+    number = tracking_number(value)
+    return number if number is not None and number >= 1 else None
+
+def tracking_timestamp(value):
+    """Client timestamp as naive UTC, or now if missing, malformed or not within the last day"""
+    now = datetime.utcnow()
+    try:
+        timestamp = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return now
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp if now - timedelta(days=1) <= timestamp <= now else now
+
+def save_content_progress(reports):
+    """
+    Upsert the latest progress of each student on each lesson or quiz
+    
+    Existing rows are read with one query and updated unless they hold a
+    newer report; a row inserted concurrently by another request is read
+    back and updated on a second pass.
+    
+    Args:
+        reports: ContentProgress values, at most one per student and content
+    
+    Returns:
+        int: Number of reports saved
+    """
+    from sqlalchemy.exc import IntegrityError
+    
+    if not reports:
+        return 0
+    
+    for retry in (False, True):
+        existing = {
+            (progress.student_id, progress.content_type, progress.content_id): progress
+            for progress in ContentProgress.query.filter(
+                ContentProgress.student_id.in_({report['student_id'] for report in reports}),
+                ContentProgress.content_id.in_({report['content_id'] for report in reports})
+            )
+        }
+        for report in reports:
+            progress = existing.get((report['student_id'], report['content_type'], report['content_id']))
+            if progress is None:
+                db.session.add(ContentProgress(**report))
+            elif progress.timestamp <= report['timestamp']:
+                for field, value in report.items():
+                    setattr(progress, field, value)
+        try:
+            db.session.commit()
+            return len(reports)
+        except IntegrityError:
+            db.session.rollback()
+            if retry:
+                raise
+
+def ingest_tracking_events(to_record, store=None, key=None):
+    """
+    Store the records of a batch of tracking events
+    
+    The body is one event, a list of events or {"events": [...]}, sent with
+    fetch or navigator.sendBeacon (whose bodies may arrive as text/plain).
+    By default accepted events go to the interaction buffer, which writes
+    them with batched inserts; events from other roles than students are
+    ignored.
+    
+    Args:
+        to_record: Maps an event to the values to store (without
+            student_id), or None to ignore it
+        store: Writes a list of records and returns how many it accepted
+            (default: interaction_buffer.enqueue_many)
+        key: Keep only the latest record per key(record)
+    
+    Returns:
+        Response: 202 with the accepted, ignored and dropped event counts
+    """
+    events = request.get_json(force=True, silent=True)
+    if isinstance(events, dict):
+        events = events.get('events', [events])
+    if not isinstance(events, list):
+        return jsonify({'error': 'Expected an event or a list of events'}), 400
+    
+    max_events = app.config.get('TRACKING_MAX_EVENTS', 100)
+    if len(events) > max_events:
+        return jsonify({'error': f'At most {max_events} events per request'}), 413
+    
+    if current_user.role != 'student':
+        return jsonify({'accepted': 0, 'ignored': len(events), 'dropped': 0}), 202
+    
+    records = [
+        dict(record, student_id=current_user.id)
+        for record in (to_record(event) for event in events if isinstance(event, dict))
+        if record is not None
+    ]
+    if key is not None:
+        latest = {}
+        for record in sorted(records, key=lambda record: record['timestamp']):
+            latest[key(record)] = record
+        records = list(latest.values())
+    ignored = len(events) - len(records)
+    
+    accepted = (store or interaction_buffer.enqueue_many)(records)
+    return jsonify({
+        'accepted': accepted,
+        'ignored': ignored,
+        'dropped': len(records) - accepted
+    }), 202
+
 # Initialize database - moved to run.py for better control
 # The @app.before_first_request decorator is deprecated in Flask 2.2+
 
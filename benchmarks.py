@@ -0,0 +1,652 @@
+#!/usr/bin/env python3
+"""
+Benchmarks and stress checks for School Platform
+Each command prints its measurements and exits non-zero when a check fails.
+
+Usage:
+    python benchmarks.py analytics-concurrency [--threads 16] [--rounds 20] [--students 200]
+    python benchmarks.py password-hashing [--passwords 256] [--workers 1 2 4]
+    python benchmarks.py excel-import [--rows 50000]
+    python benchmarks.py pdf-import [--pages 300] [--users-per-page 10] [--workers 1 2 4] [--layouts flat hierarchical]
+    python benchmarks.py startup [--runs 5] [--preload none analytics all]
+    python benchmarks.py http-load [--url http://127.0.0.1:8000] [--concurrency 16] [--duration 20]
+    python benchmarks.py sqlite-writes [--rate 80] [--processes 4] [--threads 4] [--profiles default production]
+"""
+
+import argparse
+import json
+import multiprocessing
+import random
+import os
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+def generate_class_data(n_students, seed=42):
+    """
+    Generate synthetic interactions and quiz attempts for a class
+    
+    Returns:
+        dict: student_id -> (interactions, attempts), as accepted by
+        StudentAnalytics.analyze_class_performance
+    """
+    rng = random.Random(seed)
+    start = datetime(2024, 9, 1)
+    interaction_types = ['lesson_view', 'lesson_view', 'quiz_attempt', 'puzzle_solve']
+    data = {}
+    
+    for student_id in range(1, n_students + 1):
+        interactions = [
+            SimpleNamespace(
+                student_id=student_id,
+                timestamp=start + timedelta(minutes=rng.randint(0, 60 * 24 * 90)),
+                interaction_type=rng.choice(interaction_types),
+                content_id=rng.randint(1, 40),
+                duration=rng.choice([None, 60, 240, 600]),
+                performance_score=None
+            )
+            for _ in range(rng.randint(0, 40))
+        ]
+        attempts = [
+            SimpleNamespace(
+                student_id=student_id,
+                completed_at=start + timedelta(minutes=rng.randint(0, 60 * 24 * 90)),
+                score=rng.randint(0, 20),
+                total_points=20,
+                quiz_id=rng.randint(1, 15)
+            )
+            for _ in range(rng.randint(0, 15))
+        ]
+        data[student_id] = (interactions, attempts)
+    
+    return data
+
+def analytics_concurrency(args):
+    """Run analytics from a thread pool and compare with sequential results"""
+    from ai_analytics import get_analytics_instance, INTERACTION_COLUMNS, ATTEMPT_COLUMNS
+    
+    analytics_engine = get_analytics_instance()
+    data = generate_class_data(args.students)
+    
+    student_ids = list(data)
+    interaction_rows = [
+        tuple(getattr(interaction, column) for column in INTERACTION_COLUMNS)
+        for interactions, _ in data.values() for interaction in interactions
+    ]
+    attempt_rows = [
+        tuple(getattr(attempt, column) for column in ATTEMPT_COLUMNS)
+        for _, attempts in data.values() for attempt in attempts
+    ]
+    
+    # Mixed workload: every student analysis plus both class analysis paths
+    tasks = [('student', student_id) for student_id in student_ids]
+    tasks += [('class', None), ('class_bulk', None)]
+    
+    def run(task):
+        kind, student_id = task
+        if kind == 'student':
+            result = analytics_engine.analyze_student_performance(*data[student_id])
+        elif kind == 'class':
+            result = analytics_engine.analyze_class_performance(data)
+        else:
+            result = analytics_engine.analyze_class_performance_bulk(student_ids, interaction_rows, attempt_rows)
+        return json.dumps(result, sort_keys=True, default=str)
+    
+    started = time.perf_counter()
+    expected = {task: run(task) for task in tasks}
+    sequential_time = time.perf_counter() - started
+    
+    workload = tasks * args.rounds
+    random.Random(0).shuffle(workload)
+    
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        results = list(executor.map(run, workload))
+    parallel_time = time.perf_counter() - started
+    
+    mismatches = sum(1 for task, result in zip(workload, results) if result != expected[task])
+    
+    print(f"Students: {args.students}, tasks per round: {len(tasks)}, rounds: {args.rounds}, threads: {args.threads}")
+    print(f"Sequential round: {sequential_time:.2f}s")
+    print(f"Parallel run: {parallel_time:.2f}s for {len(workload)} tasks")
+    print(f"Mismatched results: {mismatches}")
+    
+    return 1 if mismatches else 0
+
+def password_hashing(args):
+    """Time bulk-import password hashing with different pool sizes"""
+    from flask import Flask
+    from werkzeug.security import check_password_hash
+    from user_import import hash_passwords, available_cores
+    
+    passwords = [f'secret-{index}' for index in range(args.passwords)]
+    workers = args.workers or sorted({1, available_cores()})
+    failures = 0
+    baseline = None
+    
+    print(f"Passwords: {args.passwords}, available cores: {available_cores()}")
+    with Flask(__name__).app_context():
+        for max_workers in workers:
+            started = time.perf_counter()
+            hashes = hash_passwords(passwords, max_workers=max_workers)
+            elapsed = time.perf_counter() - started
+            baseline = baseline or elapsed
+            
+            # Spot-check that hashes come back in input order
+            wrong = sum(
+                1 for password, password_hash in list(zip(passwords, hashes))[::max(len(passwords) // 8, 1)]
+                if not check_password_hash(password_hash, password)
+            )
+            failures += wrong + (len(hashes) != len(passwords))
+            print(f"Workers: {max_workers}: {elapsed:.2f}s ({len(passwords) / elapsed:.1f} hashes/s, "
+                  f"{baseline / elapsed:.2f}x), wrong hashes: {wrong}")
+    
+    return 1 if failures else 0
+
+def write_masar_files(folder, n_rows):
+    """Write the same Masar-style user list as .xlsx and .csv files"""
+    import csv
+    from openpyxl import Workbook
+    
+    header = ['Account', 'Name', 'Birth date', 'Class', 'Code', 'Notes', 'Guardian', 'Phone']
+    rows = [
+        [f'S{100000 + index}', f'Student {index}', '2010-01-01', f'Class {index % 30}',
+         f'{random.randint(100000, 999999)}', '', f'Guardian {index}', f'06{index:08d}']
+        for index in range(n_rows)
+    ]
+    
+    xlsx_path = os.path.join(folder, 'users.xlsx')
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    for row in [header] + rows:
+        sheet.append(row)
+    workbook.save(xlsx_path)
+    
+    csv_path = os.path.join(folder, 'users.csv')
+    with open(csv_path, 'w', newline='', encoding='utf-8') as csv_file:
+        csv.writer(csv_file).writerows([header] + rows)
+    return xlsx_path, csv_path
+
+def read_with_pandas(path):
+    """The previous reader: the whole sheet in a DataFrame, walked with iterrows"""
+    import pandas as pd
+    
+    df = pd.read_csv(path) if path.endswith('.csv') else pd.read_excel(path)
+    return [
+        {'username': str(row.iloc[0]).strip(), 'full_name': str(row.iloc[1]).strip(), 'secret_code': str(row.iloc[4]).strip()}
+        for index, row in df.iterrows()
+        if not (pd.isna(row.iloc[0]) or pd.isna(row.iloc[1]) or pd.isna(row.iloc[4]))
+    ]
+
+def excel_import(args):
+    """Compare the streaming user file reader with the pandas one"""
+    from flask import Flask
+    from excel_user_processor import extract_users_from_excel, iter_users_from_excel
+    
+    def stream_count(path):
+        # Consume the rows without keeping them, as a streaming consumer would
+        with open(path, 'rb') as user_file:
+            return sum(1 for user in iter_users_from_excel(user_file))
+    
+    def stream_list(path):
+        with open(path, 'rb') as user_file:
+            return extract_users_from_excel(user_file)
+    
+    def measure(reader, path):
+        # Timed and traced in separate runs, as tracing slows allocation down
+        started = time.perf_counter()
+        result = reader(path)
+        elapsed = time.perf_counter() - started
+        tracemalloc.start()
+        reader(path)
+        peak = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+        return result, elapsed, peak
+    
+    random.seed(42)
+    mismatches = 0
+    with tempfile.TemporaryDirectory() as folder, Flask(__name__).app_context():
+        paths = write_masar_files(folder, args.rows)
+        print(f"Rows: {args.rows}")
+        for path in paths:
+            expected, pandas_time, pandas_peak = measure(read_with_pandas, path)
+            users, list_time, list_peak = measure(stream_list, path)
+            count, stream_time, stream_peak = measure(stream_count, path)
+            mismatches += (users != expected) + (count != len(expected))
+            
+            print(f"{os.path.basename(path)} ({os.path.getsize(path) / 2**20:.1f} MB):")
+            print(f"  pandas + iterrows:   {pandas_time:6.2f}s, peak {pandas_peak:6.1f} MB")
+            print(f"  streaming, as list:  {list_time:6.2f}s, peak {list_peak:6.1f} MB ({pandas_time / list_time:.2f}x)")
+            print(f"  streaming, consumed: {stream_time:6.2f}s, peak {stream_peak:6.1f} MB ({pandas_time / stream_time:.2f}x)")
+    
+    print(f"Mismatched results: {mismatches}")
+    return 1 if mismatches else 0
+
+def write_form_pdf(n_pages, users_per_page, hierarchical=False):
+    """
+    Build a class list PDF with full name, username and secret code text fields per student
+    
+    With hierarchical, the fields of each page are the kids of a page field
+    (/Parent), and only the page fields are listed in the form's /Fields.
+    """
+    import io
+    from PyPDF2 import PdfWriter
+    from PyPDF2.generic import ArrayObject, DictionaryObject, FloatObject, NameObject, TextStringObject
+    
+    writer = PdfWriter()
+    fields = ArrayObject()
+    for page_number in range(n_pages):
+        writer.add_blank_page(width=595, height=842)
+        page = writer.pages[page_number]
+        annotations = ArrayObject()
+        if hierarchical:
+            page_kids = ArrayObject()
+            page_field = writer._add_object(DictionaryObject({
+                NameObject('/T'): TextStringObject(f'page{page_number}'),
+                NameObject('/Kids'): page_kids
+            }))
+            fields.append(page_field)
+        for row in range(users_per_page):
+            student = page_number * users_per_page + row
+            values = [f'Student {student}', f'S{100000 + student}', f'{random.randint(100000, 999999)}']
+            for column, (name, value) in enumerate(zip(['full_name', 'username', 'secret_code'], values)):
+                top = 800 - row * 70 - column * 20
+                field = writer._add_object(DictionaryObject({
+                    NameObject('/Type'): NameObject('/Annot'),
+                    NameObject('/Subtype'): NameObject('/Widget'),
+                    NameObject('/FT'): NameObject('/Tx'),
+                    NameObject('/T'): TextStringObject(f'{student}.{name}'),
+                    NameObject('/V'): TextStringObject(value),
+                    NameObject('/Rect'): ArrayObject([FloatObject(50), FloatObject(top - 15), FloatObject(300), FloatObject(top)])
+                }))
+                annotations.append(field)
+                if hierarchical:
+                    field.get_object()[NameObject('/Parent')] = page_field
+                    page_kids.append(field)
+                else:
+                    fields.append(field)
+        page[NameObject('/Annots')] = annotations
+    writer._root_object[NameObject('/AcroForm')] = writer._add_object(DictionaryObject({
+        NameObject('/Fields'): fields
+    }))
+    
+    pdf = io.BytesIO()
+    writer.write(pdf)
+    return pdf.getvalue()
+
+def pdf_import(args):
+    """Compare page-parallel PDF form extraction with the AcroForm tree walk"""
+    import io
+    from flask import Flask
+    from pdf_user_processor import extract_users_from_pdf
+    from user_import import available_cores
+    
+    workers = args.workers or sorted({1, available_cores()})
+    mismatches = 0
+    empty = False
+    
+    print(f"Pages: {args.pages}, fields: {args.pages * args.users_per_page * 3}, available cores: {available_cores()}")
+    app = Flask(__name__)
+    with app.app_context():
+        for layout in args.layouts:
+            random.seed(42)
+            content = write_form_pdf(args.pages, args.users_per_page, hierarchical=layout == 'hierarchical')
+            print(f"{layout} form ({len(content) / 2**20:.1f} MB):")
+            
+            started = time.perf_counter()
+            expected = extract_users_from_pdf(io.BytesIO(content), by_page=False)
+            tree_time = time.perf_counter() - started
+            empty = empty or not expected
+            print(f"  AcroForm tree: {tree_time:.2f}s")
+            
+            for max_workers in workers:
+                app.config['PDF_EXTRACT_WORKERS'] = max_workers
+                started = time.perf_counter()
+                users = extract_users_from_pdf(io.BytesIO(content), by_page=True)
+                elapsed = time.perf_counter() - started
+                mismatches += users != expected
+                print(f"  By page, workers: {max_workers}: {elapsed:.2f}s ({tree_time / elapsed:.2f}x), "
+                      f"users: {len(users) if isinstance(users, list) else users}")
+    
+    print(f"Mismatched results: {mismatches}")
+    return 1 if mismatches or empty else 0
+
+# Run in a fresh interpreter for each startup measurement; prints one JSON line
+STARTUP_PROBE = '''
+import json, os, resource, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+try:
+    with open('/proc/self/statm') as statm:
+        rss = int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+except OSError:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+libraries = [name for name in ['pandas', 'numpy', 'sklearn', 'openpyxl', 'PyPDF2'] if name in sys.modules]
+from lazy_modules import analytics
+analytics.get_analytics_instance()
+print(json.dumps({
+    'import': imported - started,
+    'rss': rss,
+    'first_use': time.perf_counter() - imported,
+    'libraries': libraries
+}))
+'''
+
+def startup(args):
+    """Measure app import time and memory of a fresh worker with each preload setting"""
+    root = os.path.dirname(os.path.abspath(__file__))
+    failed = False
+    
+    print(f"Runs: {args.runs}; medians of import time, RSS after import and first analytics call")
+    for preload in args.preload:
+        env = dict(os.environ, PRELOAD_MODULES='' if preload == 'none' else preload)
+        samples = []
+        for _ in range(args.runs):
+            result = subprocess.run([sys.executable, '-c', STARTUP_PROBE], cwd=root, env=env, capture_output=True, text=True)
+            if result.returncode != 0:
+                print(f"PRELOAD_MODULES={preload}: startup failed\n{result.stderr.strip()}")
+                return 1
+            samples.append(json.loads(result.stdout.strip().splitlines()[-1]))
+        
+        median = {key: statistics.median(sample[key] for sample in samples) for key in ['import', 'rss', 'first_use']}
+        libraries = samples[0]['libraries']
+        print(f"PRELOAD_MODULES={preload}: import {median['import']:.2f}s, RSS {median['rss'] / 2**20:.1f} MB, "
+              f"first analytics call {median['first_use']:.2f}s, "
+              f"loaded at startup: {', '.join(libraries) or 'none'}")
+        
+        # Without preloading, none of the heavy libraries may be imported with the app
+        if preload == 'none' and libraries:
+            failed = True
+    
+    return 1 if failed else 0
+
+def http_load(args):
+    """Request pages of a running server from many threads and report throughput and latency"""
+    import urllib.error
+    import urllib.request
+    
+    headers = {}
+    if args.username:
+        # Mobile API token, so authenticated endpoints can be loaded too
+        request = urllib.request.Request(
+            args.url + '/api/auth/login', method='POST',
+            data=json.dumps({'username': args.username, 'password': args.password}).encode(),
+            headers={'Content-Type': 'application/json'}
+        )
+        with urllib.request.urlopen(request) as response:
+            headers['Authorization'] = 'Bearer ' + json.loads(response.read())['token']
+    
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.duration
+    
+    def client(index):
+        paths = args.paths[index % len(args.paths):] + args.paths[:index % len(args.paths)]
+        done = []
+        failed = []
+        while time.perf_counter() < deadline:
+            for path in paths:
+                started = time.perf_counter()
+                try:
+                    with urllib.request.urlopen(urllib.request.Request(args.url + path, headers=headers)) as response:
+                        response.read()
+                    done.append(time.perf_counter() - started)
+                except (urllib.error.URLError, OSError) as e:
+                    failed.append(f"{path}: {e}")
+        with lock:
+            latencies.extend(done)
+            errors.extend(failed)
+    
+    started = time.perf_counter()
+    clients = [threading.Thread(target=client, args=(index,)) for index in range(args.concurrency)]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    
+    latencies.sort()
+    def percentile(fraction):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * fraction))] * 1000 if latencies else 0
+    
+    print(f"{args.url}: {args.concurrency} clients for {elapsed:.1f}s over {', '.join(args.paths)}")
+    print(f"Requests: {len(latencies)} ({len(latencies) / elapsed:.1f}/s), errors: {len(errors)}")
+    print(f"Latency: p50 {percentile(0.5):.1f} ms, p95 {percentile(0.95):.1f} ms, p99 {percentile(0.99):.1f} ms")
+    for error in errors[:5]:
+        print(f"  {error}")
+    
+    return 1 if errors else 0
+
+def _stress_init(database_url, profile):
+    # Import the app in each pool process against the stress database
+    os.environ.update({
+        'DATABASE_URL': database_url,
+        'SQLITE_PROFILE': profile,
+        'INTERACTION_BUFFER_ENABLED': 'false',  # Every lesson view is its own write
+        'QUIZ_SUBMISSION_QUEUE_ENABLED': 'false'
+    })
+    from app import app
+    app.config['PROPAGATE_EXCEPTIONS'] = True
+
+def _stress_setup(n_students):
+    """Create a section with one quiz, one lesson and n_students students"""
+    from app import app, db, User, Section, Lesson, Quiz, Question
+    from sqlite_profile import read_pragmas, PROFILES
+    
+    with app.app_context():
+        db.create_all()
+        section = Section(name='Stress')
+        teacher = User(username='stress_teacher', email='teacher@stress.test', password_hash='-', role='teacher')
+        db.session.add_all([section, teacher])
+        db.session.flush()
+        quiz = Quiz(title='Stress quiz', teacher_id=teacher.id, section_id=section.id, is_published=True)
+        lesson = Lesson(title='Stress lesson', content='-', teacher_id=teacher.id, section_id=section.id, is_published=True)
+        db.session.add_all([quiz, lesson])
+        db.session.flush()
+        questions = [
+            Question(quiz_id=quiz.id, question_text=f'Question {number}', question_type='short_answer',
+                     correct_answer=str(number), points=1)
+            for number in range(5)
+        ]
+        students = [
+            User(username=f'stress_student{number}', email=f'student{number}@stress.test', password_hash='-',
+                 role='student', section_id=section.id)
+            for number in range(n_students)
+        ]
+        db.session.add_all(questions + students)
+        db.session.commit()
+        with db.engine.connect() as connection:
+            pragmas = read_pragmas(connection, PROFILES['production'])
+        answers = {str(question.id): question.correct_answer for question in questions}
+        return quiz.id, lesson.id, [student.id for student in students], answers, pragmas
+
+def _stress_worker(quiz_id, lesson_id, student_ids, answers, threads, interval, duration):
+    """
+    Submit quizzes and view lessons at a fixed pace from several threads
+    
+    Returns:
+        tuple: (kind, outcome, seconds) of each request, and the seconds taken
+    """
+    from app import app
+    from api_mobile import generate_token
+    
+    results = []
+    lock = threading.Lock()
+    started = time.perf_counter()
+    
+    def client(index):
+        test_client = app.test_client()
+        done = []
+        for count in range(int(duration / interval)):
+            # Keep the pace: wait for the next slot, or go at once when late
+            delay = started + count * interval - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            student_id = student_ids[(index + count * threads) % len(student_ids)]
+            headers = {'Authorization': f'Bearer {generate_token(student_id)}'}
+            kind = 'view' if count % 4 == 3 else 'submit'
+            request_started = time.perf_counter()
+            try:
+                if kind == 'submit':
+                    response = test_client.post(f'/api/quizzes/{quiz_id}/submit', json={'answers': answers}, headers=headers)
+                else:
+                    response = test_client.get(f'/api/lessons/{lesson_id}', headers=headers)
+                outcome = 'ok' if response.status_code == 200 else f'HTTP {response.status_code}'
+            except Exception as e:
+                outcome = 'locked' if 'database is locked' in str(e) else f'{type(e).__name__}: {e}'
+            done.append((kind, outcome, time.perf_counter() - request_started))
+        with lock:
+            results.extend(done)
+    
+    clients = [threading.Thread(target=client, args=(index,)) for index in range(threads)]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    return results, time.perf_counter() - started
+
+def sqlite_writes(args):
+    """Stress concurrent quiz submissions and lesson views on SQLite with each profile"""
+    clients = args.processes * args.threads
+    interval = clients / args.rate  # Seconds between the requests of one client
+    failed = False
+    
+    print(f"Target: {args.rate} writes/s (3 quiz submissions per lesson view) for {args.duration}s "
+          f"from {args.processes} processes x {args.threads} threads")
+    for profile in args.profiles:
+        with tempfile.TemporaryDirectory() as folder:
+            database_url = 'sqlite:///' + os.path.join(folder, 'stress.db')
+            with ProcessPoolExecutor(
+                max_workers=args.processes, mp_context=multiprocessing.get_context('spawn'),
+                initializer=_stress_init, initargs=(database_url, profile)
+            ) as pool:
+                quiz_id, lesson_id, student_ids, answers, pragmas = pool.submit(_stress_setup, args.students).result()
+                futures = [
+                    pool.submit(_stress_worker, quiz_id, lesson_id, student_ids[index::args.processes],
+                                answers, args.threads, interval, args.duration)
+                    for index in range(args.processes)
+                ]
+                finished = [future.result() for future in futures]
+            results = [result for worker_results, _ in finished for result in worker_results]
+            elapsed = max(seconds for _, seconds in finished)
+            
+            outcomes = {}
+            for kind, outcome, _ in results:
+                outcomes[outcome] = outcomes.get(outcome, 0) + 1
+            latencies = sorted(latency for _, outcome, latency in results if outcome == 'ok')
+            ok = outcomes.pop('ok', 0)
+            submitted = sum(1 for kind, outcome, _ in results if kind == 'submit' and outcome == 'ok')
+            
+            connection = sqlite3.connect(os.path.join(folder, 'stress.db'))
+            try:
+                stored = connection.execute('SELECT COUNT(*) FROM quiz_attempt').fetchone()[0]
+            finally:
+                connection.close()
+            
+            def percentile(fraction):
+                return latencies[min(len(latencies) - 1, int(len(latencies) * fraction))] * 1000 if latencies else 0
+            
+            print(f"SQLITE_PROFILE={profile} ({', '.join(f'{name}={value}' for name, value in pragmas.items())}):")
+            print(f"  {ok} of {len(results)} writes succeeded in {elapsed:.1f}s ({ok / elapsed:.1f}/s), "
+                  f"attempts stored: {stored} of {submitted}")
+            print(f"  Latency: p50 {percentile(0.5):.1f} ms, p95 {percentile(0.95):.1f} ms, p99 {percentile(0.99):.1f} ms")
+            for outcome, count in sorted(outcomes.items(), key=lambda item: -item[1])[:5]:
+                print(f"  {count} x {outcome}")
+            
+            # The production profile must absorb the target rate without lock errors
+            if profile == 'production' and (outcomes or stored != submitted or ok / elapsed < 0.9 * args.rate):
+                failed = True
+    
+    return 1 if failed else 0
+
+def main():
+    parser = argparse.ArgumentParser(description='School Platform benchmarks and stress checks')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    parser_analytics = subparsers.add_parser(
+        'analytics-concurrency',
+        help='check that concurrent analytics requests give the same results as sequential ones'
+    )
+    parser_analytics.add_argument('--threads', type=int, default=16)
+    parser_analytics.add_argument('--rounds', type=int, default=20)
+    parser_analytics.add_argument('--students', type=int, default=200)
+    parser_analytics.set_defaults(func=analytics_concurrency)
+    
+    parser_hashing = subparsers.add_parser(
+        'password-hashing',
+        help='time password hashing for bulk user import with different process pool sizes'
+    )
+    parser_hashing.add_argument('--passwords', type=int, default=256)
+    parser_hashing.add_argument('--workers', type=int, nargs='*', help='pool sizes to try (default 1 and the core count)')
+    parser_hashing.set_defaults(func=password_hashing)
+    
+    parser_excel = subparsers.add_parser(
+        'excel-import',
+        help='compare the streaming Excel/CSV user reader with the pandas reader'
+    )
+    parser_excel.add_argument('--rows', type=int, default=50000)
+    parser_excel.set_defaults(func=excel_import)
+    
+    parser_pdf = subparsers.add_parser(
+        'pdf-import',
+        help='compare page-parallel PDF form extraction with the AcroForm tree walk'
+    )
+    parser_pdf.add_argument('--pages', type=int, default=300)
+    parser_pdf.add_argument('--users-per-page', type=int, default=10)
+    parser_pdf.add_argument('--workers', type=int, nargs='*', help='pool sizes to try (default 1 and the core count)')
+    parser_pdf.add_argument('--layouts', nargs='+', choices=['flat', 'hierarchical'], default=['flat', 'hierarchical'])
+    parser_pdf.set_defaults(func=pdf_import)
+    
+    parser_startup = subparsers.add_parser(
+        'startup',
+        help='measure worker startup time and memory with and without preloaded subsystems'
+    )
+    parser_startup.add_argument('--runs', type=int, default=5)
+    parser_startup.add_argument(
+        '--preload', nargs='*', default=['none', 'analytics', 'all'],
+        help="PRELOAD_MODULES values to compare ('analytics' imports what app.py used to import eagerly)"
+    )
+    parser_startup.set_defaults(func=startup)
+    
+    parser_http = subparsers.add_parser(
+        'http-load',
+        help='load a running server (e.g. gunicorn --config gunicorn.conf.py run:app) and report requests per second'
+    )
+    parser_http.add_argument('--url', default='http://127.0.0.1:8000')
+    parser_http.add_argument(
+        '--paths', nargs='+', default=['/login', '/api/i18n/en', '/api/lessons', '/api/dashboard/student'],
+        help='paths requested in turn by every client'
+    )
+    parser_http.add_argument('--concurrency', type=int, default=16)
+    parser_http.add_argument('--duration', type=float, default=20)
+    parser_http.add_argument('--username', default='alice_student', help='mobile API login for authenticated paths')
+    parser_http.add_argument('--password', default='student123')
+    parser_http.set_defaults(func=http_load)
+    
+    parser_sqlite = subparsers.add_parser(
+        'sqlite-writes',
+        help='stress concurrent quiz submissions on SQLite and count lock errors for each SQLITE_PROFILE'
+    )
+    parser_sqlite.add_argument('--rate', type=float, default=80, help='target writes per second')
+    parser_sqlite.add_argument('--duration', type=float, default=20)
+    parser_sqlite.add_argument('--processes', type=int, default=4)
+    parser_sqlite.add_argument('--threads', type=int, default=4)
+    parser_sqlite.add_argument('--students', type=int, default=400)
+    parser_sqlite.add_argument('--profiles', nargs='+', default=['default', 'production'])
+    parser_sqlite.set_defaults(func=sqlite_writes)
+    
+    args = parser.parse_args()
+    return args.func(args)
+
+if __name__ == '__main__':
+    sys.exit(main())
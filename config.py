@@ -16,6 +16,12 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SQLALCHEMY_ECHO = False  # Set to True for SQL debugging
     
+    # SQLite connection PRAGMAs: 'production' (WAL, busy timeout, larger cache) or 'default' (SQLite's own)
+    SQLITE_PROFILE = os.environ.get('SQLITE_PROFILE', 'production')
+    SQLITE_BUSY_TIMEOUT = os.environ.get('SQLITE_BUSY_TIMEOUT')  # ms, overrides the profile
+    SQLITE_CACHE_SIZE = os.environ.get('SQLITE_CACHE_SIZE')  # pages, or KiB if negative
+    SQLITE_MMAP_SIZE = os.environ.get('SQLITE_MMAP_SIZE')  # bytes, 0 to disable
+    
     # Session settings
     PERMANENT_SESSION_LIFETIME = timedelta(hours=24)
     SESSION_COOKIE_SECURE = False  # Set to True in production with HTTPS
@@ -31,11 +37,57 @@ class Config:
     AI_ANALYTICS_ENABLED = True
     MIN_DATA_POINTS_FOR_PREDICTION = 3
     CLUSTERING_MIN_STUDENTS = 3
+    # Processes for ?by_section=1 per web process: the cores split among the
+    # GUNICORN_WORKERS / WEB_CONCURRENCY web processes; 1 analyzes in-process
+    CLASS_ANALYTICS_WORKERS = int(os.environ.get('CLASS_ANALYTICS_WORKERS') or max(
+        1, (os.cpu_count() or 1) // int(os.environ.get('GUNICORN_WORKERS') or os.environ.get('WEB_CONCURRENCY') or 1)
+    ))
+    USER_IMPORT_HASH_WORKERS = int(os.environ.get('USER_IMPORT_HASH_WORKERS') or 0)  # password hashing processes, 0 for one per core
+    PDF_EXTRACT_BY_PAGE = os.environ.get('PDF_EXTRACT_BY_PAGE', 'true').lower() in ['true', 'on', '1']
+    PDF_EXTRACT_WORKERS = int(os.environ.get('PDF_EXTRACT_WORKERS') or 0)  # PDF page reading processes, 0 for one per core
+    IMPORT_JOB_WORKERS = int(os.environ.get('IMPORT_JOB_WORKERS') or 1)  # import job threads per process
+    IMPORT_JOB_POLL_INTERVAL = float(os.environ.get('IMPORT_JOB_POLL_INTERVAL') or 2.0)  # seconds
+    IMPORT_JOB_FOLDER = os.environ.get('IMPORT_JOB_FOLDER')  # uploaded files waiting to be read, default instance/import_jobs
+    
+    # Heavy subsystems (analytics, imports or all) imported at startup instead of on first use
+    PRELOAD_MODULES = os.environ.get('PRELOAD_MODULES', '')
+    
+    # Analytics result cache ('memory' per process, or 'redis' shared by all workers)
+    ANALYTICS_CACHE_BACKEND = os.environ.get('ANALYTICS_CACHE_BACKEND', 'memory')
+    ANALYTICS_CACHE_URL = os.environ.get('ANALYTICS_CACHE_URL', 'redis://localhost:6379/0')
+    ANALYTICS_CACHE_MAX_ENTRIES = int(os.environ.get('ANALYTICS_CACHE_MAX_ENTRIES') or 1024)
+    ANALYTICS_CACHE_TTL = int(os.environ.get('ANALYTICS_CACHE_TTL') or 300)  # seconds
+    ANALYTICS_CACHE_SCHOOL_TTL = int(os.environ.get('ANALYTICS_CACHE_SCHOOL_TTL') or 30)  # seconds, school-wide results
+    
+    # Write-behind interaction logging (flushed on batch size or interval, and at exit)
+    INTERACTION_BUFFER_ENABLED = os.environ.get('INTERACTION_BUFFER_ENABLED', 'true').lower() in ['true', 'on', '1']
+    INTERACTION_BUFFER_BATCH_SIZE = int(os.environ.get('INTERACTION_BUFFER_BATCH_SIZE') or 200)
+    INTERACTION_BUFFER_FLUSH_INTERVAL = float(os.environ.get('INTERACTION_BUFFER_FLUSH_INTERVAL') or 2.0)  # seconds
+    INTERACTION_BUFFER_MAX_SIZE = int(os.environ.get('INTERACTION_BUFFER_MAX_SIZE') or 10000)
+    TRACKING_MAX_EVENTS = int(os.environ.get('TRACKING_MAX_EVENTS') or 100)  # Events per tracking request
+    TRACKING_MAX_DURATION = int(os.environ.get('TRACKING_MAX_DURATION') or 4 * 3600)  # seconds, longer reports are capped
+    
+    # Compiled quiz answer keys (per process, dropped when a quiz is edited or deleted)
+    ANSWER_KEY_CACHE_MAX_ENTRIES = int(os.environ.get('ANSWER_KEY_CACHE_MAX_ENTRIES') or 512)
+    
+    # Compiled translations (python i18n.py build), compiled from translations.py when missing or stale
+    I18N_CATALOG_PATH = os.environ.get('I18N_CATALOG_PATH')
+    
+    # Authenticated user snapshots (per process, dropped when the user is edited or deleted)
+    PRINCIPAL_CACHE_TTL = int(os.environ.get('PRINCIPAL_CACHE_TTL') or 60)  # seconds
+    PRINCIPAL_CACHE_LOCAL_TTL = int(os.environ.get('PRINCIPAL_CACHE_LOCAL_TTL') or 5)  # seconds, without redis
+    PRINCIPAL_CACHE_MAX_ENTRIES = int(os.environ.get('PRINCIPAL_CACHE_MAX_ENTRIES') or 10000)
+    
+    # Queued quiz submissions (acknowledged at once, graded and committed in batches)
+    QUIZ_SUBMISSION_QUEUE_ENABLED = os.environ.get('QUIZ_SUBMISSION_QUEUE_ENABLED', 'false').lower() in ['true', 'on', '1']
+    QUIZ_GRADING_BATCH_SIZE = int(os.environ.get('QUIZ_GRADING_BATCH_SIZE') or 100)
+    QUIZ_GRADING_POLL_INTERVAL = float(os.environ.get('QUIZ_GRADING_POLL_INTERVAL') or 1.0)  # seconds
     
     # Platform settings
     PLATFORM_NAME = "School Platform"
     PLATFORM_VERSION = "1.0.0"
     ITEMS_PER_PAGE = 10
+    MAX_ITEMS_PER_PAGE = int(os.environ.get('MAX_ITEMS_PER_PAGE') or 100)  # Largest ?per_page accepted by listings
     
     # Email settings (for future use)
     MAIL_SERVER = os.environ.get('MAIL_SERVER')
@@ -60,6 +112,7 @@ class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
     WTF_CSRF_ENABLED = False
+    INTERACTION_BUFFER_ENABLED = False  # Write interactions immediately so tests see them
 
 # Configuration dictionary
 config = {
@@ -1,124 +1,150 @@
+import csv
+import io
 import os
-import pandas as pd
-from werkzeug.security import generate_password_hash
 from flask import current_app
 
-def extract_users_from_excel(excel_file):
+# Masar columns: account name (username), student name (full name), and secret code in the fifth column
+USERNAME_COLUMN = 0
+FULL_NAME_COLUMN = 1
+SECRET_CODE_COLUMN = 4
+MIN_COLUMNS = 5
+
+# Rows between progress reports
+PROGRESS_INTERVAL = 1000
+
+XLSX_SIGNATURE = b'PK\x03\x04'
+XLS_SIGNATURE = b'\xd0\xcf\x11\xe0'
+
+class InvalidUserFile(ValueError):
+    """Raised when an uploaded file has no rows or too few columns"""
+
+def _cell(row, column):
+    # Rows of a read-only workbook or a CSV file can be shorter than the header
+    value = row[column] if column < len(row) else None
+    if value is None or value == '' or value != value:  # Missing, blank CSV field or NaN
+        return None
+    return value
+
+def _xlsx_rows(excel_file):
+    from openpyxl import load_workbook
+    
+    # Read-only mode streams the sheet instead of loading every cell
+    workbook = load_workbook(excel_file, read_only=True, data_only=True)
+    try:
+        yield from workbook.active.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+def _xls_rows(excel_file):
+    import pandas as pd
+    
+    # Legacy .xls workbooks cannot be streamed, so they are read whole
+    df = pd.read_excel(excel_file, header=None)
+    yield from df.itertuples(index=False, name=None)
+
+def _csv_rows(excel_file):
+    text = io.TextIOWrapper(excel_file, encoding='utf-8-sig', newline='')
+    try:
+        sample = text.read(64 * 1024)
+        text.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+        except csv.Error:
+            dialect = csv.excel
+        yield from csv.reader(text, dialect)
+    finally:
+        # Leave the caller's file open
+        text.detach()
+
+def iter_excel_rows(excel_file):
     """
-    Extract user information from an Excel file in Masar format
+    Stream the rows of an Excel workbook (.xlsx or .xls) or a CSV file
+    
+    The format is recognized from the content, so the file name is not needed.
+    
+    Yields:
+        tuple: Cell values of each row, header row first
+    """
+    signature = excel_file.read(4)
+    excel_file.seek(0)
+    if signature == XLSX_SIGNATURE:
+        return _xlsx_rows(excel_file)
+    if signature == XLS_SIGNATURE:
+        return _xls_rows(excel_file)
+    return _csv_rows(excel_file)
+
+def iter_users_from_excel(excel_file):
+    """
+    Lazily extract user information from an Excel or CSV file in Masar format
+    
+    Only the username, full name and secret code columns are read, one row
+    at a time, so memory use does not grow with the size of the file.
     
     Args:
-        excel_file: The uploaded Excel file object
+        excel_file: The uploaded file object (binary, seekable)
     
-    Returns:
-        A list of dictionaries containing user information
+    Yields:
+        dict: username, full_name and secret_code of each valid row
+    
+    Raises:
+        InvalidUserFile: If the file is empty or does not have enough columns
     """
-    users = []
+    rows = iter_excel_rows(excel_file)
+    header = next(rows, None)
+    if header is None:
+        raise InvalidUserFile('The Excel file is empty')
     
-    try:
-        # Read the Excel file
-        df = pd.read_excel(excel_file)
-        
-        # Check if the dataframe is empty
-        if df.empty:
-            return {'error': 'The Excel file is empty'}
-        
-        # Get the column names
-        columns = df.columns.tolist()
-        
-        # Check if we have at least 5 columns (account name, student name, and secret code in fifth column)
-        if len(columns) < 5:
-            return {'error': 'The Excel file does not have enough columns'}
+    # Check if we have at least 5 columns (account name, student name, and secret code in fifth column)
+    if len(header) < MIN_COLUMNS:
+        raise InvalidUserFile('The Excel file does not have enough columns')
+    
+    has_rows = False
+    for row in rows:
+        has_rows = True
+        username = _cell(row, USERNAME_COLUMN)
+        full_name = _cell(row, FULL_NAME_COLUMN)
+        secret_code = _cell(row, SECRET_CODE_COLUMN)
         
-        # Process each row in the Excel file
-        for index, row in df.iterrows():
-            # Skip rows with empty values in essential columns
-            if pd.isna(row[0]) or pd.isna(row[1]) or pd.isna(row[4]):
-                continue
-                
-            # Extract user information
-            # First column: account name (username)
-            # Second column: student name (full name)
-            # Fifth column: secret code (password)
-            user = {
-                'username': str(row[0]).strip(),
-                'full_name': str(row[1]).strip(),
-                'secret_code': str(row[4]).strip()
-            }
-            
-            users.append(user)
+        # Skip rows with empty values in essential columns
+        if username is None or full_name is None or secret_code is None:
+            continue
         
-        if not users:
-            return {'error': 'No valid user data found in the Excel file'}
-            
-        return users
+        yield {
+            'username': str(username).strip(),
+            'full_name': str(full_name).strip(),
+            'secret_code': str(secret_code).strip()
+        }
     
-    except Exception as e:
-        current_app.logger.error(f"Error processing Excel file: {str(e)}")
-        return {'error': f'Error processing Excel file: {str(e)}'}
+    if not has_rows:
+        raise InvalidUserFile('The Excel file is empty')
 
-def create_users_from_data(user_data, default_role, section_id, default_password):
+def extract_users_from_excel(excel_file, progress=None):
     """
-    Create user accounts from the extracted data
+    Extract user information from an Excel or CSV file in Masar format
     
     Args:
-        user_data: List of dictionaries containing user information
-        default_role: Role to assign to all users
-        section_id: Section ID for student accounts
-        default_password: Default password for all accounts (used as fallback if secret_code is not available)
+        excel_file: The uploaded file object
+        progress: Optional callable (rows) called every PROGRESS_INTERVAL users
     
     Returns:
-        A dictionary with success/error information
+        A list of dictionaries containing user information
     """
-    from app import db, User
-    
-    created_users = []
-    errors = []
+    users = []
     
-    for user in user_data:
-        try:
-            # Generate email from username
-            email = f"{user['username']}@school.com"
-            
-            # Check if user already exists
-            existing_user = User.query.filter(
-                (User.username == user['username']) | (User.email == email)
-            ).first()
-            
-            if existing_user:
-                errors.append(f"User {user['username']} already exists")
-                continue
-            
-            # Use the secret_code as the password
-            # If secret_code is not available, fall back to default_password
-            user_password = user.get('secret_code', default_password)
-            
-            # Create new user
-            new_user = User(
-                username=user['username'],
-                email=email,
-                password_hash=generate_password_hash(user_password),
-                role=default_role,
-                section_id=int(section_id) if default_role == 'student' and section_id else None
-            )
-            
-            db.session.add(new_user)
-            created_users.append(user)
+    try:
+        for user in iter_users_from_excel(excel_file):
+            users.append(user)
+            if progress and len(users) % PROGRESS_INTERVAL == 0:
+                progress(len(users))
+        
+        if not users:
+            return {'error': 'No valid user data found in the Excel file'}
         
-        except Exception as e:
-            current_app.logger.error(f"Error creating user {user['username']}: {str(e)}")
-            errors.append(f"Error creating user {user['username']}: {str(e)}")
+        return users
     
-    # Commit all successful user creations
-    if created_users:
-        try:
-            db.session.commit()
-        except Exception as e:
-            db.session.rollback()
-            current_app.logger.error(f"Database error: {str(e)}")
-            return {'error': f'Database error: {str(e)}', 'created': [], 'errors': errors}
-    
-    return {
-        'created': created_users,
-        'errors': errors
-    }
+    except InvalidUserFile as e:
+        return {'error': str(e)}
+    
+    except Exception as e:
+        current_app.logger.error(f"Error processing Excel file: {str(e)}")
+        return {'error': f'Error processing Excel file: {str(e)}'}
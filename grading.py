@@ -0,0 +1,184 @@
+"""
+Quiz grading for School Platform
+Quizzes are compiled once into immutable answer keys (normalized answers,
+points and question types) that every submission is graded against. Every
+change to a quiz or its questions bumps Quiz.revision, and a cached key is
+only used while the revision it was compiled from is still current, so a
+quiz edited through one worker is never graded against an old key in another.
+"""
+
+import threading
+from collections import OrderedDict, namedtuple
+
+# Question types graded by exact match, and by case-insensitive match
+EXACT_MATCH_TYPES = {'multiple_choice', 'true_false'}
+CASE_INSENSITIVE_TYPES = {'short_answer'}
+
+QuestionKey = namedtuple('QuestionKey', ['id', 'question_type', 'answer', 'points'])
+
+def normalize_answer(question_type, answer):
+    """
+    Normalize an answer the way it is compared for its question type
+    
+    Returns:
+        str: Normalized answer, or None if it can never be correct
+    """
+    if not isinstance(answer, str):
+        return None
+    if question_type in EXACT_MATCH_TYPES:
+        return answer.strip()
+    if question_type in CASE_INSENSITIVE_TYPES:
+        return answer.lower().strip()
+    return None
+
+class AnswerKey(namedtuple('AnswerKey', ['quiz_id', 'questions', 'total_points'])):
+    """Compiled answer key of a quiz; questions is a tuple of QuestionKey"""
+    
+    __slots__ = ()
+    
+    def grade(self, answers):
+        """
+        Score submitted answers
+        
+        Args:
+            answers: Mapping of question id (as a string) to the submitted answer
+        
+        Returns:
+            int: Points scored
+        """
+        score = 0
+        for question in self.questions:
+            answer = answers.get(str(question.id))
+            if question.answer is not None and answer and normalize_answer(question.question_type, answer) == question.answer:
+                score += question.points
+        return score
+
+def compile_answer_key(quiz_id):
+    """Load a quiz's questions and compile them into an AnswerKey"""
+    from app import db, Question
+    
+    rows = db.session.execute(
+        db.select(Question.id, Question.question_type, Question.correct_answer, Question.points)
+        .where(Question.quiz_id == quiz_id).order_by(Question.id)
+    ).all()
+    
+    questions = tuple(
+        QuestionKey(question_id, question_type, normalize_answer(question_type, correct_answer), points or 0)
+        for question_id, question_type, correct_answer, points in rows
+    )
+    return AnswerKey(quiz_id, questions, sum(question.points for question in questions))
+
+class AnswerKeyCache:
+    """
+    Per-process LRU cache of compiled answer keys
+    
+    Each key remembers the revision of its quiz when it was compiled, and
+    every lookup reads the current revision from the database (one primary
+    key query), so keys retired by an edit in another process are compiled
+    again here.
+    """
+    
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # quiz_id -> (revision, AnswerKey)
+        self._counters = dict.fromkeys(['hits', 'misses', 'invalidations'], 0)
+        self._lock = threading.Lock()
+    
+    def get(self, quiz_id):
+        """Return the answer key of a quiz, compiling it on a miss or a newer revision"""
+        from app import db, Quiz
+        
+        # Read before compiling: an edit in between leaves a key with an old revision
+        revision = db.session.execute(db.select(Quiz.revision).where(Quiz.id == quiz_id)).scalar()
+        with self._lock:
+            entry = self._entries.get(quiz_id)
+            if entry is not None and entry[0] == revision:
+                self._entries.move_to_end(quiz_id)
+                self._counters['hits'] += 1
+                return entry[1]
+            self._counters['misses'] += 1
+        
+        answer_key = compile_answer_key(quiz_id)
+        with self._lock:
+            self._entries[quiz_id] = (revision, answer_key)
+            self._entries.move_to_end(quiz_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return answer_key
+    
+    def invalidate(self, quiz_ids):
+        """Drop the answer keys of the given quizzes in this process"""
+        quiz_ids = sorted(set(quiz_ids))
+        if not quiz_ids:
+            return
+        with self._lock:
+            for quiz_id in quiz_ids:
+                self._entries.pop(quiz_id, None)
+            self._counters['invalidations'] += len(quiz_ids)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['entries'] = len(self._entries)
+            stats['max_entries'] = self.max_entries
+            return stats
+
+# Shared cache instance, configured by init_app
+answer_keys = AnswerKeyCache()
+
+def init_app(app, db):
+    """
+    Configure the shared cache and drop answer keys when quizzes change
+    
+    Settings:
+        ANSWER_KEY_CACHE_MAX_ENTRIES: Maximum number of cached answer keys
+    """
+    answer_keys.max_entries = app.config.get('ANSWER_KEY_CACHE_MAX_ENTRIES', 512)
+    _register_invalidation(db)
+
+def _register_invalidation(db):
+    """Bump the revision of quizzes whose quiz or questions change, and drop their keys on commit"""
+    from sqlalchemy import event
+    from app import Quiz, Question
+    
+    if getattr(_register_invalidation, '_registered', False):
+        return
+    _register_invalidation._registered = True
+    
+    @event.listens_for(db.session, 'before_flush')
+    def bump_quiz_revisions(session, flush_context, instances):
+        quiz_ids = set()
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+            if isinstance(obj, Question) and obj.quiz_id is not None:
+                quiz_ids.add(obj.quiz_id)
+            elif isinstance(obj, Quiz) and obj.id is not None and session.is_modified(obj):
+                quiz_ids.add(obj.id)
+        
+        with session.no_autoflush:
+            for quiz_id in quiz_ids:
+                quiz = session.get(Quiz, quiz_id)
+                if quiz is not None and quiz not in session.deleted:
+                    quiz.revision = (quiz.revision or 0) + 1
+    
+    @event.listens_for(db.session, 'after_flush')
+    def collect_changed_quizzes(session, flush_context):
+        changed = session.info.setdefault('graded_quizzes_changed', set())
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+            if isinstance(obj, Quiz):
+                changed.add(obj.id)
+            elif isinstance(obj, Question):
+                changed.add(obj.quiz_id)
+    
+    @event.listens_for(db.session, 'after_commit')
+    def invalidate_changed_quizzes(session):
+        quiz_ids = session.info.pop('graded_quizzes_changed', None)
+        if quiz_ids:
+            answer_keys.invalidate(quiz_id for quiz_id in quiz_ids if quiz_id is not None)
+    
+    @event.listens_for(db.session, 'after_rollback')
+    def discard_changed_quizzes(session):
+        session.info.pop('graded_quizzes_changed', None)
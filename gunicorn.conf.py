@@ -0,0 +1,95 @@
+"""
+Gunicorn settings for School Platform
+The app is loaded once in the master (preload_app) with its models, compiled
+translations and analytics libraries, then forked into workers that share
+those pages copy-on-write. Each worker drops the database connections it
+inherited and serves requests from a pool of threads.
+
+Usage:
+    gunicorn --config gunicorn.conf.py run:app
+
+Settings (environment):
+    PORT / GUNICORN_BIND: Address to listen on (default 0.0.0.0:$PORT, port 8000)
+    GUNICORN_WORKERS: Worker processes (default WEB_CONCURRENCY, else one per core)
+    GUNICORN_THREADS: Threads per worker (default 8)
+    GUNICORN_WORKER_CLASS: Worker class (default gthread)
+    GUNICORN_PRELOAD: Load the app in the master before forking (default true)
+    GUNICORN_TIMEOUT: Seconds before a silent worker is restarted (default 60)
+"""
+
+import gc
+import os
+
+def _available_cores():
+    # Cores this process may run on, as in user_import.available_cores
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+cores = _available_cores()
+
+bind = os.environ.get('GUNICORN_BIND') or f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+
+# One process per core for the work that holds the GIL (analytics, hashing),
+# and threads for requests waiting on SQLite or slow clients. More processes
+# than cores only split the per-process caches and add context switches
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+workers = int(os.environ.get('GUNICORN_WORKERS') or os.environ.get('WEB_CONCURRENCY') or cores)
+threads = int(os.environ.get('GUNICORN_THREADS') or 8)
+
+# Per-section class analytics pools share the cores with the workers: with one
+# worker per core each worker analyzes sections in-process
+os.environ.setdefault('CLASS_ANALYTICS_WORKERS', str(max(1, cores // workers)))
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT') or 60)
+graceful_timeout = 30
+keepalive = 5
+
+# Heartbeat files on a tmpfs, so a slow disk cannot get workers killed
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() in ['true', 'on', '1']
+
+if preload_app:
+    # Import analytics and file import libraries in the master as well, so
+    # no worker imports them again on its first analytics request
+    os.environ.setdefault('PRELOAD_MODULES', 'all')
+
+def warm_app():
+    """Build the state each worker would otherwise build on its first requests"""
+    from app import translation_catalog
+    from lazy_modules import analytics
+    
+    for language in translation_catalog.languages:
+        translation_catalog.bundle(language)
+    if analytics.loaded:
+        analytics.get_analytics_instance()
+
+def when_ready(server):
+    if not preload_app:
+        return
+    warm_app()
+    # Keep the collector from touching, and so copying, the objects loaded
+    # by the master in every worker
+    gc.collect()
+    gc.freeze()
+    server.log.info(f"Preloaded app shared by {workers} workers x {threads} threads ({gc.get_freeze_count()} objects frozen)")
+
+def worker_exit(server, worker):
+    # Stop the worker's section analysis processes with it
+    from lazy_modules import analytics
+    
+    if analytics.loaded:
+        analytics.shutdown_section_pool()
+
+def post_fork(server, worker):
+    if not preload_app:
+        return
+    # Connections opened by the master are not safe to share: give each
+    # worker an empty pool without closing the master's connections
+    from app import app, db
+    
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Translation catalogs for School Platform
+The literal dicts in translations.py are compiled once into flat tables per
+language, with missing keys filled from English, so a lookup is a single
+dict access and the template context of each language is built once. The
+tables can be written to a compact JSON catalog that the app loads instead
+of importing translations.py; a catalog built from an older translations.py
+is ignored. Each table is also served to browsers and the mobile app as a
+minified, precompressed JSON bundle named by its content hash.
+
+Usage:
+    python i18n.py build    Write the compiled catalog
+    python i18n.py check    Check the compiled tables against get_translation
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import sys
+from collections import namedtuple
+
+DEFAULT_LANGUAGE = 'en'
+SOURCE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'translations.py')
+DEFAULT_CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'translations.catalog.json')
+
+def source_hash(path=SOURCE_PATH):
+    """Hash of translations.py, recorded in catalogs built from it"""
+    with open(path, 'rb') as source:
+        return hashlib.sha256(source.read()).hexdigest()
+
+# Bundles are named by their content hash, so a versioned URL never changes content
+BUNDLE_MAX_AGE = 365 * 24 * 3600
+
+Bundle = namedtuple('Bundle', ['language', 'version', 'encodings'])  # encodings: content coding -> body
+
+def build_bundle(language, table):
+    """
+    Minified JSON of a table, with gzip and (if the brotli package is installed) brotli variants
+    
+    Returns:
+        Bundle
+    """
+    body = json.dumps(table, ensure_ascii=False, separators=(',', ':'), sort_keys=True).encode('utf-8')
+    encodings = {'identity': body, 'gzip': gzip.compress(body, compresslevel=9, mtime=0)}
+    try:
+        import brotli
+    except ImportError:
+        pass
+    else:
+        encodings['br'] = brotli.compress(body, quality=11)
+    return Bundle(language, hashlib.sha256(body).hexdigest()[:16], encodings)
+
+def bundle_response(bundle, immutable=False):
+    """
+    Serve a bundle in the best encoding the client accepts, or 304 if it has it
+    
+    Args:
+        bundle: Bundle to serve
+        immutable: Whether the URL names the bundle's version, so clients can
+            keep it for a year without revalidating
+    
+    Returns:
+        Response
+    """
+    from flask import request, Response
+    
+    accepted = [
+        encoding for encoding in ('br', 'gzip')
+        if encoding in bundle.encodings and request.accept_encodings[encoding]
+    ]
+    encoding = accepted[0] if accepted else 'identity'
+    etags = {name: bundle.version if name == 'identity' else f'{bundle.version}-{name}' for name in bundle.encodings}
+    
+    if request.if_none_match and (request.if_none_match.star_tag or any(
+        request.if_none_match.contains_weak(etag) for etag in etags.values()
+    )):
+        response = Response(status=304)
+    else:
+        response = Response(bundle.encodings[encoding], mimetype='application/json')
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+        response.headers['Content-Language'] = bundle.language
+    
+    response.set_etag(etags[encoding])
+    response.headers['Vary'] = 'Accept-Encoding'
+    if immutable:
+        response.headers['Cache-Control'] = f'public, max-age={BUNDLE_MAX_AGE}, immutable'
+    else:
+        response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def compile_tables(translations):
+    """
+    Flatten the translation dicts into fallback-resolved tables
+    
+    Returns:
+        dict: language -> {key: text}, each holding every English key
+    """
+    default = translations[DEFAULT_LANGUAGE]
+    return {language: {**default, **texts} for language, texts in translations.items()}
+
+class Catalog:
+    """Compiled translation tables with a cached template context per language"""
+    
+    def __init__(self, tables):
+        self.tables = tables
+        self._bundles = {}
+        self._translators = {language: self._translator(table) for language, table in tables.items()}
+        self._contexts = {
+            language: {
+                'current_language': language,
+                't': self._translators[language],
+                'translations': table
+            }
+            for language, table in tables.items()
+        }
+    
+    @staticmethod
+    def _translator(table):
+        get = table.get
+        return lambda key: get(key, key)
+    
+    @property
+    def languages(self):
+        return list(self.tables)
+    
+    def table(self, language):
+        """Table of a language, English for unknown languages"""
+        return self.tables.get(language, self.tables[DEFAULT_LANGUAGE])
+    
+    def translate(self, key, language=DEFAULT_LANGUAGE):
+        """Same result as translations.get_translation"""
+        return self.table(language).get(key, key)
+    
+    def bundle(self, language):
+        """
+        JSON bundle of a language, built on first use
+        
+        Returns:
+            Bundle, or None for unknown languages
+        """
+        bundle = self._bundles.get(language)
+        if bundle is None and language in self.tables:
+            bundle = self._bundles[language] = build_bundle(language, self.tables[language])
+        return bundle
+    
+    def template_context(self, language):
+        """Template variables for a language: current_language, t and translations"""
+        context = self._contexts.get(language)
+        if context is None:
+            # Unknown languages keep their name but get the English texts
+            context = dict(self._contexts[DEFAULT_LANGUAGE], current_language=language)
+        return context
+
+def write_catalog(path=DEFAULT_CATALOG_PATH):
+    """
+    Compile translations.py and write the tables as a compact JSON catalog
+    
+    Returns:
+        Catalog
+    """
+    from translations import translations
+    
+    tables = compile_tables(translations)
+    with open(path, 'w', encoding='utf-8') as catalog_file:
+        json.dump({'source_hash': source_hash(), 'languages': tables}, catalog_file,
+                  ensure_ascii=False, separators=(',', ':'), sort_keys=True)
+    return Catalog(tables)
+
+def load_catalog(path=DEFAULT_CATALOG_PATH):
+    """
+    Load the compiled catalog, or compile translations.py if it is missing or stale
+    
+    Returns:
+        Catalog
+    """
+    try:
+        with open(path, encoding='utf-8') as catalog_file:
+            data = json.load(catalog_file)
+        if not os.path.exists(SOURCE_PATH) or data.get('source_hash') == source_hash():
+            return Catalog(data['languages'])
+    except (OSError, ValueError, KeyError):
+        pass
+    
+    from translations import translations
+    return Catalog(compile_tables(translations))
+
+def check_catalog(catalog):
+    """
+    Compare every table entry with get_translation
+    
+    Every key of every language is looked up in every language, plus an
+    unknown language and an unknown key.
+    
+    Returns:
+        int: Number of mismatches
+    """
+    from translations import translations, get_translation
+    
+    keys = set().union(*translations.values()) | {'no_such_translation_key'}
+    mismatches = 0
+    for language in list(translations) + ['xx']:
+        for key in sorted(keys):
+            if catalog.translate(key, language) != get_translation(key, language):
+                print(f"Mismatch for {language}/{key}: {catalog.translate(key, language)!r} != {get_translation(key, language)!r}")
+                mismatches += 1
+    if sorted(catalog.languages) != sorted(translations):
+        print(f"Languages differ: {sorted(catalog.languages)} != {sorted(translations)}")
+        mismatches += 1
+    return mismatches
+
+def init_app(app):
+    """
+    Load the app's catalog
+    
+    Settings:
+        I18N_CATALOG_PATH: Compiled catalog written by `python i18n.py build`
+    
+    Returns:
+        Catalog
+    """
+    return load_catalog(app.config.get('I18N_CATALOG_PATH') or DEFAULT_CATALOG_PATH)
+
+def main():
+    parser = argparse.ArgumentParser(description='Build and check the compiled translation catalog')
+    parser.add_argument('command', choices=['build', 'check'])
+    parser.add_argument('--path', default=os.environ.get('I18N_CATALOG_PATH') or DEFAULT_CATALOG_PATH)
+    args = parser.parse_args()
+    
+    if args.command == 'build':
+        write_catalog(args.path)
+        print(f"Wrote {args.path}")
+    
+    # The loaded catalog, from the file if it is fresh, must match get_translation
+    mismatches = check_catalog(load_catalog(args.path))
+    if mismatches:
+        print(f"{mismatches} translations differ from get_translation")
+        return 1
+    
+    print("Every compiled translation matches get_translation")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,379 @@
+"""
+Background user imports for School Platform
+Uploaded files and confirmed imports are stored as ImportJob rows and run by
+worker threads in the web process, so reading, hashing and inserting a
+large file is not bound by request timeouts. Progress counters are written to
+the job row, so the polling page works whichever process serves it.
+
+A parse job streams the rows it reads into a JSON-lines file, kept as the
+job's file_path, and only stores the first PREVIEW_ROWS for the preview; the
+create job confirming it reads the rows from that file.
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+# Parse jobs read an uploaded file for the preview; create jobs create the accounts
+JOB_KINDS = ('parse', 'create')
+JOB_COUNTERS = ['rows_total', 'rows_parsed', 'rows_hashed', 'rows_inserted', 'rows_failed']
+
+# Rows of a read file shown on the preview page
+PREVIEW_ROWS = 200
+
+def save_upload(file_content, filename, folder):
+    """
+    Store an uploaded file until its parse job has read it
+    
+    Returns:
+        str: Path of the stored file
+    """
+    os.makedirs(folder, exist_ok=True)
+    extension = filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
+    path = os.path.join(folder, f"{uuid.uuid4().hex}.{extension}")
+    with open(path, 'wb') as stored:
+        stored.write(file_content)
+    return path
+
+def submit_job(kind, created_by, payload, file_path=None):
+    """
+    Queue an import job and wake the runner
+    
+    Args:
+        kind: 'parse' or 'create'
+        created_by: Admin submitting the job
+        payload: JSON-serializable import settings (and rows for create jobs
+            without a rows file)
+        file_path: Uploaded file for parse jobs, rows file of the confirmed
+            parse job for create jobs
+    
+    Returns:
+        ImportJob
+    """
+    from app import db, ImportJob
+    
+    if kind not in JOB_KINDS:
+        raise ValueError(f'Unknown import job kind: {kind!r}')
+    
+    job = ImportJob(kind=kind, created_by=created_by, payload=json.dumps(payload), file_path=file_path)
+    db.session.add(job)
+    db.session.commit()
+    import_job_runner.notify()
+    return job
+
+def claim_rows_file(parse_job):
+    """
+    Take the rows file of a completed parse job for the job confirming it
+    
+    The file is detached from the parse job with a conditional update, so a
+    preview confirmed twice is only imported once.
+    
+    Returns:
+        str: Path of the rows file, or None if it was already taken or removed
+    """
+    from app import db, ImportJob
+    
+    path = parse_job.file_path
+    if parse_job.kind != 'parse' or parse_job.status != 'completed' or not path or not os.path.exists(path):
+        return None
+    claimed = db.session.execute(
+        db.update(ImportJob).where(ImportJob.id == parse_job.id, ImportJob.file_path == path).values(file_path=None)
+    ).rowcount == 1
+    db.session.commit()
+    return path if claimed else None
+
+def read_rows_file(path):
+    """Rows written by a parse job, in file order"""
+    with open(path, encoding='utf-8') as rows_file:
+        return [json.loads(line) for line in rows_file]
+
+def job_status(job):
+    """
+    Progress of a job for the polling endpoint
+    
+    Returns:
+        dict: id, kind, status, row counters and times, with the error of a
+        failed job and the summary of a completed create job
+    """
+    status = {
+        'id': job.id,
+        'kind': job.kind,
+        'status': job.status,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None
+    }
+    status.update({counter: getattr(job, counter) or 0 for counter in JOB_COUNTERS})
+    if job.status == 'failed':
+        status['error'] = job.error
+    elif job.status == 'completed' and job.kind == 'create':
+        status['result'] = json.loads(job.result or '{}')
+    return status
+
+class ImportJobRunner:
+    """
+    Worker threads running queued import jobs one at a time each
+    
+    Threads wake when a job is submitted in this process, and every
+    poll_interval seconds to pick up jobs submitted elsewhere. A job is
+    claimed by a conditional update of its status, so it runs once even with
+    several processes. Jobs left running by a process that died are failed
+    after stale_after seconds without progress, and finished jobs are
+    deleted after retention seconds.
+    """
+    
+    def __init__(self, workers=1, poll_interval=2.0, stale_after=900, retention=86400, folder=None):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self.retention = retention
+        self.folder = folder
+        self.app = None
+        self._atexit_registered = False
+        self._reset()
+        os.register_at_fork(after_in_child=self._reset)
+    
+    def _reset(self):
+        # A forked child starts its own threads on its first notify
+        self._condition = threading.Condition()
+        self._threads = []
+        self._pending = False
+        self._stopping = False
+    
+    def notify(self):
+        """Wake the worker threads (starting them if needed)"""
+        with self._condition:
+            self._start_workers()
+            self._pending = True
+            self._condition.notify_all()
+    
+    def stop(self, timeout=10):
+        """Stop the worker threads after their current jobs"""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+            threads = list(self._threads)
+        for thread in threads:
+            thread.join(timeout)
+    
+    def run_next(self):
+        """
+        Claim and run the oldest queued job, if any
+        
+        Returns:
+            bool: Whether a job was run
+        """
+        with self.app.app_context():
+            job_id = self._claim()
+            if job_id is None:
+                return False
+            self._run(job_id)
+            return True
+    
+    def _claim(self):
+        from app import db, ImportJob
+        
+        now = datetime.utcnow()
+        try:
+            # Housekeeping: jobs of dead processes, and old finished jobs
+            db.session.execute(
+                db.update(ImportJob)
+                .where(ImportJob.status == 'running', ImportJob.updated_at < now - timedelta(seconds=self.stale_after))
+                .values(status='failed', error='Import interrupted', payload=None, finished_at=now)
+            )
+            expired = [ImportJob.status.in_(['completed', 'failed']), ImportJob.finished_at < now - timedelta(seconds=self.retention)]
+            for path in db.session.execute(db.select(ImportJob.file_path).where(*expired, ImportJob.file_path.isnot(None))).scalars():
+                _remove_file(path)
+            db.session.execute(db.delete(ImportJob).where(*expired))
+            
+            job_id = db.session.execute(
+                db.select(ImportJob.id).where(ImportJob.status == 'queued').order_by(ImportJob.id).limit(1)
+            ).scalar()
+            claimed = job_id is not None and db.session.execute(
+                db.update(ImportJob).where(ImportJob.id == job_id, ImportJob.status == 'queued')
+                .values(status='running', started_at=now, updated_at=now)
+            ).rowcount == 1
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return job_id if claimed else None
+    
+    def _run(self, job_id):
+        from app import db, ImportJob
+        
+        job = db.session.get(ImportJob, job_id)
+        payload = json.loads(job.payload or '{}')
+        try:
+            if job.kind == 'parse':
+                values = self._parse(job, payload)
+            else:
+                values = self._create(job, payload)
+        except Exception as e:
+            db.session.rollback()
+            self.app.logger.exception('Import job %d failed', job_id)
+            values = {'status': 'failed', 'error': str(e)}
+        
+        # The file read and the settings are not kept once the job is done;
+        # a parse job keeps the rows file it wrote instead
+        if job.file_path:
+            _remove_file(job.file_path)
+        db.session.execute(
+            db.update(ImportJob).where(ImportJob.id == job_id)
+            .values(dict({'payload': None, 'file_path': None, 'finished_at': datetime.utcnow()}, **values))
+        )
+        db.session.commit()
+    
+    def _parse(self, job, payload):
+        from app import db, Section
+        from lazy_modules import excel_import, pdf_import
+        
+        rows_path = os.path.join(self.folder, f"{uuid.uuid4().hex}.jsonl")
+        with open(job.file_path, 'rb') as uploaded:
+            if job.file_path.endswith('.pdf'):
+                users = pdf_import.extract_users_from_pdf(uploaded)
+                if isinstance(users, dict) and 'error' in users:
+                    return {'status': 'failed', 'error': users['error']}
+            else:
+                # Rows are streamed into the rows file, and reported as they are read
+                users = excel_import.iter_users_from_excel(uploaded)
+            try:
+                preview, rows_total = self._write_rows(job.id, users, rows_path, excel_import.PROGRESS_INTERVAL)
+            except excel_import.InvalidUserFile as e:
+                return {'status': 'failed', 'error': str(e)}
+        
+        if not rows_total:
+            _remove_file(rows_path)
+            return {'status': 'failed', 'error': 'No user data found in the file'}
+        
+        # Add role and section information to preview data
+        section_name = 'N/A'
+        if payload['default_role'] == 'student' and payload['section_id']:
+            section = db.session.get(Section, int(payload['section_id']))
+            section_name = section.name if section else 'Unknown'
+        preview_data = [dict(user, role=payload['default_role'], section_name=section_name) for user in preview]
+        
+        return {
+            'status': 'completed',
+            'result': json.dumps(dict(payload, users=preview_data, rows_total=rows_total)),
+            'rows_total': rows_total,
+            'rows_parsed': rows_total,
+            'file_path': rows_path
+        }
+    
+    def _write_rows(self, job_id, users, path, progress_interval):
+        # One JSON line per row; returns the first PREVIEW_ROWS rows and the row count
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        preview = []
+        rows_total = 0
+        try:
+            with open(path, 'w', encoding='utf-8') as rows_file:
+                for user in users:
+                    rows_file.write(json.dumps(user) + '\n')
+                    if len(preview) < PREVIEW_ROWS:
+                        preview.append(user)
+                    rows_total += 1
+                    if rows_total % progress_interval == 0:
+                        self._write_progress(job_id, rows_parsed=rows_total)
+        except BaseException:
+            _remove_file(path)
+            raise
+        return preview, rows_total
+    
+    def _create(self, job, payload):
+        from user_import import create_users_from_data, log_import_progress
+        
+        users = read_rows_file(job.file_path) if job.file_path else payload.get('users', [])
+        self._write_progress(job.id, rows_total=len(users), rows_parsed=len(users))
+        last_write = [0.0]
+        
+        def progress(stage, count, total):
+            log_import_progress(stage, count, total)
+            # Inserts hold the write lock until the import commits, so
+            # inserted rows are only recorded with the final result
+            if stage == 'inserted':
+                return
+            if stage == 'failed' or count == total or time.monotonic() - last_write[0] >= 0.5:
+                self._write_progress(job.id, **{f'rows_{stage}': count})
+                last_write[0] = time.monotonic()
+        
+        result = create_users_from_data(
+            users,
+            payload.get('default_role', 'student'),
+            payload.get('section_id', ''),
+            payload.get('default_password', 'changeme'),
+            progress=progress
+        )
+        if 'error' in result:
+            return {'status': 'failed', 'error': result['error'], 'rows_inserted': 0}
+        
+        return {
+            'status': 'completed',
+            'result': json.dumps({'created': len(result['created']), 'errors': result['errors']}),
+            'rows_inserted': len(result['created']),
+            'rows_failed': len(result['errors'])
+        }
+    
+    def _write_progress(self, job_id, **counters):
+        # Own connection and transaction, apart from the import's session
+        from app import db, ImportJob
+        
+        with db.engine.begin() as conn:
+            conn.execute(
+                db.update(ImportJob).where(ImportJob.id == job_id)
+                .values(updated_at=datetime.utcnow(), **counters)
+            )
+    
+    def _start_workers(self):
+        # Called with the condition held; started lazily so they run in the serving process
+        if self._threads or self._stopping:
+            return
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f'import-job-{index}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        if not self._atexit_registered:
+            atexit.register(self.stop)
+            self._atexit_registered = True
+    
+    def _work(self):
+        while True:
+            with self._condition:
+                if not self._pending and not self._stopping:
+                    self._condition.wait(self.poll_interval)
+                self._pending = False
+                if self._stopping:
+                    return
+            
+            try:
+                while self.run_next():
+                    pass
+            except Exception:
+                if self.app is not None:
+                    self.app.logger.exception('Failed to run import jobs')
+                time.sleep(self.poll_interval)
+
+def _remove_file(path):
+    if os.path.exists(path):
+        os.remove(path)
+
+# Shared runner, configured by init_app
+import_job_runner = ImportJobRunner()
+
+def init_app(app):
+    """
+    Configure the shared runner from app settings
+    
+    Settings:
+        IMPORT_JOB_WORKERS: Worker threads per process
+        IMPORT_JOB_POLL_INTERVAL: Seconds between checks for jobs submitted elsewhere
+        IMPORT_JOB_FOLDER: Where uploaded files wait for their parse job
+    """
+    import_job_runner.app = app
+    import_job_runner.workers = app.config.get('IMPORT_JOB_WORKERS', 1)
+    import_job_runner.poll_interval = app.config.get('IMPORT_JOB_POLL_INTERVAL', 2.0)
+    import_job_runner.folder = app.config.get('IMPORT_JOB_FOLDER') or os.path.join(app.instance_path, 'import_jobs')
@@ -0,0 +1,331 @@
+"""
+Write-behind logging of student interactions for School Platform
+Requests enqueue StudentInteraction rows in memory and return immediately; a
+background thread writes them in batched multi-row inserts once the batch
+size or the flush interval is reached, and a final flush runs when the
+process exits.
+"""
+
+import atexit
+import os
+import threading
+import time
+from collections import deque, defaultdict
+from datetime import datetime
+from types import SimpleNamespace
+
+# StudentInteraction columns carried by a buffered event
+INTERACTION_FIELDS = ['student_id', 'interaction_type', 'content_id', 'duration', 'performance_score', 'timestamp']
+
+class InteractionBuffer:
+    """
+    In-memory queue of interactions flushed to the database in batches
+    
+    Each flush inserts the queued rows with one executemany, updates the
+    students' analytics aggregates and commits once. When the queue is
+    full, new events are dropped and counted rather than blocking requests.
+    """
+    
+    def __init__(self, batch_size=200, flush_interval=2.0, max_size=10000, enabled=True):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_size = max_size
+        self.enabled = enabled
+        self.app = None
+        self._counters = dict.fromkeys(['enqueued', 'written', 'dropped', 'flushes', 'failed_flushes'], 0)
+        self._latency = {'last_flush_ms': 0.0, 'max_flush_ms': 0.0, 'total_flush_ms': 0.0}
+        self._atexit_registered = False
+        self._reset()
+        os.register_at_fork(after_in_child=self._reset)
+    
+    def _reset(self):
+        # Fresh queue, locks and worker; a forked child must not reuse the parent's
+        self._events = deque()
+        self._oldest = None
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._stopping = False
+    
+    def enqueue(self, student_id, interaction_type, content_id=None, duration=None, performance_score=None, timestamp=None):
+        """
+        Queue one interaction for writing
+        
+        Returns:
+            bool: False if the event was dropped because the queue is full
+        """
+        return self.enqueue_many([{
+            'student_id': student_id,
+            'interaction_type': interaction_type,
+            'content_id': content_id,
+            'duration': duration,
+            'performance_score': performance_score,
+            'timestamp': timestamp
+        }]) == 1
+    
+    def enqueue_many(self, events):
+        """
+        Queue several interactions for writing
+        
+        Args:
+            events: Dicts with INTERACTION_FIELDS keys; a missing timestamp
+                is set to the current time. An event with attach_duration
+                set reports the time spent so far on an interaction that is
+                already logged (a lesson view logged on page load): the
+                student's latest interaction of the same type and content
+                takes the longer of its duration and the reported one, and
+                the event is only inserted as a new interaction when there
+                is none.
+        
+        Returns:
+            int: Number of events accepted
+        """
+        now = datetime.utcnow()
+        events = [
+            dict(
+                {field: event.get(field) for field in INTERACTION_FIELDS},
+                timestamp=event.get('timestamp') or now,
+                attach_duration=bool(event.get('attach_duration'))
+            )
+            for event in events
+        ]
+        if not events:
+            return 0
+        
+        if not self.enabled:
+            self._write(events)
+            with self._condition:
+                self._counters['enqueued'] += len(events)
+                self._counters['written'] += len(events)
+            return len(events)
+        
+        with self._condition:
+            self._start_worker()
+            accepted = events[:max(self.max_size - len(self._events), 0)]
+            if accepted and not self._events:
+                self._oldest = time.monotonic()
+            self._events.extend(accepted)
+            self._counters['enqueued'] += len(accepted)
+            self._counters['dropped'] += len(events) - len(accepted)
+            if len(self._events) >= self.batch_size:
+                self._condition.notify()
+        return len(accepted)
+    
+    def flush(self):
+        """
+        Write every queued interaction now
+        
+        When the batch cannot be written because the database is
+        unavailable (locked, unreachable), the events go back to the front
+        of the queue (as far as it has room) to be retried by the next
+        flush. Any other failure means some events are invalid: they are
+        written one by one, and the events that still fail are dropped and
+        counted, so one bad event cannot hold back the rest.
+        
+        Returns:
+            int: Number of interactions written
+        """
+        with self._flush_lock:
+            with self._condition:
+                batch = list(self._events)
+                self._events.clear()
+                self._oldest = None
+            if not batch:
+                return 0
+            
+            started = time.perf_counter()
+            try:
+                self._write(batch)
+                written = len(batch)
+            except Exception as error:
+                if self.app is not None:
+                    self.app.logger.exception('Failed to write %d buffered interactions', len(batch))
+                with self._condition:
+                    self._counters['failed_flushes'] += 1
+                if _database_unavailable(error):
+                    self._requeue(batch)
+                    return 0
+                written = self._write_each(batch)
+            
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            with self._condition:
+                self._counters['written'] += written
+                self._counters['flushes'] += 1
+                self._latency['last_flush_ms'] = elapsed_ms
+                self._latency['max_flush_ms'] = max(self._latency['max_flush_ms'], elapsed_ms)
+                self._latency['total_flush_ms'] += elapsed_ms
+            return written
+    
+    def _write_each(self, batch):
+        # Retry a failed batch event by event; returns the number written
+        written = 0
+        for position, event in enumerate(batch):
+            try:
+                self._write([event])
+                written += 1
+            except Exception as error:
+                if _database_unavailable(error):
+                    self._requeue(batch[position:])
+                    break
+                with self._condition:
+                    self._counters['dropped'] += 1
+                if self.app is not None:
+                    self.app.logger.warning('Dropped interaction that could not be written: %r (%s)', event, error)
+        return written
+    
+    def _requeue(self, events):
+        # Put events back at the front of the queue, dropping what does not fit
+        with self._condition:
+            room = max(self.max_size - len(self._events), 0)
+            kept = events[:room]
+            self._events.extendleft(reversed(kept))
+            if kept:
+                self._oldest = time.monotonic()
+            self._counters['dropped'] += len(events) - len(kept)
+    
+    def stop(self, timeout=10):
+        """Stop the background thread and write whatever is still queued"""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        self.flush()
+    
+    def stats(self):
+        """Queue depth, event counters and flush latency"""
+        with self._condition:
+            stats = dict(self._counters)
+            stats['queue_depth'] = len(self._events)
+            stats['last_flush_ms'] = round(self._latency['last_flush_ms'], 3)
+            stats['max_flush_ms'] = round(self._latency['max_flush_ms'], 3)
+            stats['avg_flush_ms'] = round(self._latency['total_flush_ms'] / self._counters['flushes'], 3) \
+                if self._counters['flushes'] else 0
+            stats['batch_size'] = self.batch_size
+            stats['flush_interval'] = self.flush_interval
+            stats['max_size'] = self.max_size
+            stats['enabled'] = self.enabled
+            return stats
+    
+    def _start_worker(self):
+        # Called with the condition held; started lazily so it runs in the serving process
+        if self._thread is not None or self._stopping:
+            return
+        self._thread = threading.Thread(target=self._run, name='interaction-buffer', daemon=True)
+        self._thread.start()
+        if not self._atexit_registered:
+            atexit.register(self.stop)
+            self._atexit_registered = True
+    
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._stopping and len(self._events) < self.batch_size:
+                    if self._events:
+                        remaining = self._oldest + self.flush_interval - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._condition.wait(remaining)
+                    else:
+                        self._condition.wait()
+                stopping = self._stopping
+            
+            self.flush()
+            if stopping:
+                return
+    
+    def _write(self, events):
+        """Insert events, attach reported durations, update the students' aggregates and commit"""
+        from app import db, StudentInteraction
+        from analytics_state import record_activity
+        from analytics_cache import mark_students_written
+        
+        # Durations for interactions of this batch are merged before the insert;
+        # the others are merged into one report per interaction
+        rows = []
+        latest_rows = {}
+        late_durations = {}
+        for event in events:
+            key = (event['student_id'], event['interaction_type'], event['content_id'])
+            if event['attach_duration'] and key in latest_rows:
+                row = latest_rows[key]
+                row['duration'] = max(row['duration'] or 0, event['duration'] or 0)
+            elif event['attach_duration']:
+                reported = late_durations.get(key)
+                late_durations[key] = dict(event, duration=max(event['duration'] or 0, reported['duration'] if reported else 0))
+            else:
+                row = {field: event[field] for field in INTERACTION_FIELDS}
+                rows.append(row)
+                latest_rows[key] = row
+        
+        with self.app.app_context():
+            try:
+                durations = defaultdict(list)
+                if late_durations:
+                    # The latest logged interaction of every reported key, in one query
+                    key_columns = [StudentInteraction.student_id, StudentInteraction.interaction_type, StudentInteraction.content_id]
+                    latest_ids = db.select(db.func.max(StudentInteraction.id))\
+                        .where(db.tuple_(*key_columns).in_(list(late_durations)))\
+                        .group_by(*key_columns)
+                    logged = {
+                        (student_id, interaction_type, content_id): (interaction_id, duration)
+                        for interaction_id, student_id, interaction_type, content_id, duration in db.session.execute(
+                            db.select(StudentInteraction.id, *key_columns, StudentInteraction.duration)
+                            .where(StudentInteraction.id.in_(latest_ids))
+                        )
+                    }
+                    
+                    updates = []
+                    for key, event in late_durations.items():
+                        if key not in logged:
+                            rows.append({field: event[field] for field in INTERACTION_FIELDS})
+                            continue
+                        interaction_id, duration = logged[key]
+                        if event['duration'] <= (duration or 0):
+                            continue
+                        updates.append({'id': interaction_id, 'duration': event['duration']})
+                        durations[event['student_id']].append(event['duration'] - (duration or 0))
+                    
+                    if updates:
+                        db.session.execute(db.update(StudentInteraction), updates)
+                
+                if rows:
+                    db.session.execute(db.insert(StudentInteraction), rows)
+                
+                by_student = defaultdict(list)
+                for row in rows:
+                    by_student[row['student_id']].append(SimpleNamespace(**row))
+                for student_id in set(by_student) | set(durations):
+                    record_activity(student_id, interactions=by_student[student_id], durations=durations[student_id])
+                
+                mark_students_written(db.session, set(by_student) | set(durations), school=False)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+
+def _database_unavailable(error):
+    """Whether a write failed because of the database rather than the events"""
+    from sqlalchemy.exc import DBAPIError, OperationalError
+    
+    return isinstance(error, OperationalError) or (isinstance(error, DBAPIError) and error.connection_invalidated)
+
+# Shared buffer, configured by init_app
+interaction_buffer = InteractionBuffer()
+
+def init_app(app):
+    """
+    Configure the shared buffer from app settings
+    
+    Settings:
+        INTERACTION_BUFFER_ENABLED: Buffer writes (False writes each event immediately)
+        INTERACTION_BUFFER_BATCH_SIZE: Queued events that trigger a flush
+        INTERACTION_BUFFER_FLUSH_INTERVAL: Seconds an event may wait before a flush
+        INTERACTION_BUFFER_MAX_SIZE: Queue capacity; further events are dropped
+    """
+    interaction_buffer.app = app
+    interaction_buffer.enabled = app.config.get('INTERACTION_BUFFER_ENABLED', True)
+    interaction_buffer.batch_size = app.config.get('INTERACTION_BUFFER_BATCH_SIZE', 200)
+    interaction_buffer.flush_interval = app.config.get('INTERACTION_BUFFER_FLUSH_INTERVAL', 2.0)
+    interaction_buffer.max_size = app.config.get('INTERACTION_BUFFER_MAX_SIZE', 10000)
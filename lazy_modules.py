@@ -0,0 +1,111 @@
+"""
+Lazily imported subsystems for School Platform
+Analytics (pandas, NumPy, scikit-learn) and file imports (openpyxl, pandas,
+PyPDF2) take longer to import than the rest of the app together, yet most
+requests never use them. They are reached through module-level facades that
+import the real module on first attribute access, so starting a worker, a
+script or a shell does not pay for them. Workers that want them warm list
+them in PRELOAD_MODULES.
+"""
+
+import importlib
+import threading
+import time
+
+class LazyModule:
+    """
+    Stand-in for a module, imported on first attribute access
+    
+    Attributes are looked up on the real module, so facade.name works like
+    module.name once the module is loaded. Imports are serialized by the
+    import system, so concurrent first uses import the module once.
+    """
+    
+    def __init__(self, name, requires=()):
+        self._name = name
+        self._requires = tuple(requires)  # Modules the first use also loads, imported on preload
+        self._module = None
+    
+    @property
+    def loaded(self):
+        return self._module is not None
+    
+    def load(self):
+        """Import the module (once) and return it"""
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+    
+    def preload(self):
+        """Import the module and the libraries its first use needs"""
+        for name in self._requires:
+            importlib.import_module(name)
+        return self.load()
+    
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return getattr(self.load(), name)
+    
+    def __repr__(self):
+        state = 'loaded' if self.loaded else 'not loaded'
+        return f'<LazyModule {self._name} ({state})>'
+
+# Facades, imported by the code that uses them instead of the modules
+analytics = LazyModule('ai_analytics')
+excel_import = LazyModule('excel_user_processor', requires=['openpyxl', 'pandas'])
+pdf_import = LazyModule('pdf_user_processor')
+
+# Names accepted by PRELOAD_MODULES
+SUBSYSTEMS = {
+    'analytics': [analytics],
+    'imports': [excel_import, pdf_import]
+}
+
+_preload_lock = threading.Lock()
+
+def preload(names):
+    """
+    Import subsystems now instead of on first use
+    
+    Args:
+        names: Subsystem names from SUBSYSTEMS, or 'all'
+    
+    Returns:
+        dict: subsystem -> seconds spent importing it
+    
+    Raises:
+        ValueError: If a name is not a subsystem
+    """
+    names = list(SUBSYSTEMS) if 'all' in names else list(names)
+    unknown = [name for name in names if name not in SUBSYSTEMS]
+    if unknown:
+        raise ValueError(f"Unknown subsystems: {', '.join(unknown)} (expected {', '.join(SUBSYSTEMS)} or all)")
+    
+    times = {}
+    with _preload_lock:
+        for name in names:
+            start = time.perf_counter()
+            for facade in SUBSYSTEMS[name]:
+                facade.preload()
+            times[name] = time.perf_counter() - start
+    return times
+
+def parse_subsystems(value):
+    """Subsystem names of a comma-separated setting such as 'analytics,imports'"""
+    if isinstance(value, (list, tuple, set)):
+        return [name.strip() for name in value if name.strip()]
+    return [name.strip() for name in (value or '').split(',') if name.strip()]
+
+def init_app(app):
+    """
+    Preload the subsystems named in the app config
+    
+    Settings:
+        PRELOAD_MODULES: Comma-separated subsystems to import at startup
+            (analytics, imports or all); empty to import them on first use
+    """
+    names = parse_subsystems(app.config.get('PRELOAD_MODULES'))
+    if names:
+        times = preload(names)
+        app.logger.info('Preloaded ' + ', '.join(f'{name} in {seconds:.2f}s' for name, seconds in times.items()))
@@ -63,6 +63,23 @@ def migrate_database():
             else:
                 raise
         
+        # Add revision column to quiz table (answer key cache version)
+        try:
+            cursor.execute("ALTER TABLE quiz ADD COLUMN revision INTEGER NOT NULL DEFAULT 0")
+            print("Added revision column to quiz table")
+        except sqlite3.OperationalError as e:
+            if "duplicate column name" in str(e):
+                print("Revision column already exists in quiz table")
+            else:
+                raise
+        
+        # Listings are paged by (created_at, id), which must not be NULL: give
+        # rows without a creation time the oldest position, at the end of every listing
+        for table in ['user', 'lesson', 'quiz']:
+            cursor.execute(f"UPDATE {table} SET created_at = '1970-01-01 00:00:00.000000' WHERE created_at IS NULL")
+            if cursor.rowcount:
+                print(f"Backfilled created_at of {cursor.rowcount} rows in {table} table")
+        
         conn.commit()
         print("Database migration completed successfully!")
         
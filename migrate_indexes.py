@@ -0,0 +1,190 @@
+"""
+Create the query indexes declared on the models in an existing database
+Works on SQLite and PostgreSQL (DATABASE_URL); indexes that already exist are
+left alone, so the migration can be run any number of times.
+
+Usage:
+    python migrate_indexes.py           Create missing indexes
+    python migrate_indexes.py check     Check that every hot query is served by an index
+"""
+
+import argparse
+import re
+import sys
+from datetime import datetime
+
+def migrate_indexes():
+    """
+    Create every index declared on the models that is missing from the database
+    
+    Returns:
+        int: Number of indexes created
+    """
+    from sqlalchemy import inspect
+    from app import db
+    
+    created = 0
+    with db.engine.begin() as conn:
+        inspector = inspect(conn)
+        existing_tables = set(inspector.get_table_names())
+        
+        for table in db.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                print(f"Table {table.name} doesn't exist yet, its indexes will be created with it")
+                continue
+            
+            existing = {index['name'] for index in inspector.get_indexes(table.name)}
+            for index in sorted(table.indexes, key=lambda index: index.name):
+                if index.name in existing:
+                    print(f"Index {index.name} already exists on {table.name}")
+                    continue
+                index.create(bind=conn)
+                print(f"Created index {index.name} on {table.name}")
+                created += 1
+    
+    print("Index migration completed successfully!")
+    return created
+
+def hot_queries():
+    """
+    The queries behind the busiest pages and APIs, with placeholder values
+    
+    Returns:
+        list: (description, statement, ordered) tuples; ordered queries must
+        also get their ORDER BY from the index instead of a sort
+    """
+    from app import db, User, Lesson, Quiz, Question, QuizAttempt, QuizSubmission, ImportJob, StudentInteraction
+    
+    cursor_time = datetime(2024, 1, 1)
+    
+    return [
+        ('student quiz history',
+         db.select(QuizAttempt).where(QuizAttempt.student_id == 1).order_by(QuizAttempt.completed_at), True),
+        ('quiz results',
+         db.select(QuizAttempt).where(QuizAttempt.quiz_id == 1), False),
+        ('next attempt of a student',
+         db.select(QuizAttempt.id).where(QuizAttempt.student_id == 1, db.or_(
+             QuizAttempt.completed_at > cursor_time,
+             db.and_(QuizAttempt.completed_at == cursor_time, QuizAttempt.id > 100)
+         )).order_by(QuizAttempt.completed_at, QuizAttempt.id).limit(1), True),
+        ('student attempt on a quiz',
+         db.select(QuizAttempt).where(QuizAttempt.student_id == 1, QuizAttempt.quiz_id == 1), False),
+        ('recent quiz attempts',
+         db.select(QuizAttempt).order_by(QuizAttempt.completed_at.desc()).limit(5), True),
+        ('student interactions by type',
+         db.select(StudentInteraction).where(
+             StudentInteraction.student_id == 1, StudentInteraction.interaction_type == 'lesson_view'
+         ), False),
+        ('recent lesson views',
+         db.select(StudentInteraction).where(StudentInteraction.interaction_type == 'lesson_view')
+         .order_by(StudentInteraction.timestamp.desc()).limit(5), True),
+        ('published lessons of a section',
+         db.select(Lesson).where(Lesson.section_id == 1, Lesson.is_published == True)
+         .order_by(Lesson.created_at.desc(), Lesson.id.desc()).limit(11), True),
+        ('published quizzes of a section',
+         db.select(Quiz).where(Quiz.section_id == 1, Quiz.is_published == True)
+         .order_by(Quiz.created_at.desc(), Quiz.id.desc()).limit(11), True),
+        ('teacher lessons',
+         db.select(Lesson).where(Lesson.teacher_id == 1)
+         .order_by(Lesson.created_at.desc(), Lesson.id.desc()).limit(11), True),
+        ('teacher quizzes',
+         db.select(Quiz).where(Quiz.teacher_id == 1)
+         .order_by(Quiz.created_at.desc(), Quiz.id.desc()).limit(11), True),
+        ('lessons page after a cursor',
+         db.select(Lesson).where(db.or_(
+             Lesson.created_at < cursor_time,
+             db.and_(Lesson.created_at == cursor_time, Lesson.id < 100)
+         )).order_by(Lesson.created_at.desc(), Lesson.id.desc()).limit(11), False),
+        ('quiz questions',
+         db.select(Question).where(Question.quiz_id == 1), False),
+        ('students',
+         db.select(User.id).where(User.role == 'student'), False),
+        ('students of sections',
+         db.select(User.id).where(User.role == 'student', User.section_id.in_([1, 2])), False),
+        ('users page',
+         db.select(User).order_by(User.created_at.desc(), User.id.desc()).limit(11), True),
+        ('queued quiz submissions',
+         db.select(QuizSubmission.id).where(QuizSubmission.status == 'queued')
+         .order_by(QuizSubmission.id).limit(100), True),
+        ('queued import jobs',
+         db.select(ImportJob.id).where(ImportJob.status == 'queued').order_by(ImportJob.id).limit(1), True),
+    ]
+
+def explain(conn, statement):
+    """
+    Get the query plan of a statement
+    
+    On PostgreSQL, sequential scans and sorts are disabled for the check so
+    the planner picks an index whenever one applies, even on small tables.
+    
+    Returns:
+        list: Plan lines
+    """
+    sql = str(statement.compile(dialect=conn.dialect, compile_kwargs={'literal_binds': True}))
+    
+    if conn.dialect.name == 'postgresql':
+        conn.exec_driver_sql('SET LOCAL enable_seqscan = off')
+        conn.exec_driver_sql('SET LOCAL enable_sort = off')
+        return [row[0] for row in conn.exec_driver_sql('EXPLAIN ' + sql)]
+    
+    return [row[-1] for row in conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + sql)]
+
+def plan_problems(plan, ordered):
+    """List the parts of a plan that read a table without an index"""
+    problems = []
+    for line in plan:
+        # SQLite: "SCAN lesson" without "USING ... INDEX"; PostgreSQL: "Seq Scan on lesson"
+        if re.match(r'\s*SCAN \w+\s*$', line) or 'Seq Scan' in line:
+            problems.append(f'full table scan: {line.strip()}')
+        if ordered and ('TEMP B-TREE FOR ORDER BY' in line or re.match(r'\s*(->\s*)?Sort\b', line)):
+            problems.append(f'sort not served by an index: {line.strip()}')
+    return problems
+
+def check_query_plans():
+    """
+    Check that every hot query uses an index
+    
+    Returns:
+        int: Number of queries with an index problem
+    """
+    from app import db
+    
+    failures = 0
+    with db.engine.connect() as conn:
+        for description, statement, ordered in hot_queries():
+            with conn.begin():
+                plan = explain(conn, statement)
+            problems = plan_problems(plan, ordered)
+            
+            status = 'FAIL' if problems else 'ok'
+            print(f"[{status}] {description}")
+            for line in plan:
+                print(f"       {line}")
+            for problem in problems:
+                print(f"       -> {problem}")
+            failures += bool(problems)
+    
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description='Create and check database query indexes')
+    parser.add_argument('command', nargs='?', choices=['migrate', 'check'], default='migrate')
+    args = parser.parse_args()
+    
+    from app import app
+    
+    with app.app_context():
+        if args.command == 'migrate':
+            migrate_indexes()
+            return 0
+        
+        failures = check_query_plans()
+        if failures:
+            print(f"{failures} hot queries are not served by an index")
+            return 1
+        
+        print("Every hot query is served by an index")
+        return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -27,6 +27,8 @@ const LessonsScreen = () => {
   const [loading, setLoading] = useState(true);
   const [refreshing, setRefreshing] = useState(false);
   const [searchQuery, setSearchQuery] = useState('');
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const { user } = useAuth();
   const navigation = useNavigation();
 
@@ -34,7 +36,8 @@ const LessonsScreen = () => {
     try {
       const response = await axios.get('/api/lessons');
       setLessons(response.data.lessons);
-      setFilteredLessons(response.data.lessons);
+      setFilteredLessons(applySearch(response.data.lessons, searchQuery));
+      setNextCursor(response.data.pagination ? response.data.pagination.next_cursor : null);
     } catch (error) {
       console.error('Error fetching lessons:', error);
     } finally {
@@ -43,6 +46,23 @@ const LessonsScreen = () => {
     }
   };
 
+  // Infinite scroll: fetch the page after the last loaded lesson
+  const loadMoreLessons = async () => {
+    if (!nextCursor || loadingMore) return;
+    setLoadingMore(true);
+    try {
+      const response = await axios.get('/api/lessons', { params: { cursor: nextCursor } });
+      const allLessons = [...lessons, ...response.data.lessons];
+      setLessons(allLessons);
+      setFilteredLessons(applySearch(allLessons, searchQuery));
+      setNextCursor(response.data.pagination.next_cursor);
+    } catch (error) {
+      console.error('Error fetching more lessons:', error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   useFocusEffect(
     useCallback(() => {
       fetchLessons();
@@ -54,17 +74,19 @@ const LessonsScreen = () => {
     fetchLessons();
   };
 
-  const handleSearch = (query) => {
-    setSearchQuery(query);
+  const applySearch = (lessonList, query) => {
     if (query.trim() === '') {
-      setFilteredLessons(lessons);
-    } else {
-      const filtered = lessons.filter(lesson =>
-        lesson.title.toLowerCase().includes(query.toLowerCase()) ||
-        lesson.teacher.toLowerCase().includes(query.toLowerCase())
-      );
-      setFilteredLessons(filtered);
+      return lessonList;
     }
+    return lessonList.filter(lesson =>
+      lesson.title.toLowerCase().includes(query.toLowerCase()) ||
+      lesson.teacher.toLowerCase().includes(query.toLowerCase())
+    );
+  };
+
+  const handleSearch = (query) => {
+    setSearchQuery(query);
+    setFilteredLessons(applySearch(lessons, query));
   };
 
   const getFileTypeIcon = (fileType) => {
@@ -216,6 +238,8 @@ const LessonsScreen = () => {
             <RefreshControl refreshing={refreshing} onRefresh={onRefresh} />
           }
           ListEmptyComponent={renderEmptyState}
+          onEndReached={loadMoreLessons}
+          onEndReachedThreshold={0.5}
           showsVerticalScrollIndicator={false}
         />
       </View>
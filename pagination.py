@@ -0,0 +1,137 @@
+"""
+Keyset pagination for School Platform listings
+Pages are ordered newest first by (created_at, id) and addressed by opaque
+cursors, so every page costs one indexed range query however deep it is and
+stays stable while rows are being added. created_at is NOT NULL on paginated
+models; migrate_database.py backfills rows of older databases.
+"""
+
+import base64
+import json
+from datetime import datetime
+
+class InvalidCursor(ValueError):
+    """Raised for a cursor that was not produced by encode_cursor"""
+
+class KeysetPage:
+    """One page of results with the cursors of the neighbouring pages"""
+    
+    def __init__(self, items, per_page, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+    
+    def to_dict(self):
+        return {
+            'per_page': self.per_page,
+            'next_cursor': self.next_cursor,
+            'prev_cursor': self.prev_cursor,
+            'has_more': self.next_cursor is not None
+        }
+
+def encode_cursor(item):
+    """
+    Encode the (created_at, id) position of an item as a URL-safe cursor
+    
+    Raises:
+        ValueError: If the item has no created_at (database not migrated)
+    """
+    if item.created_at is None:
+        raise ValueError(f'{type(item).__name__} {item.id} has no created_at; run migrate_database.py')
+    position = json.dumps([item.created_at.isoformat(), item.id])
+    return base64.urlsafe_b64encode(position.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor from encode_cursor
+    
+    Returns:
+        tuple: (created_at, id)
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, item_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), int(item_id)
+    except (ValueError, TypeError):
+        raise InvalidCursor(f'Invalid cursor: {cursor!r}')
+
+def get_page_size(requested=None):
+    """
+    Page size for a request: ITEMS_PER_PAGE by default, capped at MAX_ITEMS_PER_PAGE
+    
+    Args:
+        requested: Page size asked for by the client, if any
+    """
+    from flask import current_app
+    
+    default = current_app.config.get('ITEMS_PER_PAGE', 10)
+    maximum = current_app.config.get('MAX_ITEMS_PER_PAGE', 100)
+    if not requested or requested < 1:
+        return default
+    return min(requested, maximum)
+
+def paginate(query, model, after=None, before=None, per_page=None):
+    """
+    Fetch one page of a query, newest first by (created_at, id)
+    
+    Args:
+        query: Query over model with any filters applied, without ordering
+        model: Model class with created_at and id columns
+        after: Cursor of the last item of the previous page (next page)
+        before: Cursor of the first item of the following page (previous page)
+        per_page: Page size, as returned by get_page_size
+    
+    Returns:
+        KeysetPage
+    """
+    from app import db
+    
+    per_page = per_page or get_page_size()
+    
+    if before:
+        created_at, item_id = decode_cursor(before)
+        # Walk backwards from the cursor, then restore newest-first order
+        items = query.filter(db.or_(
+            model.created_at > created_at,
+            db.and_(model.created_at == created_at, model.id > item_id)
+        )).order_by(model.created_at.asc(), model.id.asc()).limit(per_page + 1).all()
+        has_newer = len(items) > per_page
+        items = list(reversed(items[:per_page]))
+        return KeysetPage(
+            items, per_page,
+            next_cursor=encode_cursor(items[-1]) if items else before,
+            prev_cursor=encode_cursor(items[0]) if items and has_newer else None
+        )
+    
+    if after:
+        created_at, item_id = decode_cursor(after)
+        query = query.filter(db.or_(
+            model.created_at < created_at,
+            db.and_(model.created_at == created_at, model.id < item_id)
+        ))
+    
+    items = query.order_by(model.created_at.desc(), model.id.desc()).limit(per_page + 1).all()
+    has_older = len(items) > per_page
+    items = items[:per_page]
+    return KeysetPage(
+        items, per_page,
+        next_cursor=encode_cursor(items[-1]) if items and has_older else None,
+        prev_cursor=encode_cursor(items[0]) if items and after else None
+    )
+
+def paginate_request(query, model):
+    """
+    Paginate a query using the cursor, before and per_page request arguments
+    
+    Raises:
+        InvalidCursor: If a cursor argument is malformed
+    """
+    from flask import request
+    
+    return paginate(
+        query, model,
+        after=request.args.get('cursor'),
+        before=request.args.get('before'),
+        per_page=get_page_size(request.args.get('per_page', type=int))
+    )
@@ -1,144 +1,260 @@
 import os
 import io
+import multiprocessing
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 import PyPDF2
-from werkzeug.security import generate_password_hash
 from flask import current_app
 
-def extract_users_from_pdf(pdf_file):
+# Smallest PDF whose pages are read in a process pool
+PARALLEL_PDF_MIN_PAGES = 100
+
+def _field_value(field):
+    # The value of a field as text, '' if it has none
+    if '/V' not in field:
+        return ""
+    value = field['/V']
+    if isinstance(value, PyPDF2.generic.ByteStringObject):
+        return value.decode('utf-8')
+    return str(value)
+
+def _field_name(field):
+    # get_fields keys fields by their mapping name, else their partial name
+    for key in ('/TM', '/T'):
+        if key in field:
+            return field[key]
+    return None
+
+def fields_from_form(pdf_reader):
     """
-    Extract user information from a PDF file with form fields
+    Read the form fields by walking the whole AcroForm tree
+    
+    Returns:
+        list: (field name, value) pairs in the order of get_fields
+    """
+    fields = pdf_reader.get_fields()
+    if not fields:
+        return []
+    return [
+        (field_name, _field_value(field_value) if isinstance(field_value, dict) else "")
+        for field_name, field_value in fields.items()
+    ]
+
+def _page_fields(pdf_content, start, stop):
+    # Runs in a pool process
+    return read_page_fields(PyPDF2.PdfReader(io.BytesIO(pdf_content)), start, stop)
+
+def read_page_fields(pdf_reader, start, stop):
+    """
+    Read the form fields of pages start to stop-1 from their widget annotations
+    
+    Fields within a hierarchy are reached from their widgets by following
+    /Parent up to the top-level field, reading each parent once.
+    
+    Returns:
+        dict: object number -> (parent object number, position among the
+        parent's /Kids, number of kids, field name, value) of each widget
+        and field reached, or None if the form refers to them directly
+        rather than by object number
+    """
+    nodes = {}
+    kid_positions = {}
+    for page_number in range(start, stop):
+        page = pdf_reader.pages[page_number]
+        for annotation_ref in (page['/Annots'] if '/Annots' in page else []):
+            if not isinstance(annotation_ref, PyPDF2.generic.IndirectObject):
+                return None
+            annotation = annotation_ref.get_object()
+            if '/Subtype' not in annotation or annotation['/Subtype'] != '/Widget':
+                continue
+            
+            idnum, node = annotation_ref.idnum, annotation
+            while idnum not in nodes:
+                parent_ref = node.raw_get('/Parent') if '/Parent' in node else None
+                parent_idnum = position = None
+                if parent_ref is not None:
+                    if not isinstance(parent_ref, PyPDF2.generic.IndirectObject):
+                        return None
+                    parent_idnum = parent_ref.idnum
+                    if parent_idnum not in kid_positions:
+                        parent = parent_ref.get_object()
+                        kids = parent['/Kids'] if '/Kids' in parent else []
+                        if not all(isinstance(kid, PyPDF2.generic.IndirectObject) for kid in kids):
+                            return None
+                        kid_positions[parent_idnum] = {kid.idnum: position for position, kid in enumerate(kids)}
+                    position = kid_positions[parent_idnum].get(idnum)
+                    if position is None:
+                        return None
+                
+                kid_count = len(node['/Kids']) if '/Kids' in node else 0
+                nodes[idnum] = (parent_idnum, position, kid_count, _field_name(node), _field_value(node))
+                if parent_ref is None:
+                    break
+                idnum, node = parent_idnum, parent_ref.get_object()
+    return nodes
+
+def fields_from_pages(pdf_reader, pdf_content, max_workers=None):
+    """
+    Read the form fields page by page, in parallel for large PDFs
+    
+    Each page's widget annotations, and the fields above them, are resolved
+    on their own instead of walking the AcroForm tree, and pages are split
+    across a pool of spawned processes. The fields are then put back in the
+    order get_fields visits them (each top-level field of /Fields in turn,
+    kids before their parent), so the result matches fields_from_form.
     
     Args:
-        pdf_file: The uploaded PDF file object
+        pdf_reader: PdfReader of pdf_content
+        pdf_content: The PDF as bytes, read again by each pool process
+        max_workers: Pool size (default PDF_EXTRACT_WORKERS, or one per available core)
+    
+    Returns:
+        list: (field name, value) pairs, or None if the form has fields
+        without widgets on a page, which need fields_from_form
+    """
+    from user_import import available_cores
+    
+    form = pdf_reader.trailer['/Root']['/AcroForm']
+    form_fields = form['/Fields'] if '/Fields' in form else []
+    if not all(isinstance(field_ref, PyPDF2.generic.IndirectObject) for field_ref in form_fields):
+        return None
+    positions = {field_ref.idnum: position for position, field_ref in enumerate(form_fields)}
+    
+    page_count = len(pdf_reader.pages)
+    max_workers = min(max_workers or current_app.config.get('PDF_EXTRACT_WORKERS') or available_cores(), page_count)
+    ranges = [
+        (page_count * index // max_workers, page_count * (index + 1) // max_workers)
+        for index in range(max_workers)
+    ] if page_count else []
+    
+    page_fields = None
+    if max_workers > 1 and page_count >= PARALLEL_PDF_MIN_PAGES:
+        try:
+            with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+                futures = [pool.submit(_page_fields, pdf_content, start, stop) for start, stop in ranges]
+                page_fields = [future.result() for future in futures]
+        except (OSError, BrokenProcessPool) as e:
+            current_app.logger.warning(f"Parallel PDF extraction unavailable, reading pages in process: {str(e)}")
+    if page_fields is None:
+        page_fields = [read_page_fields(pdf_reader, 0, page_count)]
+    
+    if any(fields is None for fields in page_fields):
+        return None
+    
+    # Parents reached from several pages are read by each of them
+    nodes = {}
+    for fields in page_fields:
+        nodes.update(fields)
+    
+    # Every top-level field of the form must have been reached
+    roots = []
+    kids = defaultdict(list)
+    for idnum, (parent_idnum, position, kid_count, field_name, value) in nodes.items():
+        if parent_idnum is not None:
+            kids[parent_idnum].append(idnum)
+        elif idnum in positions:
+            roots.append(idnum)
+        else:
+            return None
+    if len(roots) != len(form_fields):
+        return None
+    
+    # Walk the reached tree like get_fields, checking that every kid was
+    # reached; same name twice keeps the first position and the last value
+    ordered = {}
+    visited = 0
+    stack = [(idnum, False) for idnum in sorted(roots, key=positions.get, reverse=True)]
+    while stack:
+        idnum, kids_visited = stack.pop()
+        parent_idnum, position, kid_count, field_name, value = nodes[idnum]
+        if kids_visited:
+            if field_name is not None:
+                ordered[field_name] = value
+            continue
+        if len(kids[idnum]) != kid_count:
+            return None
+        visited += 1
+        stack.append((idnum, True))
+        stack.extend((kid, False) for kid in sorted(kids[idnum], key=lambda kid: nodes[kid][1], reverse=True))
+    if visited != len(nodes):
+        return None
+    return list(ordered.items())
+
+def users_from_fields(fields):
+    """
+    Group form fields into users
     
     Returns:
         A list of dictionaries containing user information
     """
     users = []
     
+    # Group fields by their order in the PDF
+    field_groups = {}
+    
+    for field_name, value in fields:
+        # Try to determine the field order from the name
+        # This is a heuristic and might need adjustment based on actual PDF structure
+        parts = field_name.split('.')
+        if len(parts) > 1:
+            try:
+                group_id = int(parts[0])
+            except ValueError:
+                # If we can't determine the order, use the field name as the group ID
+                group_id = field_name
+            
+            if group_id not in field_groups:
+                field_groups[group_id] = []
+            
+            field_groups[group_id].append(value)
+    
+    # Process each group of fields
+    for group_id, values in field_groups.items():
+        if len(values) >= 3:  # We need at least name, username, and secret code
+            user = {
+                'full_name': values[0],
+                'username': values[1],
+                'secret_code': values[2]
+            }
+            users.append(user)
+    
+    return users
+
+def extract_users_from_pdf(pdf_file, by_page=None):
+    """
+    Extract user information from a PDF file with form fields
+    
+    Args:
+        pdf_file: The uploaded PDF file object
+        by_page: Read the fields page by page (default PDF_EXTRACT_BY_PAGE);
+            forms it cannot read that way fall back to the AcroForm tree
+    
+    Returns:
+        A list of dictionaries containing user information
+    """
     try:
         # Read the PDF file
-        pdf_reader = PyPDF2.PdfReader(pdf_file)
+        pdf_content = pdf_file.read()
+        pdf_reader = PyPDF2.PdfReader(io.BytesIO(pdf_content))
         
         # Check if the PDF has form fields
         if '/AcroForm' not in pdf_reader.trailer['/Root']:
             return {'error': 'The PDF does not contain form fields'}
         
+        if by_page is None:
+            by_page = current_app.config.get('PDF_EXTRACT_BY_PAGE', True)
+        
         # Get form fields from the PDF
-        fields = pdf_reader.get_fields()
+        fields = fields_from_pages(pdf_reader, pdf_content) if by_page else None
+        if fields is None:
+            fields = fields_from_form(pdf_reader)
         
         if not fields:
             return {'error': 'No form fields found in the PDF'}
         
-        # Group fields by their order in the PDF
-        field_groups = {}
-        
-        for field_name, field_value in fields.items():
-            # Extract the field value
-            if isinstance(field_value, dict) and '/V' in field_value:
-                value = field_value['/V']
-                if isinstance(value, PyPDF2.generic.ByteStringObject):
-                    value = value.decode('utf-8')
-                elif isinstance(value, PyPDF2.generic.TextStringObject):
-                    value = str(value)
-                else:
-                    value = str(value)
-            else:
-                value = ""
-            
-            # Try to determine the field order from the name
-            # This is a heuristic and might need adjustment based on actual PDF structure
-            parts = field_name.split('.')
-            if len(parts) > 1:
-                try:
-                    group_id = int(parts[0])
-                except ValueError:
-                    # If we can't determine the order, use the field name as the group ID
-                    group_id = field_name
-                
-                if group_id not in field_groups:
-                    field_groups[group_id] = []
-                
-                field_groups[group_id].append(value)
-        
-        # Process each group of fields
-        for group_id, values in field_groups.items():
-            if len(values) >= 3:  # We need at least name, username, and secret code
-                user = {
-                    'full_name': values[0],
-                    'username': values[1],
-                    'secret_code': values[2]
-                }
-                users.append(user)
-        
-        return users
+        return users_from_fields(fields)
     
     except Exception as e:
         current_app.logger.error(f"Error processing PDF: {str(e)}")
         return {'error': f'Error processing PDF: {str(e)}'}
-
-def create_users_from_data(user_data, default_role, section_id, default_password):
-    """
-    Create user accounts from the extracted data
-    
-    Args:
-        user_data: List of dictionaries containing user information
-        default_role: Role to assign to all users
-        section_id: Section ID for student accounts
-        default_password: Default password for all accounts (used as fallback if secret_code is not available)
-    
-    Returns:
-        A dictionary with success/error information
-    """
-    from app import db, User
-    
-    created_users = []
-    errors = []
-    
-    for user in user_data:
-        try:
-            # Generate email from username
-            email = f"{user['username']}@school.com"
-            
-            # Check if user already exists
-            existing_user = User.query.filter(
-                (User.username == user['username']) | (User.email == email)
-            ).first()
-            
-            if existing_user:
-                errors.append(f"User {user['username']} already exists")
-                continue
-            
-            # Use the secret_code from the third box as the password
-            # If secret_code is not available, fall back to default_password
-            user_password = user.get('secret_code', default_password)
-            
-            # Create new user
-            new_user = User(
-                username=user['username'],
-                email=email,
-                password_hash=generate_password_hash(user_password),
-                role=default_role,
-                section_id=int(section_id) if default_role == 'student' and section_id else None
-            )
-            
-            db.session.add(new_user)
-            created_users.append(user)
-        
-        except Exception as e:
-            current_app.logger.error(f"Error creating user {user['username']}: {str(e)}")
-            errors.append(f"Error creating user {user['username']}: {str(e)}")
-    
-    # Commit all successful user creations
-    if created_users:
-        try:
-            db.session.commit()
-        except Exception as e:
-            db.session.rollback()
-            current_app.logger.error(f"Database error: {str(e)}")
-            return {'error': f'Database error: {str(e)}', 'created': [], 'errors': errors}
-    
-    return {
-        'created': created_users,
-        'errors': errors
-    }
@@ -0,0 +1,211 @@
+"""
+Authenticated user lookups for School Platform
+Web sessions and mobile tokens resolve to a small immutable snapshot of the
+user (id, role, section_id, username) cached for a short time, so an
+authenticated request does not query the user table just to learn who is
+calling. Snapshots are dropped as soon as a commit changes or deletes the user;
+without a shared (redis) analytics cache backend other workers cannot hear of
+it, so they only keep snapshots for a few seconds.
+"""
+
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from flask_login import UserMixin
+
+def user_tag(user_id):
+    return f'user:{user_id}'
+
+class Principal(UserMixin, namedtuple('Principal', ['id', 'role', 'section_id', 'username'])):
+    """
+    Snapshot of an authenticated user, usable as Flask-Login's current_user
+    
+    Other User attributes (email, created_at, relationships) are loaded from
+    the database on first access.
+    """
+    
+    __slots__ = ()
+    
+    def __getattr__(self, name):
+        from app import db, User
+        
+        if name.startswith('_'):
+            raise AttributeError(name)
+        user = db.session.get(User, self.id)
+        if user is None:
+            raise AttributeError(name)
+        return getattr(user, name)
+
+class PrincipalCache:
+    """
+    Per-process LRU caches of user snapshots and verified tokens
+    
+    A snapshot is reused for at most ttl seconds, and only while the
+    user:<id> generation in the analytics cache backend is the one it was
+    loaded under; changing or deleting the user bumps that generation, so
+    with the redis backend the change reaches every worker at once. With
+    the per-process memory backend, snapshots are kept at most local_ttl
+    seconds, the longest another worker may see a changed user as it was.
+    
+    With a shared backend, a verified token is also remembered with its
+    user id until it expires, so it is not decoded again on every call.
+    """
+    
+    def __init__(self, ttl=60, max_entries=10000, local_ttl=5):
+        self.ttl = ttl
+        self.local_ttl = local_ttl
+        self.max_entries = max_entries
+        self._principals = OrderedDict()  # user_id -> (expires_at, generation, Principal)
+        self._tokens = OrderedDict()  # token -> (expires_at, user_id)
+        self._counters = dict.fromkeys(['hits', 'misses', 'token_hits', 'token_misses', 'invalidations'], 0)
+        self._lock = threading.Lock()
+    
+    def get(self, user_id):
+        """
+        Snapshot of a user, loaded on a miss
+        
+        Returns:
+            Principal, or None if the user does not exist
+        """
+        from analytics_cache import analytics_cache
+        from app import db, User
+        
+        generation = analytics_cache.backend.generation([user_tag(user_id)])
+        ttl = self.ttl if analytics_cache.backend.shared else min(self.ttl, self.local_ttl)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._principals.get(user_id)
+            if entry is not None and entry[0] > now and entry[1] == generation:
+                self._principals.move_to_end(user_id)
+                self._counters['hits'] += 1
+                return entry[2]
+            self._counters['misses'] += 1
+        
+        row = db.session.execute(
+            db.select(User.id, User.role, User.section_id, User.username).where(User.id == user_id)
+        ).first()
+        if row is None:
+            with self._lock:
+                self._principals.pop(user_id, None)
+            return None
+        
+        principal = Principal(*row)
+        with self._lock:
+            self._principals[user_id] = (now + ttl, generation, principal)
+            self._principals.move_to_end(user_id)
+            while len(self._principals) > self.max_entries:
+                self._principals.popitem(last=False)
+        return principal
+    
+    def token_user_id(self, token, decode):
+        """
+        User id of a bearer token, verified on first use
+        
+        Args:
+            token: Encoded token
+            decode: Callable returning the verified payload (with user_id and
+                exp) of a token, or None if it is invalid or expired
+        
+        Returns:
+            The token's user id, or None
+        """
+        from analytics_cache import analytics_cache
+        
+        # Without a shared backend every token is verified again
+        if not analytics_cache.backend.shared:
+            with self._lock:
+                self._counters['token_misses'] += 1
+            payload = decode(token)
+            return payload.get('user_id') if payload else None
+        
+        now = time.time()
+        with self._lock:
+            entry = self._tokens.get(token)
+            if entry is not None:
+                if entry[0] > now:
+                    self._tokens.move_to_end(token)
+                    self._counters['token_hits'] += 1
+                    return entry[1]
+                del self._tokens[token]
+            self._counters['token_misses'] += 1
+        
+        payload = decode(token)
+        if not payload or not payload.get('user_id'):
+            return None
+        
+        with self._lock:
+            self._tokens[token] = (payload.get('exp', now + self.ttl), payload['user_id'])
+            while len(self._tokens) > self.max_entries:
+                self._tokens.popitem(last=False)
+        return payload['user_id']
+    
+    def invalidate(self, user_ids):
+        """Drop the snapshots of the given users in every worker"""
+        from analytics_cache import analytics_cache
+        
+        user_ids = sorted(set(user_ids))
+        if not user_ids:
+            return
+        analytics_cache.backend.invalidate([user_tag(user_id) for user_id in user_ids])
+        with self._lock:
+            for user_id in user_ids:
+                self._principals.pop(user_id, None)
+            self._counters['invalidations'] += len(user_ids)
+    
+    def clear(self):
+        with self._lock:
+            self._principals.clear()
+            self._tokens.clear()
+    
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['principals'] = len(self._principals)
+            stats['tokens'] = len(self._tokens)
+            stats['ttl'] = self.ttl
+            stats['local_ttl'] = self.local_ttl
+            stats['max_entries'] = self.max_entries
+            return stats
+
+# Shared cache instance, configured by init_app
+principal_cache = PrincipalCache()
+
+def init_app(app, db):
+    """
+    Configure the shared cache and drop snapshots when users change
+    
+    Settings:
+        PRINCIPAL_CACHE_TTL: Seconds a user snapshot is reused
+        PRINCIPAL_CACHE_LOCAL_TTL: The same without a shared analytics cache backend
+        PRINCIPAL_CACHE_MAX_ENTRIES: Maximum number of cached snapshots and tokens
+    """
+    principal_cache.ttl = app.config.get('PRINCIPAL_CACHE_TTL', 60)
+    principal_cache.local_ttl = app.config.get('PRINCIPAL_CACHE_LOCAL_TTL', 5)
+    principal_cache.max_entries = app.config.get('PRINCIPAL_CACHE_MAX_ENTRIES', 10000)
+    _register_invalidation(db)
+
+def _register_invalidation(db):
+    """Invalidate on commit for every changed or deleted User"""
+    from sqlalchemy import event
+    from app import User
+    
+    if getattr(_register_invalidation, '_registered', False):
+        return
+    _register_invalidation._registered = True
+    
+    @event.listens_for(db.session, 'after_flush')
+    def collect_changed_users(session, flush_context):
+        changed = session.info.setdefault('principals_changed', set())
+        for obj in list(session.dirty) + list(session.deleted):
+            if isinstance(obj, User):
+                changed.add(obj.id)
+    
+    @event.listens_for(db.session, 'after_commit')
+    def invalidate_changed_users(session):
+        user_ids = session.info.pop('principals_changed', None)
+        if user_ids:
+            principal_cache.invalidate(user_id for user_id in user_ids if user_id is not None)
+    
+    @event.listens_for(db.session, 'after_rollback')
+    def discard_changed_users(session):
+        session.info.pop('principals_changed', None)
@@ -207,44 +207,103 @@ function loadNotifications() {
 }
 
 // Analytics tracking
-function trackEvent(eventType, eventData) {
-    const analyticsData = {
-        event_type: eventType,
-        event_data: eventData,
-        timestamp: new Date().toISOString(),
-        user_agent: navigator.userAgent,
-        url: window.location.href
-    };
+// Tracking events are queued per endpoint and sent in batches: when a queue
+// is full, and with navigator.sendBeacon when the page is hidden or unloaded
+const TRACKING_BATCH_SIZE = 20;
+const trackingQueues = {
+    '/api/track_interaction': [],
+    '/api/track_event': [],
+    '/api/update_progress': []
+};
+const pageStartTime = Date.now();
+
+function queueTrackingEvent(url, event, sameEvent) {
+    const queue = trackingQueues[url];
+    
+    // Coalesce: a newer event replaces the queued one it supersedes
+    const index = sameEvent ? queue.findIndex(sameEvent) : -1;
+    if (index >= 0) {
+        queue[index] = event;
+    } else {
+        queue.push(event);
+    }
+    
+    if (queue.length >= TRACKING_BATCH_SIZE) {
+        flushTrackingQueue(url, false);
+    }
+}
+
+function flushTrackingQueue(url, unloading) {
+    const events = trackingQueues[url].splice(0);
+    if (events.length === 0) {
+        return;
+    }
     
-    // Send to analytics endpoint
-    fetch('/api/track_event', {
+    const body = JSON.stringify(events);
+    if (unloading && navigator.sendBeacon &&
+        navigator.sendBeacon(url, new Blob([body], { type: 'application/json' }))) {
+        return;
+    }
+    
+    fetch(url, {
         method: 'POST',
         headers: {
             'Content-Type': 'application/json',
         },
-        body: JSON.stringify(analyticsData)
+        body: body,
+        keepalive: unloading
     }).catch(function(error) {
         console.log('Analytics tracking failed:', error);
     });
 }
 
-// Progress tracking for lessons and quizzes
+function flushTracking() {
+    Object.keys(trackingQueues).forEach(function(url) {
+        flushTrackingQueue(url, true);
+    });
+}
+
+document.addEventListener('visibilitychange', function() {
+    if (document.visibilityState === 'hidden') {
+        flushTracking();
+    }
+});
+window.addEventListener('pagehide', flushTracking);
+
+function trackEvent(eventType, eventData) {
+    queueTrackingEvent('/api/track_event', {
+        event_type: eventType,
+        event_data: eventData,
+        timestamp: new Date().toISOString(),
+        user_agent: navigator.userAgent,
+        url: window.location.href
+    });
+}
+
+// Time spent on content logged by the server when the page was loaded;
+// repeated reports for the same content only keep the latest duration
+function trackInteraction(type, contentId, duration) {
+    queueTrackingEvent('/api/track_interaction', {
+        type: type,
+        content_id: contentId,
+        duration: duration,
+        timestamp: new Date().toISOString()
+    }, function(queued) {
+        return queued.type === type && queued.content_id === contentId;
+    });
+}
+
+// Progress tracking for lessons and quizzes; only the latest progress of
+// each lesson or quiz is sent
 function updateProgress(contentType, contentId, progress) {
-    const progressData = {
+    queueTrackingEvent('/api/update_progress', {
         content_type: contentType,
         content_id: contentId,
         progress: progress,
+        duration: Math.round((Date.now() - pageStartTime) / 1000),
         timestamp: new Date().toISOString()
-    };
-    
-    fetch('/api/update_progress', {
-        method: 'POST',
-        headers: {
-            'Content-Type': 'application/json',
-        },
-        body: JSON.stringify(progressData)
-    }).catch(function(error) {
-        console.log('Progress update failed:', error);
+    }, function(queued) {
+        return queued.content_type === contentType && queued.content_id === contentId;
     });
 }
 
@@ -390,18 +449,45 @@ function copyToClipboard(text) {
     });
 }
 
+// Translations of the page language, from its versioned bundle (cached by the browser for good)
+let translationsPromise = null;
+
+function loadTranslations() {
+    if (!translationsPromise) {
+        const meta = document.querySelector('meta[name="i18n-bundle"]');
+        translationsPromise = meta
+            ? fetch(meta.content).then(function(response) {
+                return response.ok ? response.json() : {};
+            }).catch(function() {
+                return {};
+            })
+            : Promise.resolve({});
+    }
+    return translationsPromise;
+}
+
+function translate(key) {
+    return loadTranslations().then(function(translations) {
+        return translations[key] || key;
+    });
+}
+
 // Export functions for global use
 window.SchoolPlatform = {
     showNotification,
     trackEvent,
+    trackInteraction,
     updateProgress,
+    flushTracking,
     QuizTimer,
     uploadFile,
     formatDate,
     formatTime,
     formatDateTime,
     copyToClipboard,
-    loadAutoSavedData
+    loadAutoSavedData,
+    loadTranslations,
+    translate
 };
 
 // Initialize theme from localStorage
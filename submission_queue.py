@@ -0,0 +1,326 @@
+"""
+Queued grading of quiz submissions for School Platform
+In queued mode a submission is stored as a QuizSubmission row and
+acknowledged right away; a background grader claims queued submissions in
+batches, grades them against the cached answer keys and writes their
+attempts, interactions and aggregates with one commit per batch. Submission
+tokens are unique, so a retried submission never creates a second attempt.
+"""
+
+import atexit
+import json
+import os
+import re
+import secrets
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+
+SUBMISSION_TOKEN_PATTERN = re.compile(r'[A-Za-z0-9_-]{16,64}')
+
+class SubmissionTokenConflict(ValueError):
+    """Raised when a token was already used for another student or quiz"""
+
+def new_submission_token():
+    """Random token identifying one submission of a quiz"""
+    return secrets.token_urlsafe(24)
+
+def is_valid_submission_token(token):
+    return isinstance(token, str) and SUBMISSION_TOKEN_PATTERN.fullmatch(token) is not None
+
+def submit(student_id, quiz_id, answers, token):
+    """
+    Durably queue a submission for grading
+    
+    Submitting the same token again returns the submission stored the first
+    time instead of queuing another one.
+    
+    Args:
+        student_id: Submitting student
+        quiz_id: Quiz answered
+        answers: Mapping of question id (as a string) to the submitted answer
+        token: Submission token from new_submission_token or the client
+    
+    Returns:
+        tuple: (QuizSubmission, created)
+    
+    Raises:
+        SubmissionTokenConflict: If the token belongs to another student or quiz
+    """
+    from sqlalchemy.exc import IntegrityError
+    from app import db, QuizSubmission
+    
+    submission = QuizSubmission.query.filter_by(token=token).first()
+    if submission is None:
+        submission = QuizSubmission(
+            token=token,
+            student_id=student_id,
+            quiz_id=quiz_id,
+            answers=json.dumps(answers),
+            submitted_at=datetime.utcnow()
+        )
+        db.session.add(submission)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # The same token was queued concurrently; use that submission
+            db.session.rollback()
+            submission = QuizSubmission.query.filter_by(token=token).first()
+            if submission is None:
+                raise
+        else:
+            submission_grader.notify()
+            return submission, True
+    
+    if submission.student_id != student_id or submission.quiz_id != quiz_id:
+        raise SubmissionTokenConflict(f'Submission token already used: {token!r}')
+    return submission, False
+
+def submission_status(submission):
+    """
+    Status of a submission for the polling endpoints
+    
+    Returns:
+        dict: token, quiz_id, status and times; score, total_points and
+        percentage once graded, error if grading failed
+    """
+    status = {
+        'token': submission.token,
+        'quiz_id': submission.quiz_id,
+        'status': submission.status,
+        'submitted_at': submission.submitted_at.isoformat() if submission.submitted_at else None,
+        'graded_at': submission.graded_at.isoformat() if submission.graded_at else None
+    }
+    if submission.status == 'graded':
+        status['score'] = submission.score
+        status['total_points'] = submission.total_points
+        status['percentage'] = round((submission.score / submission.total_points) * 100) if submission.total_points else 0
+    elif submission.status == 'failed':
+        status['error'] = submission.error
+    return status
+
+class SubmissionGrader:
+    """
+    Background grader of queued submissions
+    
+    The thread wakes when a submission is queued in this process, and every
+    poll_interval seconds to pick up submissions queued by other processes
+    or left over from a restart. A batch is claimed by moving its rows out of
+    the queued status in the same transaction that writes their attempts, so
+    each submission is graded exactly once even with several graders.
+    """
+    
+    def __init__(self, batch_size=100, poll_interval=1.0):
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.app = None
+        self._counters = dict.fromkeys(['graded', 'failed', 'batches', 'failed_batches'], 0)
+        self._latency = {'last_batch_ms': 0.0, 'max_batch_ms': 0.0}
+        self._atexit_registered = False
+        self._reset()
+        os.register_at_fork(after_in_child=self._reset)
+    
+    def _reset(self):
+        # A forked child starts its own thread on its first notify
+        self._condition = threading.Condition()
+        self._grade_lock = threading.Lock()
+        self._thread = None
+        self._pending = False
+        self._stopping = False
+    
+    def notify(self):
+        """Wake the grader (starting it if needed) to grade queued submissions"""
+        with self._condition:
+            self._start_worker()
+            self._pending = True
+            self._condition.notify()
+    
+    def stop(self, timeout=10):
+        """Stop the background thread after its current batch"""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+    
+    def grade_all(self):
+        """
+        Grade queued submissions until none are left
+        
+        Returns:
+            int: Number of submissions graded or failed
+        """
+        total = 0
+        while True:
+            count = self.grade_batch()
+            total += count
+            if count < self.batch_size:
+                return total
+    
+    def grade_batch(self):
+        """
+        Claim, grade and write one batch of queued submissions
+        
+        Returns:
+            int: Number of submissions claimed
+        """
+        from app import db, Quiz, QuizSubmission, QuizAttempt, StudentInteraction
+        from analytics_state import record_activity
+        from grading import answer_keys
+        
+        with self._grade_lock, self.app.app_context():
+            started = time.perf_counter()
+            try:
+                queued_ids = db.session.execute(
+                    db.select(QuizSubmission.id).where(QuizSubmission.status == 'queued')
+                    .order_by(QuizSubmission.id).limit(self.batch_size)
+                ).scalars().all()
+                if not queued_ids:
+                    return 0
+                
+                # Only one grader can move a submission out of the queued status
+                now = datetime.utcnow()
+                claimed_ids = db.session.execute(
+                    db.update(QuizSubmission)
+                    .where(QuizSubmission.id.in_(queued_ids), QuizSubmission.status == 'queued')
+                    .values(status='graded', graded_at=now)
+                    .returning(QuizSubmission.id)
+                    .execution_options(synchronize_session=False)
+                ).scalars().all()
+                submissions = QuizSubmission.query.filter(QuizSubmission.id.in_(claimed_ids))\
+                    .order_by(QuizSubmission.id).all()
+                
+                quiz_ids = {submission.quiz_id for submission in submissions}
+                existing_quizzes = set(db.session.execute(
+                    db.select(Quiz.id).where(Quiz.id.in_(quiz_ids))
+                ).scalars())
+                
+                graded = []
+                failed = 0
+                for submission in submissions:
+                    if submission.quiz_id not in existing_quizzes:
+                        submission.status = 'failed'
+                        submission.error = 'Quiz no longer exists'
+                        failed += 1
+                        continue
+                    
+                    # A submission that cannot be graded fails alone, the batch still commits
+                    try:
+                        answers = json.loads(submission.answers or '{}')
+                        if not isinstance(answers, dict):
+                            raise ValueError('Answers must be an object')
+                        answer_key = answer_keys.get(submission.quiz_id)
+                        score = answer_key.grade(answers)
+                        total_points = answer_key.total_points
+                    except Exception as e:
+                        submission.status = 'failed'
+                        submission.error = f'Grading failed: {e}'[:200]
+                        failed += 1
+                        self.app.logger.exception('Failed to grade quiz submission %s', submission.id)
+                        continue
+                    
+                    attempt = QuizAttempt(
+                        student_id=submission.student_id,
+                        quiz_id=submission.quiz_id,
+                        score=score,
+                        total_points=total_points,
+                        answers=submission.answers,
+                        completed_at=submission.submitted_at
+                    )
+                    interaction = StudentInteraction(
+                        student_id=submission.student_id,
+                        interaction_type='quiz_attempt',
+                        content_id=submission.quiz_id,
+                        performance_score=score/total_points if total_points > 0 else 0,
+                        timestamp=submission.submitted_at
+                    )
+                    db.session.add_all([attempt, interaction])
+                    submission.score = score
+                    submission.total_points = total_points
+                    graded.append((submission, attempt, interaction))
+                
+                db.session.flush()
+                
+                by_student = defaultdict(lambda: ([], []))
+                for submission, attempt, interaction in graded:
+                    submission.attempt_id = attempt.id
+                    by_student[submission.student_id][0].append(attempt)
+                    by_student[submission.student_id][1].append(interaction)
+                for student_id, (attempts, interactions) in by_student.items():
+                    record_activity(student_id, attempts=attempts, interactions=interactions)
+                
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                with self._condition:
+                    self._counters['failed_batches'] += 1
+                raise
+            
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            with self._condition:
+                self._counters['graded'] += len(graded)
+                self._counters['failed'] += failed
+                self._counters['batches'] += 1
+                self._latency['last_batch_ms'] = elapsed_ms
+                self._latency['max_batch_ms'] = max(self._latency['max_batch_ms'], elapsed_ms)
+            return len(submissions)
+    
+    def stats(self):
+        """Queue depth, grading counters and batch latency"""
+        from app import db, QuizSubmission
+        
+        queued = db.session.execute(
+            db.select(db.func.count()).select_from(QuizSubmission).where(QuizSubmission.status == 'queued')
+        ).scalar()
+        with self._condition:
+            stats = dict(self._counters)
+            stats['queued'] = queued
+            stats['last_batch_ms'] = round(self._latency['last_batch_ms'], 3)
+            stats['max_batch_ms'] = round(self._latency['max_batch_ms'], 3)
+            stats['batch_size'] = self.batch_size
+            stats['poll_interval'] = self.poll_interval
+            stats['running'] = self._thread is not None
+            return stats
+    
+    def _start_worker(self):
+        # Called with the condition held; started lazily so it runs in the serving process
+        if self._thread is not None or self._stopping:
+            return
+        self._thread = threading.Thread(target=self._run, name='submission-grader', daemon=True)
+        self._thread.start()
+        if not self._atexit_registered:
+            atexit.register(self.stop)
+            self._atexit_registered = True
+    
+    def _run(self):
+        while True:
+            with self._condition:
+                if not self._pending and not self._stopping:
+                    self._condition.wait(self.poll_interval)
+                self._pending = False
+                if self._stopping:
+                    return
+            
+            try:
+                self.grade_all()
+            except Exception:
+                if self.app is not None:
+                    self.app.logger.exception('Failed to grade queued quiz submissions')
+                time.sleep(self.poll_interval)
+
+# Shared grader, configured by init_app
+submission_grader = SubmissionGrader()
+
+def init_app(app):
+    """
+    Configure the shared grader from app settings
+    
+    Settings:
+        QUIZ_GRADING_BATCH_SIZE: Submissions graded and committed together
+        QUIZ_GRADING_POLL_INTERVAL: Seconds between checks for submissions queued elsewhere
+    """
+    submission_grader.app = app
+    submission_grader.batch_size = app.config.get('QUIZ_GRADING_BATCH_SIZE', 100)
+    submission_grader.poll_interval = app.config.get('QUIZ_GRADING_POLL_INTERVAL', 1.0)
@@ -0,0 +1,83 @@
+"""
+Shared fixtures for the School Platform tests
+The app is imported with APP_CONFIG=testing, so it runs on TestingConfig: an
+in-memory SQLite database created for each test, and interactions written
+immediately instead of through the buffer.
+"""
+
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ['APP_CONFIG'] = 'testing'
+
+@pytest.fixture
+def app():
+    """The app in an application context, with empty tables"""
+    from app import app, db
+    
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def school(app):
+    """
+    Two sections with a teacher, lessons, quizzes and students with random
+    attempts and interactions (fixed seed)
+    
+    Returns:
+        dict: ids of the 'students', 'lessons' and 'quizzes'
+    """
+    from app import db, User, Section, Lesson, Quiz, QuizAttempt, StudentInteraction
+    
+    rng = random.Random(7)
+    sections = [Section(name=f'Section {index}') for index in range(2)]
+    teacher = User(username='teacher', email='teacher@school.com', password_hash='x', role='teacher')
+    db.session.add_all(sections + [teacher])
+    db.session.flush()
+    
+    lessons = [Lesson(title=f'Lesson {index}', teacher_id=teacher.id, section_id=sections[index % 2].id, is_published=True)
+               for index in range(4)]
+    quizzes = [Quiz(title=f'Quiz {index}', teacher_id=teacher.id, section_id=sections[index % 2].id, is_published=True)
+               for index in range(4)]
+    db.session.add_all(lessons + quizzes)
+    db.session.flush()
+    
+    start = datetime.utcnow() - timedelta(days=30)
+    students = []
+    for index in range(12):
+        student = User(username=f'student{index}', email=f'student{index}@school.com', password_hash='x',
+                       role='student', section_id=sections[index % 2].id)
+        db.session.add(student)
+        db.session.flush()
+        students.append(student.id)
+        
+        # The last students have no activity at all
+        if index >= 10:
+            continue
+        for _ in range(rng.randint(1, 8)):
+            db.session.add(QuizAttempt(
+                student_id=student.id, quiz_id=rng.choice(quizzes).id,
+                score=rng.randint(0, 10), total_points=rng.choice([10, 10, 10, 0]),
+                completed_at=start + timedelta(hours=rng.randint(0, 700))
+            ))
+        for _ in range(rng.randint(0, 15)):
+            db.session.add(StudentInteraction(
+                student_id=student.id, interaction_type=rng.choice(['lesson_view', 'lesson_view', 'quiz_attempt']),
+                content_id=rng.choice(lessons).id, duration=rng.choice([None, 30, 200, 600]),
+                timestamp=start + timedelta(hours=rng.randint(0, 700))
+            ))
+    db.session.commit()
+    
+    return {
+        'students': students,
+        'lessons': [lesson.id for lesson in lessons],
+        'quizzes': [quiz.id for quiz in quizzes]
+    }
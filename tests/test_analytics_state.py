@@ -0,0 +1,71 @@
+"""
+Incremental analytics aggregates (analytics_state.py) against a full recompute
+from raw attempts and interactions
+"""
+
+import random
+from datetime import datetime, timedelta
+
+from analytics_state import check_consistency, rebuild_all_states, record_activity
+
+def test_rebuilt_states_match_raw_rows(school):
+    rebuild_all_states()
+    
+    assert check_consistency() == []
+
+def test_incremental_updates_match_raw_rows(school):
+    from app import db, QuizAttempt, StudentInteraction
+    
+    rebuild_all_states()
+    
+    # Attempts are completed as they are submitted; interactions arrive out
+    # of order, some older than the kept daily counts
+    rng = random.Random(11)
+    now = datetime.utcnow()
+    for student_id in school['students']:
+        for minute in range(5):
+            attempt = QuizAttempt(
+                student_id=student_id, quiz_id=rng.choice(school['quizzes']),
+                score=rng.randint(0, 10), total_points=10,
+                completed_at=now + timedelta(minutes=minute)
+            )
+            interaction = StudentInteraction(
+                student_id=student_id, interaction_type='lesson_view', content_id=rng.choice(school['lessons']),
+                duration=rng.choice([None, 45]),
+                timestamp=now - timedelta(days=rng.choice([0, 2, 9, 30]), minutes=rng.randint(0, 600))
+            )
+            db.session.add_all([attempt, interaction])
+            record_activity(student_id, attempts=[attempt], interactions=[interaction])
+            db.session.commit()
+    
+    assert check_consistency() == []
+
+def test_student_without_state_or_rows_is_consistent(app):
+    from app import db, User
+    
+    db.session.add(User(username='new', email='new@school.com', password_hash='x', role='student'))
+    db.session.commit()
+    
+    assert check_consistency() == []
+
+def test_missing_state_is_reported(school):
+    from app import db, StudentAnalyticsState
+    
+    rebuild_all_states()
+    student_id = school['students'][0]
+    db.session.delete(db.session.get(StudentAnalyticsState, student_id))
+    db.session.commit()
+    
+    assert check_consistency() == [(student_id, '', 'missing', 'present')]
+
+def test_stale_state_is_reported(school):
+    from app import db, StudentAnalyticsState
+    
+    rebuild_all_states()
+    student_id = school['students'][1]
+    db.session.get(StudentAnalyticsState, student_id).score_sum += 50
+    db.session.commit()
+    
+    mismatches = check_consistency()
+    assert mismatches
+    assert {mismatch[0] for mismatch in mismatches} == {student_id}
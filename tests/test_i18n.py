@@ -0,0 +1,20 @@
+"""
+Compiled translation catalogs (i18n.py) against get_translation
+"""
+
+from i18n import check_catalog, load_catalog, write_catalog
+
+def test_compiled_tables_match_get_translation(tmp_path):
+    # No catalog file: the tables are compiled from translations.py
+    assert check_catalog(load_catalog(str(tmp_path / 'missing.json'))) == 0
+
+def test_written_catalog_matches_get_translation(tmp_path):
+    path = str(tmp_path / 'translations.catalog.json')
+    write_catalog(path)
+    
+    assert check_catalog(load_catalog(path)) == 0
+
+def test_app_catalog_matches_get_translation(app):
+    from app import translation_catalog
+    
+    assert check_catalog(translation_catalog) == 0
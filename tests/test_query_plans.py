@@ -0,0 +1,14 @@
+"""
+Index coverage of the hot queries (migrate_indexes.py)
+"""
+
+from migrate_indexes import check_query_plans, plan_problems
+
+def test_hot_queries_use_indexes(app):
+    assert check_query_plans() == 0
+
+def test_plan_problems_flags_scans_and_sorts():
+    assert plan_problems(['SCAN lesson'], False) == ['full table scan: SCAN lesson']
+    assert plan_problems(['SEARCH lesson USING INDEX ix_lesson_created (created_at<?)'], True) == []
+    assert plan_problems(['SEARCH lesson USING INDEX ix_lesson_teacher (teacher_id=?)', 'USE TEMP B-TREE FOR ORDER BY'], True) \
+        == ['sort not served by an index: USE TEMP B-TREE FOR ORDER BY']
@@ -25,6 +25,8 @@ translations = {
         'create': 'Create',
         'submit': 'Submit',
         'search': 'Search',
+        'previous_page': 'Previous',
+        'next_page': 'Next',
         
         # Login
         'username': 'Username',
@@ -71,6 +73,18 @@ translations = {
         'take_quiz': 'Take Quiz',
         'quiz_score': 'Score',
         'quiz_completed': 'Quiz Completed',
+        'quiz_submission_received': 'Your answers have been received and are being graded...',
+        'quiz_grading_failed': 'Your submission could not be graded. Please contact your teacher.',
+        'import_job_title': 'User Import',
+        'import_job_queued': 'The import is waiting to start...',
+        'import_job_running': 'The import is running...',
+        'import_job_completed': 'The import is complete.',
+        'import_job_failed': 'The import failed.',
+        'import_job_created_accounts': 'Accounts created',
+        'rows_parsed': 'Rows read',
+        'rows_hashed': 'Passwords hashed',
+        'rows_inserted': 'Accounts created',
+        'rows_failed': 'Rows failed',
         
         # Footer
         'empowering_education': 'Empowering education through technology',
@@ -175,7 +189,7 @@ translations = {
         'instructions': 'Instructions',
         'file_format_requirements': 'File Format Requirements',
         'pdf_format_requirements': 'PDF Format Requirements',
-        'excel_format': 'Excel Format',
+        'excel_format': 'Excel or CSV Format',
         'masar_format': 'Masar Format',
         'excel_first_column_username': 'First column: Account Name (Username)',
         'excel_second_column_full_name': 'Second column: Student Name (Full Name)',
@@ -198,6 +212,7 @@ translations = {
         'secret_code': 'Secret Code',
         'section': 'Section',
         'confirm_and_create_accounts': 'Confirm and Create Accounts',
+        'preview_rows_shown': 'Rows shown (every row of the file will be imported)',
         'back_to_user_management': 'Back to User Management',
         'select_section': 'Select Section',
         'required_for_student_accounts': 'Required for student accounts',
@@ -283,6 +298,8 @@ translations = {
         'create': 'Créer',
         'submit': 'Soumettre',
         'search': 'Rechercher',
+        'previous_page': 'Précédent',
+        'next_page': 'Suivant',
         
         # Login
         'username': "Nom d'utilisateur",
@@ -329,6 +346,18 @@ translations = {
         'take_quiz': 'Passer le Quiz',
         'quiz_score': 'Score',
         'quiz_completed': 'Quiz Terminé',
+        'quiz_submission_received': 'Vos réponses ont été reçues et sont en cours de correction...',
+        'quiz_grading_failed': "Votre soumission n'a pas pu être corrigée. Veuillez contacter votre enseignant.",
+        'import_job_title': 'Importation des Utilisateurs',
+        'import_job_queued': "L'importation va bientôt commencer...",
+        'import_job_running': "L'importation est en cours...",
+        'import_job_completed': "L'importation est terminée.",
+        'import_job_failed': "L'importation a échoué.",
+        'import_job_created_accounts': 'Comptes créés',
+        'rows_parsed': 'Lignes lues',
+        'rows_hashed': 'Mots de passe chiffrés',
+        'rows_inserted': 'Comptes créés',
+        'rows_failed': 'Lignes en échec',
         
         # Footer
         'empowering_education': "Autonomiser l'éducation grâce à la technologie",
@@ -433,7 +462,7 @@ translations = {
         'instructions': 'Instructions',
         'file_format_requirements': 'Exigences de Format de Fichier',
         'pdf_format_requirements': 'Exigences de Format PDF',
-        'excel_format': 'Format Excel',
+        'excel_format': 'Format Excel ou CSV',
         'masar_format': 'Format Masar',
         'excel_first_column_username': 'Première colonne: Nom du compte (Nom d\'utilisateur)',
         'excel_second_column_full_name': 'Deuxième colonne: Nom de l\'étudiant (Nom complet)',
@@ -456,6 +485,7 @@ translations = {
         'secret_code': 'Code Secret',
         'section': 'Section',
         'confirm_and_create_accounts': 'Confirmer et Créer des Comptes',
+        'preview_rows_shown': 'Lignes affichées (toutes les lignes du fichier seront importées)',
         'back_to_user_management': 'Retour à la Gestion des Utilisateurs',
         'select_section': 'Sélectionner une Section',
         'required_for_student_accounts': 'Requis pour les comptes étudiants',
@@ -541,6 +571,8 @@ translations = {
         'create': 'إنشاء',
         'submit': 'إرسال',
         'search': 'بحث',
+        'previous_page': 'السابق',
+        'next_page': 'التالي',
         
         # Login
         'username': 'اسم المستخدم',
@@ -635,6 +667,18 @@ translations = {
         'take_quiz': 'أداء الاختبار',
         'quiz_score': 'النتيجة',
         'quiz_completed': 'تم إكمال الاختبار',
+        'quiz_submission_received': 'تم استلام إجاباتك وجاري تصحيحها...',
+        'quiz_grading_failed': 'تعذر تصحيح إجاباتك. يرجى التواصل مع أستاذك.',
+        'import_job_title': 'استيراد المستخدمين',
+        'import_job_queued': 'الاستيراد في انتظار البدء...',
+        'import_job_running': 'الاستيراد قيد التنفيذ...',
+        'import_job_completed': 'اكتمل الاستيراد.',
+        'import_job_failed': 'فشل الاستيراد.',
+        'import_job_created_accounts': 'الحسابات المنشأة',
+        'rows_parsed': 'الأسطر المقروءة',
+        'rows_hashed': 'كلمات المرور المشفرة',
+        'rows_inserted': 'الحسابات المنشأة',
+        'rows_failed': 'الأسطر الفاشلة',
         'create_new_quiz': 'إنشاء اختبار جديد',
         'publish_immediately': 'نشر فوراً',
         'questions': 'الأسئلة',
@@ -867,7 +911,7 @@ translations = {
         'instructions': 'تعليمات',
         'file_format_requirements': 'متطلبات تنسيق الملف',
         'pdf_format_requirements': 'متطلبات تنسيق PDF',
-        'excel_format': 'تنسيق Excel',
+        'excel_format': 'تنسيق Excel أو CSV',
         'masar_format': 'تنسيق مسار',
         'excel_first_column_username': 'العمود الأول: اسم الحساب (اسم المستخدم)',
         'excel_second_column_full_name': 'العمود الثاني: اسم الطالب (الاسم الكامل)',
@@ -890,6 +934,7 @@ translations = {
         'secret_code': 'الرمز السري',
         'section': 'القسم',
         'confirm_and_create_accounts': 'تأكيد وإنشاء الحسابات',
+        'preview_rows_shown': 'الصفوف المعروضة (سيتم استيراد جميع صفوف الملف)',
         'back_to_user_management': 'العودة إلى إدارة المستخدمين',
         'select_section': 'اختر القسم',
         'required_for_student_accounts': 'مطلوب لحسابات الطلاب',
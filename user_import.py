@@ -0,0 +1,197 @@
+"""
+Bulk creation of user accounts for School Platform
+Shared by the Excel and PDF imports: existing accounts are found with
+set-based queries over the whole file, duplicates within the file are
+skipped, passwords are hashed in parallel across the available cores, and
+new accounts are written with chunked bulk inserts in a single transaction.
+"""
+
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import islice
+from werkzeug.security import generate_password_hash
+from flask import current_app
+
+# Rows per bulk insert and values per IN (...) lookup
+IMPORT_CHUNK_SIZE = 500
+
+# Passwords per hashing task, and the smallest import hashed in a process pool
+HASH_CHUNK_SIZE = 16
+PARALLEL_HASH_MIN_PASSWORDS = 64
+
+def chunked(items, size=IMPORT_CHUNK_SIZE):
+    """Split a list into consecutive chunks of at most size items"""
+    return [items[start:start + size] for start in range(0, len(items), size)]
+
+def find_existing_accounts(usernames, emails):
+    """
+    Look up which usernames and emails are already taken
+    
+    Returns:
+        tuple: (set of taken usernames, set of taken emails)
+    """
+    from app import db, User
+    
+    taken_usernames = set()
+    taken_emails = set()
+    for chunk in chunked(sorted(usernames)):
+        taken_usernames.update(db.session.execute(
+            db.select(User.username).where(User.username.in_(chunk))
+        ).scalars())
+    for chunk in chunked(sorted(emails)):
+        taken_emails.update(db.session.execute(
+            db.select(User.email).where(User.email.in_(chunk))
+        ).scalars())
+    return taken_usernames, taken_emails
+
+def available_cores():
+    """Number of CPU cores this process may run on"""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+def _hash_chunk(passwords):
+    # Runs in a pool process
+    return [generate_password_hash(password) for password in passwords]
+
+def hash_passwords(passwords, max_workers=None, progress=None):
+    """
+    Hash passwords with generate_password_hash, in parallel for large imports
+
+    Chunks of HASH_CHUNK_SIZE passwords are hashed in a pool of spawned
+    processes with at most two chunks per process in flight, so memory use
+    stays bounded whatever the size of the import. Small imports, or a pool
+    that cannot be started, are hashed in this process.
+
+    Args:
+        passwords: Plain-text passwords
+        max_workers: Pool size (default USER_IMPORT_HASH_WORKERS, or one per available core)
+        progress: Optional callable (hashed, total) called after each chunk
+
+    Returns:
+        list: Password hashes in the order of passwords
+    """
+    total = len(passwords)
+    chunks = chunked(passwords, HASH_CHUNK_SIZE)
+    max_workers = min(max_workers or current_app.config.get('USER_IMPORT_HASH_WORKERS') or available_cores(), len(chunks))
+    hashes = []
+
+    if max_workers > 1 and total >= PARALLEL_HASH_MIN_PASSWORDS:
+        try:
+            with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+                remaining = iter(chunks)
+                pending = deque(pool.submit(_hash_chunk, chunk) for chunk in islice(remaining, 2 * max_workers))
+                while pending:
+                    hashes.extend(pending.popleft().result())
+                    if progress:
+                        progress(len(hashes), total)
+                    chunk = next(remaining, None)
+                    if chunk is not None:
+                        pending.append(pool.submit(_hash_chunk, chunk))
+            return hashes
+        except (OSError, BrokenProcessPool) as e:
+            current_app.logger.warning(f"Parallel password hashing unavailable, hashing in process: {str(e)}")
+
+    # Continue after whatever the pool finished
+    for chunk in chunks[len(hashes) // HASH_CHUNK_SIZE:]:
+        hashes.extend(_hash_chunk(chunk))
+        if progress:
+            progress(len(hashes), total)
+    return hashes
+
+def log_import_progress(stage, count, total):
+    """Default progress reporter: log each stage, and about every tenth of the hashing"""
+    if stage == 'hashed':
+        step = max(total // 10, HASH_CHUNK_SIZE)
+        if count != total and count // step == (count - HASH_CHUNK_SIZE) // step:
+            return
+    current_app.logger.info(f"User import: {stage} {count}/{total}")
+
+def create_users_from_data(user_data, default_role, section_id, default_password, progress=None):
+    """
+    Create user accounts from the extracted data
+    
+    Args:
+        user_data: List of dictionaries containing user information
+        default_role: Role to assign to all users
+        section_id: Section ID for student accounts
+        default_password: Default password for all accounts (used as fallback if secret_code is not available)
+        progress: Optional callable (stage, count, total) reporting the
+            rows that 'failed' validation, then the passwords 'hashed' and
+            the rows 'inserted' so far; by default progress is logged
+    
+    Returns:
+        A dictionary with success/error information
+    """
+    from app import db, User
+    
+    progress = progress or log_import_progress
+    created_users = []
+    errors = []
+    
+    # Usernames and emails of the whole file, checked with a few set-based queries
+    usernames = {user['username'] for user in user_data if user.get('username')}
+    taken_usernames, taken_emails = find_existing_accounts(
+        usernames, {f"{username}@school.com" for username in usernames}
+    )
+    
+    rows = []
+    passwords = []
+    for user in user_data:
+        try:
+            # Generate email from username
+            email = f"{user['username']}@school.com"
+            
+            # Skip accounts that exist or appeared earlier in the file
+            if user['username'] in taken_usernames or email in taken_emails:
+                errors.append(f"User {user['username']} already exists")
+                continue
+            
+            # Use the secret_code as the password
+            # If secret_code is not available, fall back to default_password
+            user_password = user.get('secret_code', default_password)
+            if not isinstance(user_password, str):
+                raise TypeError('password must be a string')
+            
+            rows.append({
+                'username': user['username'],
+                'email': email,
+                'role': default_role,
+                'section_id': int(section_id) if default_role == 'student' and section_id else None
+            })
+            passwords.append(user_password)
+            taken_usernames.add(user['username'])
+            taken_emails.add(email)
+            created_users.append(user)
+        
+        except Exception as e:
+            current_app.logger.error(f"Error creating user {user.get('username')}: {str(e)}")
+            errors.append(f"Error creating user {user.get('username')}: {str(e)}")
+    
+    progress('failed', len(errors), len(user_data))
+    
+    # Insert all successful user creations in chunks and commit them together
+    if rows:
+        hashes = hash_passwords(passwords, progress=lambda hashed, total: progress('hashed', hashed, total))
+        for row, password_hash in zip(rows, hashes):
+            row['password_hash'] = password_hash
+        
+        try:
+            inserted = 0
+            for chunk in chunked(rows):
+                db.session.execute(db.insert(User), chunk)
+                inserted += len(chunk)
+                progress('inserted', inserted, len(rows))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Database error: {str(e)}")
+            return {'error': f'Database error: {str(e)}', 'created': [], 'errors': errors}
+    
+    return {
+        'created': created_users,
+        'errors': errors
+    }